@@ -4,10 +4,12 @@ Browser package for Playwright-based web crawling.
 This module serves as the package entry point and exports public interfaces.
 """
 
-from .config import BrowserConfig, BrowserType, CrawlerConfig, CrewlerResult, FieldConfig, FieldType, PageConfig
+from .config import BrowserConfig, BrowserType, CrawlerConfig, CrewlerResult, FieldConfig, FieldType, PageConfig, PoolConfig
 from .block import block_domains
-from .crawler import Crawler
-from .playwright_manager import PlaywrightManager
+from .cleaner import LxmlCleaner, SoupCleaner, get_cleaner
+from .crawler import Crawler, CrawlSession
+from .extractor import ExtractPool
+from .playwright_manager import PlaywrightDriver, PlaywrightManager, playwright_driver
 from .pool import BrowserPool
 
 __all__ = [
@@ -19,7 +21,15 @@ __all__ = [
     'FieldConfig',
     'FieldType',
     'PageConfig',
+    'PoolConfig',
     'Crawler',
+    'CrawlSession',
+    'ExtractPool',
+    'LxmlCleaner',
+    'SoupCleaner',
+    'get_cleaner',
     'BrowserPool',
+    'PlaywrightDriver',
     'PlaywrightManager',
+    'playwright_driver',
 ]
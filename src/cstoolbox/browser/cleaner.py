@@ -0,0 +1,537 @@
+"""
+HTML cleaner backends of the crawler.
+
+SoupCleaner is the reference implementation, it cleans the BeautifulSoup tree of the page in
+several walks and runs regexes over the serialized result. LxmlCleaner produces the same output
+from lxml's element tree in a single walk: unwanted nodes are dropped, attributes rewritten,
+tags unwrapped and empty tags removed on the way, and the elements removed from the content
+are left out while serializing instead of being searched for afterwards.
+"""
+
+import copy
+import re
+from itertools import islice
+from typing import Any, List, Optional, Union
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Comment, Tag
+from lxml import etree
+
+from cstoolbox.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLEANERS = ("soup", "lxml")
+
+# removed with their content
+REMOVED_TAGS = frozenset(
+    [
+        "script",
+        "style",
+        "iframe",
+        "frame",
+        "frameset",
+        "object",
+        "embed",
+        "noscript",
+        "meta",
+        "link",
+        "form",
+        "input",
+        "button",
+        "select",
+        "textarea",
+        "fieldset",
+        "label",
+        "datalist",
+        "output",
+        "option",
+    ]
+)
+# kept with their rowspan and colspan attributes
+TABLE_TAGS = frozenset(["table", "td", "th", "tbody", "thead", "tfoot", "tr"])
+# kept without attributes, any other tag is unwrapped
+BLOCK_TAGS = frozenset(
+    [
+        "div",
+        "p",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "ol",
+        "ul",
+        "li",
+        "dl",
+        "dd",
+        "dt",
+        "nav",
+        "footer",
+        "aside",
+        "header",
+        "article",
+        "section",
+        "main",
+    ]
+)
+# never removed for being empty
+EMPTY_TAGS = frozenset(["br", "hr", "img", "svg", "figure"])
+# whitespace is kept as it is in these tags while parsing
+PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+# removed from the content of the page, in this order
+CONTENT_REMOVED_TAGS = ("nav", "footer", "aside", "header")
+_CONTENT_REMOVED_PATTERNS = [re.compile(rf"<{tag}[^>]*>[\s\S]*?</{tag}>") for tag in CONTENT_REMOVED_TAGS]
+_NESTED_SPAN_START = re.compile(r"(<span[^>]*>)(\s*<span[^>]*>)+")
+_NESTED_SPAN_END = re.compile(r"(</span>)(\s*</span>)+")
+_SPAN_ONLY_CELLS = [re.compile(rf"<{tag}[^>]*>\s*<span[^>]*>([^<>]+?)</span>\s*</{tag}>") for tag in ("li", "td", "th")]
+_COMMENT = re.compile(r"<!--.*?-->")
+_MULTIPLE_NEWLINES = re.compile(r"(\n\s*){2,}")
+
+
+def _tidy(html: str) -> str:
+    return html.replace('\r', '\n').replace('\n\n', '\n').replace('    ', '  ').replace('\t', '  ').strip()
+
+
+def _simplify(text: str) -> str:
+    """Content clean up following the removal of the useless tags"""
+    if "<span" in text:
+        # remove multiple <span>
+        text = _NESTED_SPAN_START.sub(r"\1", text)
+        text = _NESTED_SPAN_END.sub(r"\1", text)
+
+        # simplify li, td, th
+        for pattern, tag in zip(_SPAN_ONLY_CELLS, ("li", "td", "th")):
+            text = pattern.sub(rf"<{tag}>\1</{tag}>", text)
+
+    # remove comments
+    if "<!--" in text:
+        text = _COMMENT.sub("", text)
+    # remove multiple \n
+    return _MULTIPLE_NEWLINES.sub(r"\n\n", text)
+
+
+class SoupCleaner:
+    """Reference cleaner, working on the BeautifulSoup tree of the page"""
+
+    name = "soup"
+
+    def load(self, soup: Optional[BeautifulSoup], html: str) -> Any:
+        """
+        Prepare the cleaning of a page, return the page given to clean_element and clean_content
+
+        Args:
+            soup: Parsed html, None when the page was not parsed yet
+        """
+        return soup if soup is not None else BeautifulSoup(html, "lxml")
+
+    def clean_element(
+        self, page: Any, element: Tag, remove_link: bool = False, remove_img: bool = True, base_url: str = ""
+    ) -> str:
+        """Clean a copy of an element of the page, the element itself included"""
+        return self.clean_html(element, remove_link, remove_img, base_url)
+
+    def clean_content(self, page: Any, remove_link: bool = False, base_url: str = "") -> str:
+        """
+        Clean the body of the page in place and keep its main content, the page is not usable afterwards.
+        Returns an empty string when the page has no body.
+        """
+        if page.body is None:
+            return ""
+        return self.clean_for_content(self.clean_tree(page.body, remove_link, base_url=base_url))
+
+    def clean_html(
+        self, html: Union[str, Tag], remove_link: bool = False, remove_img: bool = True, base_url: str = ""
+    ) -> str:
+        """
+        Clean HTML content by removing unnecessary tags and attributes.
+        Args:
+            html: HTML content to clean, or an element of a parsed page, which is cleaned on a copy
+            base_url: URL of the crawled page, used to resolve relative links
+        Returns:
+            Cleaned HTML content
+        """
+        if isinstance(html, Tag):
+            # the element itself is cleaned like the rest, so it needs a parent it can be unwrapped into
+            root = Tag(name="body")
+            root.append(copy.copy(html))
+        else:
+            root = BeautifulSoup(html, 'lxml')
+        return self.clean_tree(root, remove_link, remove_img, base_url)
+
+    def clean_tree(
+        self, soup: Union[BeautifulSoup, Tag], remove_link: bool = False, remove_img: bool = True, base_url: str = ""
+    ) -> str:
+        """
+        Clean the descendants of a parsed element in place and return their cleaned HTML.
+        Args:
+            soup: Parsed document or element, the element itself is kept out of the result
+            base_url: URL of the crawled page, used to resolve relative links
+        Returns:
+            Cleaned HTML content
+        """
+        # Remove unwanted tags and comments
+        for tag in soup(list(REMOVED_TAGS)):
+            tag.decompose()
+
+        # Remove all comments
+        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+            comment.extract()
+
+        # Keep only structural and content tags but preserve essential attributes
+        for tag in soup.find_all(True):
+            if tag.name == "a":
+                if remove_link:
+                    tag.unwrap()
+                else:
+                    # Resolve relative URLs for <a> tags
+                    href = tag.attrs.get("href")
+                    if href:
+                        if href.startswith("javascript:"):
+                            tag.unwrap()
+                            continue
+
+                        try:
+                            href = urljoin(base_url, href)
+                        except:
+                            pass
+                    tag.attrs = {"href": href} if href else {}
+            elif tag.name == "img":
+                if remove_img:
+                    tag.decompose()
+                else:
+                    # Resolve relative URLs for <img> tags
+                    src = tag.attrs.get("src")
+                    if src:
+                        try:
+                            src = urljoin(base_url, src)
+                        except:
+                            pass
+                    tag.attrs = {"src": src} if src else {}
+            elif tag.name in TABLE_TAGS:
+                # Keep rowspan and colspan for table elements
+                attrs = {}
+                if "rowspan" in tag.attrs:
+                    attrs["rowspan"] = tag.attrs["rowspan"]
+                if "colspan" in tag.attrs:
+                    attrs["colspan"] = tag.attrs["colspan"]
+                tag.attrs = attrs
+            elif tag.name in BLOCK_TAGS:
+                tag.attrs = {}
+            else:
+                tag.unwrap()
+
+        # Remove empty tags and whitespace-only tags
+        for tag in soup.find_all(True):
+            if (
+                (not tag.contents or all(c.name in ['br', 'hr'] for c in tag.contents))
+                and (not tag.string or tag.string.strip() == '')
+                and tag.name not in EMPTY_TAGS
+            ):
+                tag.decompose()
+        if isinstance(soup, BeautifulSoup) and soup.body:
+            # Use decode_contents() to get the inner HTML of the body tag
+            data = soup.body.decode_contents()
+        elif isinstance(soup, BeautifulSoup):
+            # html and body are unwrapped like any other tag, so this is the usual case
+            data = str(soup)
+        else:
+            data = soup.decode_contents()
+
+        return _tidy(data)
+
+    def clean_for_content(self, text: str) -> str:
+        """Remove the navigation, header, footer and aside blocks from cleaned HTML and tidy it up"""
+        # Remove the useless tags
+        for pattern in _CONTENT_REMOVED_PATTERNS:
+            text = pattern.sub("", text.strip())
+        return _simplify(text)
+
+
+class _LxmlPage:
+    """Page cleaned by LxmlCleaner, each tree is only parsed once something is cleaned with it"""
+
+    def __init__(self, html: str, soup: Optional[BeautifulSoup] = None):
+        self.html = html
+        self._soup = soup
+        self._root: Any = _UNPARSED
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, "lxml")
+        return self._soup
+
+    @property
+    def root(self) -> Optional[Any]:
+        """lxml tree of the html, None when lxml could not parse it"""
+        if self._root is _UNPARSED:
+            # BeautifulSoup feeds the html to the same libxml2 parser, so both trees have the same structure
+            parser = etree.HTMLParser(recover=True)
+            try:
+                parser.feed(self.html)
+                self._root = parser.close()
+            except (etree.LxmlError, ValueError) as e:
+                logger.debug(f"lxml could not parse the page, using the soup cleaner: {e}")
+                self._root = None
+        return self._root
+
+
+_UNPARSED = object()
+
+
+# stand for the elements removed from the content while serializing, private use characters
+_MARKERS = {tag: chr(0xE000 + i) for i, tag in enumerate(CONTENT_REMOVED_TAGS)}
+_MARKERS_PATTERN = re.compile(f"[{''.join(_MARKERS.values())}]")
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote(value: str) -> str:
+    """Quote an attribute value the way BeautifulSoup does"""
+    value = _escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _collapse(text: Optional[str]) -> Optional[str]:
+    """BeautifulSoup replaces the whitespace only strings with a single newline or space while parsing"""
+    if text and not text.strip(_ASCII_SPACES):
+        return "\n" if "\n" in text else " "
+    return text
+
+
+def _append_text(parent, previous, text: str):
+    """Append text after previous, or at the start of parent when there is no previous sibling"""
+    if previous is not None:
+        previous.tail = previous.tail + text if previous.tail else text
+    else:
+        parent.text = parent.text + text if parent.text else text
+
+
+def _drop(element):
+    """Remove an element with its content, the text following it is kept"""
+    if element.tail:
+        _append_text(element.getparent(), element.getprevious(), element.tail)
+    element.getparent().remove(element)
+
+
+def _unwrap(element):
+    """Replace an element with its content"""
+    parent, previous = element.getparent(), element.getprevious()
+    if element.text:
+        _append_text(parent, previous, element.text)
+    children = list(element)
+    for child in children:
+        element.addprevious(child)
+    if element.tail:
+        _append_text(parent, children[-1] if children else element.getprevious(), element.tail)
+    element.tail = None
+    parent.remove(element)
+
+
+class LxmlCleaner(SoupCleaner):
+    """
+    Cleaner producing the output of SoupCleaner from the lxml tree of the page, several times faster.
+
+    Pages lxml cannot clean the same way, like a nav nested in a nav which the reference regexes only
+    partly remove, are handed to SoupCleaner.
+    """
+
+    name = "lxml"
+
+    def load(self, soup: Optional[BeautifulSoup], html: str) -> _LxmlPage:
+        # the lxml tree is parsed when an element is first cleaned, the soup only when lxml can not clean
+        return _LxmlPage(html, soup)
+
+    def clean_element(
+        self, page: _LxmlPage, element: Tag, remove_link: bool = False, remove_img: bool = True, base_url: str = ""
+    ) -> str:
+        node = self._find(page, element)
+        if node is None:
+            return super().clean_element(page.soup, element, remove_link, remove_img, base_url)
+        preserve = any(parent.tag in PRESERVE_WHITESPACE_TAGS for parent in node.iterancestors())
+        node = copy.deepcopy(node)
+        node.tail = None
+        root = etree.Element("body")
+        root.append(node)
+        self._clean(root, remove_link, remove_img, base_url, preserve)
+        out: List[str] = []
+        self._serialize(root, out, None)
+        return _tidy("".join(out))
+
+    def clean_content(self, page: _LxmlPage, remove_link: bool = False, base_url: str = "") -> str:
+        body = page.root.find("body") if page.root is not None else None
+        if body is None:
+            return super().clean_content(page.soup, remove_link, base_url)
+        self._clean(body, remove_link, True, base_url, False)
+
+        markers = _MARKERS
+        for element in body.iter(*CONTENT_REMOVED_TAGS):
+            # the reference regexes stop at the first closing tag, only leaving out whole elements matches them
+            if next(element.iterdescendants(element.tag), None) is not None:
+                markers = None
+                break
+        out: List[str] = []
+        removed = self._serialize(body, out, markers)
+        text = _tidy("".join(out))
+        if markers is None or len(_MARKERS_PATTERN.findall(text)) != removed:
+            # fall back to the regexes, also when the page itself contains the marker characters
+            if markers is not None:
+                out = []
+                self._serialize(body, out, None)
+                text = _tidy("".join(out))
+            return self.clean_for_content(text)
+
+        for tag in CONTENT_REMOVED_TAGS:
+            text = text.strip().replace(markers[tag], "")
+        return _simplify(text)
+
+    @staticmethod
+    def _find(page: _LxmlPage, tag: Optional[Tag]):
+        """Find the lxml element of a BeautifulSoup tag, by its position in the tree"""
+        if page.root is None or tag is None:
+            return None
+        path = []
+        node = tag
+        while node.parent is not None:
+            index = 0
+            for sibling in node.parent.contents:
+                if sibling is node:
+                    break
+                if isinstance(sibling, Tag):
+                    index += 1
+            path.append((index, node.name))
+            node = node.parent
+
+        element = None
+        for index, name in reversed(path):
+            if element is None:
+                element = page.root if index == 0 else None
+            else:
+                element = next(islice(element.iterchildren(etree.Element), index, None), None)
+            if element is None or element.tag != name:
+                return None
+        return element
+
+    def _clean(self, element, remove_link: bool, remove_img: bool, base_url: str, preserve: bool) -> bool:
+        """
+        Clean the descendants of an element in place, in a single walk.
+
+        Args:
+            preserve: The element is in a tag keeping its whitespace
+
+        Returns:
+            Whether the element has content once its descendants are cleaned, before its empty children
+            are removed, which is when the reference cleaner checks it
+        """
+        if not preserve and element.text:
+            element.text = _collapse(element.text)
+        has_content = bool(element.text)
+        empty = []
+        for child in list(element):
+            tag = child.tag
+            if not preserve and child.tail:
+                child.tail = _collapse(child.tail)
+            # comments and processing instructions have a function as tag
+            if not isinstance(tag, str) or tag in REMOVED_TAGS:
+                has_content = has_content or bool(child.tail)
+                _drop(child)
+                continue
+
+            child_content = self._clean(
+                child, remove_link, remove_img, base_url, preserve or tag in PRESERVE_WHITESPACE_TAGS
+            )
+            if tag == "a":
+                href = child.get("href")
+                if remove_link or (href and href.startswith("javascript:")):
+                    has_content = has_content or child_content or bool(child.tail)
+                    _unwrap(child)
+                    continue
+                if href:
+                    try:
+                        href = urljoin(base_url, href)
+                    except:
+                        pass
+                child.attrib.clear()
+                if href:
+                    child.set("href", href)
+            elif tag == "img":
+                if remove_img:
+                    has_content = has_content or bool(child.tail)
+                    _drop(child)
+                    continue
+                src = child.get("src")
+                if src:
+                    try:
+                        src = urljoin(base_url, src)
+                    except:
+                        pass
+                child.attrib.clear()
+                if src:
+                    child.set("src", src)
+            elif tag in TABLE_TAGS:
+                rowspan, colspan = child.get("rowspan"), child.get("colspan")
+                child.attrib.clear()
+                if rowspan is not None:
+                    child.set("rowspan", rowspan)
+                if colspan is not None:
+                    child.set("colspan", colspan)
+            elif tag in BLOCK_TAGS:
+                child.attrib.clear()
+            else:
+                has_content = has_content or child_content or bool(child.tail)
+                _unwrap(child)
+                continue
+
+            has_content = True
+            if not child_content and tag not in EMPTY_TAGS:
+                empty.append(child)
+
+        for child in empty:
+            _drop(child)
+        return has_content
+
+    def _serialize(self, element, out: List[str], markers: Optional[dict]) -> int:
+        """
+        Serialize the content of a cleaned element like BeautifulSoup, the tags in markers are replaced
+        with their marker. Returns the number of markers written.
+        """
+        removed = 0
+        if element.text:
+            out.append(_escape(element.text))
+        for child in element:
+            tag = child.tag
+            if markers is not None and tag in markers:
+                out.append(markers[tag])
+                removed += 1
+            else:
+                out.append("<" + tag)
+                for name, value in sorted(child.attrib.items()):
+                    out.append(f" {name}={_quote(value)}")
+                if tag == "img" and not child.text and not len(child):
+                    out.append("/>")
+                else:
+                    out.append(">")
+                    removed += self._serialize(child, out, markers)
+                    out.append(f"</{tag}>")
+            if child.tail:
+                out.append(_escape(child.tail))
+        return removed
+
+
+def get_cleaner(name: str) -> SoupCleaner:
+    """Get the cleaner backend of a name"""
+    if name == "lxml":
+        return LxmlCleaner()
+    if name == "soup":
+        return SoupCleaner()
+    raise ValueError(f"Invalid html cleaner '{name}', expected one of {', '.join(CLEANERS)}")
@@ -1,9 +1,11 @@
 import random
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Tuple, Union, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .block import DEFAULT_BLOCKED_RESOURCE_TYPES
 
 
 class BrowserType(str, Enum):
@@ -33,6 +35,35 @@ class BrowserConfig(BaseModel):
     extra_args: Optional[list[str]] = []
 
 
+class PoolConfig(BaseModel):
+    """Browser pool configuration"""
+
+    # number of browser contexts kept alive even when idle, and the upper bound the pool can grow to
+    min_contexts: int = Field(default=1, ge=1)
+    max_contexts: int = Field(default=3, ge=1)
+    # max concurrent pages (tabs) per context, extra requests wait for a free tab
+    max_pages_per_context: int = Field(default=8, ge=1)
+    # seconds a context may stay idle before it is closed, the whole browser is closed when every context is idle
+    idle_timeout: float = 300
+    # recycle a context after it served this many pages or ran for this many seconds, 0 disables
+    recycle_after_pages: int = Field(default=1000, ge=0)
+    recycle_interval: float = Field(default=6 * 3600, ge=0)
+    # resident memory in MB of a browser process tree above which the context stops admitting pages
+    # and is replaced once its in-flight pages are done, 0 disables
+    memory_limit_mb: int = Field(default=0, ge=0)
+    # keep a spare browser launched in the background, promoted at once when a context dies or a new one is needed
+    hot_spare: bool = False
+    # seconds between two runs of the supervisor sampling memory, closing idle contexts and recycling old ones
+    supervise_interval: float = Field(default=30, gt=0)
+    # abort requests to the ad and tracker domains of block_domains and of the blocked resource types
+    block_requests: bool = True
+    blocked_resource_types: List[str] = Field(default_factory=lambda: list(DEFAULT_BLOCKED_RESOURCE_TYPES))
+    # pages opened ahead of time in every new context
+    warm_pages: int = Field(default=2, ge=0)
+    # times a page is reused for another request before it is closed and replaced, 0 disables reuse
+    max_page_reuse: int = Field(default=50, ge=0)
+
+
 class PageConfig(BaseModel):
     """Page configuration"""
 
@@ -117,6 +148,19 @@ class CrawlerConfig(BaseModel):
     fields: List[Union[FieldConfig, str]] = Field(default_factory=list)
 
     return_full_html: bool = False
+    # extract the fields inside the page and return only their values, without cleaned_html and markdown.
+    # Needs a plan of text and attribute fields, the whole page is extracted otherwise
+    extract_in_page: bool = False
+    # links returned in CrewlerResult.links, e.g. the pagination of a search page
+    links_selector: Optional[str] = None
+    # selectors of error pages, e.g. captchas, the first one matching is returned in CrewlerResult.error_match
+    error_selectors: Optional[List[str]] = None
+    # remove the scripts, styles, forms, images and comments the extraction throws away from the page
+    # before it is serialized, the extracted data is the same
+    prune_page: bool = False
+
+    # compiled base_selector and fields, compiled on first use when not set
+    plan: Optional[Any] = Field(default=None, exclude=True)
 
     # Global option for data extraction
     # remove link: try to remove link tag but keep it's content, just for content extraction
@@ -129,8 +173,37 @@ class CrewlerResult(BaseModel):
     title: str = ""
     url: str = ""
     html: str = ""
+    # cleaned body of the page and its markdown, empty until Crawler.render_content renders them
     cleaned_html: str = ""
     markdown: str = ""
     results: Union[List[Dict[str, Any]], Dict[str, Any]] = None
+    # href and stripped text of the elements matching links_selector that have an href
+    links: List[Dict[str, str]] = Field(default_factory=list)
+    # first of the error_selectors matching the page, not checked when the fields are extracted in the page
+    error_match: Optional[str] = None
     success: bool = False
     error_message: Optional[str] = None
+    # status and headers of the main document response, None and empty when the navigation had no response
+    status_code: Optional[int] = None
+    headers: Dict[str, str] = Field(default_factory=dict)
+    # per crawl measurements, e.g. the time spent in each stage
+    metrics: Dict[str, Any] = Field(default_factory=dict)
+
+    # html, url and remove_link of the page while it is not rendered, kept by the crawler
+    _content_source: Optional[Tuple[str, str, bool]] = PrivateAttr(default=None)
+
+    @property
+    def content_source(self) -> Optional[Tuple[str, str, bool]]:
+        """html, url and remove_link of a page whose cleaned_html and markdown are not rendered yet"""
+        return self._content_source
+
+    def keep_content_source(self, html: str, url: str, remove_link: bool):
+        """Keep the page html until the cleaned page is rendered, it is released by set_content"""
+        self._content_source = (html, url, remove_link)
+
+    def set_content(self, cleaned_html: str, markdown: Optional[str] = None):
+        """Set the cleaned page, and its markdown when converted, and release the page html"""
+        self.cleaned_html = cleaned_html
+        if markdown is not None:
+            self.markdown = markdown
+        self._content_source = None
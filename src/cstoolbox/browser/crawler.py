@@ -2,33 +2,94 @@
 Playwright-based web crawler implementation with configuration support.
 """
 
+import json
 import os
 import re
 import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Union
-from urllib.parse import urljoin
-import functools
+from typing import Any, Dict, Optional, Union
 import time
 
-from bs4 import BeautifulSoup, Comment, Tag
+import soupsieve
+from bs4 import BeautifulSoup, Tag
 from markdownify import markdownify
 from playwright.async_api import Page
 
 from cstoolbox.logger import get_logger
 
+from .cleaner import get_cleaner
 from .config import CrawlerConfig, CrewlerResult, EventType, FieldType, PageConfig
+from .extractor import ExtractPool
+from .plan import IN_PAGE_EXTRACT_JS, ExtractionPlan, compile_plan
 from .pool import BrowserPool
-from .block import block_domains
+from .prune import PRUNE_PAGE_JS, prune_args
+from .block import BlockStats, track_blocked
 
 logger = get_logger(__name__)
 
+# selectors of the page title, in order of preference
+_TITLE_SELECTORS = [soupsieve.compile(selector) for selector in ("title", "h1", "h2")]
+
+
+@dataclass
+class CrawlSession:
+    """
+    State of a single crawl call.
+
+    Everything that belongs to one crawl lives here instead of on the Crawler,
+    so any number of crawls can run concurrently with the same Crawler instance.
+    """
+
+    url: str
+    config: CrawlerConfig
+    page: Optional[Page] = None
+    started_at: float = field(default_factory=time.time)
+    # seconds spent in each stage of the crawl
+    timings: Dict[str, float] = field(default_factory=dict)
+    # requests of the page aborted by the request blocker
+    blocked: BlockStats = field(default_factory=BlockStats)
+    # where the fields were extracted, "html" from the serialized page or "page" inside the browser
+    extraction: str = "html"
+    # characters of the page, or of the extracted values, sent by the browser
+    transferred: int = 0
+    # characters pruned from the page before it was serialized
+    pruned: int = 0
+
+    @contextmanager
+    def measure(self, stage: str):
+        """Record the time spent in a stage of the crawl"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = round(self.timings.get(stage, 0) + time.perf_counter() - start, 4)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics of the crawl reported in CrewlerResult.metrics"""
+        return {
+            "timings": dict(self.timings),
+            "extraction": self.extraction,
+            "transferred": self.transferred,
+            "pruned": self.pruned,
+            **self.blocked.as_dict(),
+        }
+
 
 class Crawler:
-    """Playwright-based web crawler"""
+    """Playwright-based web crawler, stateless so it can be shared by concurrent crawls"""
 
-    def __init__(self, browser_pool: BrowserPool):
+    def __init__(self, browser_pool: BrowserPool, extract_pool: Optional[ExtractPool] = None, cleaner: str = "lxml"):
+        """
+        Args:
+            browser_pool: Pool the pages are opened in
+            extract_pool: Workers extracting the crawled pages, None extracts them in the event loop
+            cleaner: HTML cleaner backend, "lxml" or "soup"
+        """
         self.browser_pool = browser_pool
+        self.extract_pool = extract_pool
+        self.cleaner = get_cleaner(cleaner)
 
     async def crawl(self, url: str, config: CrawlerConfig) -> CrewlerResult:
         """
@@ -38,9 +99,7 @@ class Crawler:
             url: URL to crawl
             config: Crawler configuration
         """
-        start_time = time.time()
-
-        self.url = url
+        session = CrawlSession(url=url, config=config)
         page_config = PageConfig(
             wait_for=config.wait_for,
             wait_until=config.wait_until,
@@ -49,14 +108,29 @@ class Crawler:
             init_js_code=config.init_js_code,
         )
 
-        page = await self.browser_pool.new_page(page_config)
-
-        # Block ad requests
-        # await self._block_ad_requests(page)
-
         try:
-            await page.goto(url, timeout=config.page_timeout)
+            async with self.browser_pool.page(page_config) as page:
+                session.page = page
+                session.timings["open_page"] = round(time.time() - session.started_at, 4)
+                with track_blocked(page) as session.blocked:
+                    return await self._crawl_page(session)
+        except Exception as e:
+            logger.error(f"Error crawling {url}: {e}\n{traceback.format_exc()}")
+            return CrewlerResult(
+                error_message=str(e),
+                success=False,
+                metrics=session.metrics(),
+            )
+        finally:
+            logger.info(f"Crawl {url} finished in {time.time() - session.started_at:.2f} seconds")
 
+    async def _crawl_page(self, session: CrawlSession) -> CrewlerResult:
+        """Navigate the session page to the session url and extract the configured data"""
+        page, url, config = session.page, session.url, session.config
+        with session.measure("goto"):
+            response = await page.goto(url, timeout=config.page_timeout)
+
+        with session.measure("interact"):
             if config.events:
                 for event in config.events:
                     if event.event == EventType.Click:
@@ -81,55 +155,161 @@ class Crawler:
                     wait_for = config.wait_for[4:] if config.wait_for.startswith("css:") else config.wait_for
                     await page.wait_for_selector(wait_for, timeout=(config.wait_timeout or 15000))
 
-            body_elm = await page.query_selector('body')
-            if body_elm:
-                body = await body_elm.inner_html()
+        result = None
+        plan = config.plan or compile_plan(config.base_selector, config.fields)
+        if config.extract_in_page and plan.in_page and not config.return_full_html:
+            result = await self._extract_in_page(session, plan)
+
+        if result is None:
+            with session.measure("serialize"):
+                html = await self._serialize(session, plan)
+            session.transferred = len(html)
+            result = await self._extract_html(session, html)
+        result.status_code = response.status if response else None
+        result.headers = response.headers if response else {}
+        result.metrics = session.metrics()
+
+        return result
+
+    async def extract(
+        self, url: str, config: CrawlerConfig, html: str, status_code: Optional[int] = None, headers: Dict[str, str] = None
+    ) -> CrewlerResult:
+        """
+        Extract a page fetched without the browser, the way crawled pages are extracted
+
+        Args:
+            url: URL of the page, after redirects
+            status_code: Status of the response
+            headers: Headers of the response
+        """
+        session = CrawlSession(url=url, config=config)
+        try:
+            result = await self._extract_html(session, html)
+        except Exception as e:
+            logger.error(f"Error extracting {url}: {e}")
+            return CrewlerResult(error_message=str(e), success=False, metrics=session.metrics())
+        result.status_code = status_code
+        result.headers = headers or {}
+        result.metrics = session.metrics()
+        return result
+
+    async def _extract_html(self, session: CrawlSession, html: str) -> CrewlerResult:
+        """Extract a page in the extraction workers when there are some"""
+        url, config = session.url, session.config
+        with session.measure("extract"):
+            if not self.extract_pool:
+                result = self._extract(session, html)
             else:
-                raise Exception("No body tag found in HTML, try to set wait_for to 'body'")
-            html = await page.content()
+                result, timings = await self.extract_pool.extract(url, config, html)
+                session.timings.update(timings)
+        # the page is cleaned by render_content, only when the caller needs it
+        result.keep_content_source(html, url, config.remove_link)
+        return result
+
+    async def _serialize(self, session: CrawlSession, plan: ExtractionPlan) -> str:
+        """Serialize the page, pruned of what the extraction throws away unless the full html is asked for"""
+        config = session.config
+        args = prune_args(plan, config.links_selector) if config.prune_page and not config.return_full_html else None
+        if args is not None:
+            pruned = await session.page.evaluate(PRUNE_PAGE_JS, args)
+            if pruned:
+                session.pruned = pruned["pruned"]
+                return pruned["html"]
+        return await session.page.content()
+
+    async def _extract_in_page(self, session: CrawlSession, plan: ExtractionPlan) -> Optional[CrewlerResult]:
+        """
+        Extract the fields inside the page, only their values are sent by the browser.
+        Returns None when the page could not run the plan, the page html is extracted instead.
+        """
+        url, config = session.url, session.config
+        with session.measure("evaluate"):
+            extracted = await session.page.evaluate(IN_PAGE_EXTRACT_JS, plan.in_page_args(config.links_selector))
+        if not extracted or extracted.get("error"):
+            logger.warning(f"In page extraction of {url} failed, extracting the html: {(extracted or {}).get('error')}")
+            return None
 
-            cleaned_html = self._clean_html_for_content(self._clean_html(body, config.remove_link))
+        session.extraction = "page"
+        session.transferred = len(json.dumps(extracted, ensure_ascii=False))
+        rows = [plan.in_page_row(values) for values in extracted["rows"]]
+        return CrewlerResult(
+            title=next((title.strip() for title in extracted["title"] if title and title.strip()), ""),
+            url=url,
+            results=rows if plan.base is not None else rows[0],
+            links=[{"href": href, "text": text.strip()} for href, text in extracted["links"]],
+            success=True,
+        )
+
+    def _extract(self, session: CrawlSession, html: str) -> CrewlerResult:
+        """
+        Extract the title and the configured fields of a page.
+
+        The page is parsed once, the html and markdown fields are cleaned on copies of their elements.
+        The cleaned page and its markdown are left to render_content.
+        """
+        url, config = session.url, session.config
+        with session.measure("parse"):
             soup = BeautifulSoup(html, 'lxml')
-            result = CrewlerResult(
-                title=self._select_title(soup),
-                url=url,
-                html=html if config.return_full_html else "",
-                cleaned_html=cleaned_html,
-                markdown=self._mark_it_down(cleaned_html),
-            )
+            if soup.body is None:
+                raise Exception("No body tag found in HTML, try to set wait_for to 'body'")
+            page = self.cleaner.load(soup, html)
 
-            data = []
-            if config.base_selector:
-                elements = soup.select(config.base_selector)
-                for element in elements:
-                    item = {}
-                    for field in config.fields:
-                        value = self._select_one(
-                            element, field.selector, field.type, field.attribute, field.remove_link, field.remove_img
-                        )
-                        item[field.name] = value.strip() if value else None
-                    data.append(item)
+        with session.measure("select"):
+            title = self._select_title(soup)
+            plan = config.plan or compile_plan(config.base_selector, config.fields)
+            if plan.base is not None:
+                data = [self._extract_fields(page, plan, element, url) for element in plan.base.select(soup)]
             else:
-                data = {}
-                for field in config.fields:
-                    value = self._select_one(
-                        soup, field.selector, field.type, field.attribute, field.remove_link, field.remove_img
-                    )
-                    data[field.name] = value.strip() if value else None
+                data = self._extract_fields(page, plan, soup, url)
+            links = self._select_links(soup, config.links_selector) if config.links_selector else []
+            error_match = next((s for s in config.error_selectors or () if soup.select_one(s) is not None), None)
+
+        return CrewlerResult(
+            title=title,
+            url=url,
+            html=html if config.return_full_html else "",
+            results=data,
+            links=links,
+            error_match=error_match,
+            success=True,
+        )
 
-            result.results = data
-            result.success = True
+    def clean_page(self, html: str, url: str, remove_link: bool = False) -> str:
+        """
+        Clean the body of a page, the cleaned_html of its result.
+        Args:
+            url: URL of the page, used to resolve relative links
+            remove_link: Remove the links but keep their content
+        """
+        return self.cleaner.clean_content(self.cleaner.load(None, html), remove_link, base_url=url)
 
-            return result
-        except Exception as e:
-            logger.error(f"Error crawling {url}: {e}\n{traceback.format_exc()}")
-            return CrewlerResult(
-                error_message=str(e),
-                success=False,
-            )
-        finally:
-            logger.info(f"Crawl {url} finished in {time.time() - start_time:.2f} seconds")
-            await page.close()
+    async def render_content(self, result: CrewlerResult, markdown: bool = True):
+        """
+        Set the cleaned html of a result, and its markdown, in the extraction workers when there are some.
+        Does nothing when the result has no page html left to render.
+        """
+        source = result.content_source
+        if source is None:
+            return
+        html, url, remove_link = source
+        if self.extract_pool is not None:
+            cleaned_html, converted = await self.extract_pool.render(url, html, remove_link, markdown)
+        else:
+            cleaned_html = self.clean_page(html, url, remove_link)
+            converted = self._mark_it_down(cleaned_html) if markdown and cleaned_html else None
+        result.set_content(cleaned_html, converted)
+
+    def _select_links(self, soup: BeautifulSoup, selector: str) -> list:
+        """
+        Select the links of the page matching a selector.
+        Returns:
+            href and stripped text of the matching elements having an href
+        """
+        return [
+            {"href": link["href"], "text": link.get_text().strip()}
+            for link in soup.select(selector)
+            if link.has_attr("href")
+        ]
 
     def _select_title(self, soup: BeautifulSoup) -> str:
         """
@@ -137,39 +317,71 @@ class Crawler:
         Args:
             soup: BeautifulSoup object
         Returns:
-            Title of the page
+            Title of the page, empty when it has none
         """
-        for selector in ["title", "h1", "h2"]:
-            title = self._select_one(soup, selector, FieldType.TEXT)
+        for selector in _TITLE_SELECTORS:
+            element = selector.select_one(soup)
+            title = element.get_text().strip() if element is not None else None
             if title:
                 return title
+        return ""
 
-    def _select_one(
+    def _extract_fields(
+        self, page: Any, plan: ExtractionPlan, element: Union[BeautifulSoup, Tag], base_url: str
+    ) -> Dict[str, Any]:
+        """
+        Extract the fields of a plan from an element, each distinct selector is evaluated once.
+        Args:
+            page: Page returned by the load method of the cleaner
+            element: Result row, or the whole page
+            base_url: URL of the crawled page, used to resolve relative links
+        Returns:
+            Field values by name
+        """
+        values = [None] * len(plan.names)
+        for group in plan.groups:
+            field_element = group.selector.select_one(element)
+            if field_element is None:
+                continue
+            text = None
+            for field in group.fields:
+                if field.type == FieldType.TEXT:
+                    # fields reading the text of the same element share it
+                    if text is None:
+                        text = field_element.get_text().strip()
+                    value = text
+                else:
+                    value = self._field_value(
+                        page, field_element, field.type, field.attribute, field.remove_link, field.remove_img, base_url
+                    )
+                values[field.index] = value.strip() if value else None
+        return dict(zip(plan.names, values))
+
+    def _field_value(
         self,
-        soup: Union[BeautifulSoup, Tag],
-        selector: str,
+        page: Any,
+        field_element: Tag,
         field_type: FieldType,
         attribute: str = "",
         remove_link: bool = False,
         remove_img: bool = True,
+        base_url: str = "",
     ) -> Any:
         """
-        Select the first element that matches the given CSS selector.
+        Read the value of a field from the element its selector found.
         Args:
-            soup: BeautifulSoup object
-            selector: CSS selector
+            page: Page returned by the load method of the cleaner
+            field_element: Element found by the selector of the field
+            base_url: URL of the crawled page, used to resolve relative links
         Returns:
-            BeautifulSoup object of the first element that matches the selector
+            Value of the field
         """
-        field_element = soup.select_one(selector)
-        if not field_element:
-            return None
-        elif field_type == FieldType.TEXT:
+        if field_type == FieldType.TEXT:
             return field_element.get_text().strip()
         elif field_type == FieldType.HTML:
-            return self._clean_html(str(field_element), remove_link, remove_img)
+            return self.cleaner.clean_element(page, field_element, remove_link, remove_img, base_url)
         elif field_type == FieldType.MARKDOWN:
-            return self._mark_it_down(self._clean_html(str(field_element), remove_link, remove_img))
+            return self._mark_it_down(self.cleaner.clean_element(page, field_element, remove_link, remove_img, base_url))
         elif field_type == FieldType.ATTRIBUTE and attribute:
             return field_element.get(attribute)
         else:
@@ -189,35 +401,6 @@ class Crawler:
             logger.error(f"Error converting HTML to markdown: {e}")
             return ""
 
-    async def _block_ad_requests(self, page: Page):
-        """
-        Block common ad requests using Playwright route interception with glob patterns.
-        Args:
-            page: Playwright page instance
-        """
-
-        # 1. Block specific domains/patterns
-        async def block_domain_handler(route, pattern):
-            # logging.debug(f"Blocking ad domain ({pattern}): {route.request.url}")
-            logger.debug(f"Blocking ad domain ({pattern}): {route.request.url}")
-            await route.abort()
-
-        for pattern in block_domains:
-            # Need to use lambda or functools.partial to capture the pattern correctly in the loop
-            handler = functools.partial(block_domain_handler, pattern=pattern)
-            await page.route(pattern, handler)
-
-        # 2. Block specific resource types first (optional, but potentially cleaner)
-        async def block_resource_types(route):
-            if route.request.resource_type in ["image", "font", "media", "websocket"]:
-                # logging.debug(f"Blocking resource type {route.request.resource_type}: {route.request.url}")
-                # print(f"Blocking resource type {route.request.resource_type}: {route.request.url}")
-                await route.abort()
-            else:
-                await route.continue_()
-
-        await page.route('**/*', block_resource_types)
-
     def _remove_ads(self, html: str) -> str:
         """
         Remove common advertisement elements from HTML content.
@@ -246,155 +429,3 @@ class Crawler:
                 element.decompose()
 
         return str(soup)
-
-    def _clean_html(self, html: str, remove_link: bool = False, remove_img: bool = True) -> str:
-        """
-        Clean HTML content by removing unnecessary tags and attributes.
-        Args:
-            html: HTML content to clean
-        Returns:
-            Cleaned HTML content
-        """
-        soup = BeautifulSoup(html, 'lxml')
-
-        # Remove unwanted tags and comments
-        for tag in soup(
-            [
-                "script",
-                "style",
-                "iframe",
-                "frame",
-                "frameset",
-                "object",
-                "embed",
-                "noscript",
-                "meta",
-                "link",
-                "form",
-                "input",
-                "button",
-                "select",
-                "textarea",
-                "fieldset",
-                "label",
-                "datalist",
-                "output",
-                "option",
-            ]
-        ):
-            tag.decompose()
-
-        # Remove all comments
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.extract()
-
-        # Keep only structural and content tags but preserve essential attributes
-        for tag in soup.find_all(True):
-            if tag.name == "a":
-                if remove_link:
-                    tag.unwrap()
-                else:
-                    # Resolve relative URLs for <a> tags
-                    href = tag.attrs.get("href")
-                    if href:
-                        if href.startswith("javascript:"):
-                            tag.unwrap()
-                            continue
-
-                        try:
-                            href = urljoin(self.url, href)
-                        except:
-                            pass
-                    tag.attrs = {"href": href} if href else {}
-            elif tag.name == "img":
-                if remove_img:
-                    tag.decompose()
-                else:
-                    # Resolve relative URLs for <img> tags
-                    src = tag.attrs.get("src")
-                    if src:
-                        try:
-                            src = urljoin(self.url, src)
-                        except:
-                            pass
-                    tag.attrs = {"src": src} if src else {}
-            elif tag.name in ["table", "td", "th", "tbody", "thead", "tfoot", "tr"]:
-                # Keep rowspan and colspan for table elements
-                attrs = {}
-                if "rowspan" in tag.attrs:
-                    attrs["rowspan"] = tag.attrs["rowspan"]
-                if "colspan" in tag.attrs:
-                    attrs["colspan"] = tag.attrs["colspan"]
-                tag.attrs = attrs
-            elif tag.name in [
-                "div",
-                "p",
-                "h1",
-                "h2",
-                "h3",
-                "h4",
-                "h5",
-                "h6",
-                "ol",
-                "ul",
-                "li",
-                "dl",
-                "dd",
-                "dt",
-                "nav",
-                "footer",
-                "aside",
-                "header",
-                "article",
-                "section",
-                "main",
-            ]:
-                # Keep style for div and span elements
-                tag.attrs = {}
-            else:
-                tag.unwrap()
-
-        # Remove empty tags and whitespace-only tags
-        for tag in soup.find_all(True):
-            if (
-                (not tag.contents or all(c.name in ['br', 'hr'] for c in tag.contents))
-                and (not tag.string or tag.string.strip() == '')
-                and tag.name not in ['br', 'hr', 'img', 'svg', 'figure']
-            ):
-                tag.decompose()
-        # Check if a body tag exists (it almost always will with HTML parsers)
-        if soup.body:
-            # Use decode_contents() to get the inner HTML of the body tag
-            data = soup.body.decode_contents()
-        else:
-            # Fallback in the unlikely case there's no body tag
-            data = str(soup)
-
-        return data.replace('\r', '\n').replace('\n\n', '\n').replace('    ', '  ').replace('\t', '  ').strip()
-
-    def _clean_html_for_content(self, text: str) -> str:
-        # Remove the useless tags
-        useless_tags = [
-            r"<nav[^>]*>[\s\S]*?</nav>",
-            r"<footer[^>]*>[\s\S]*?</footer>",
-            r"<aside[^>]*>[\s\S]*?</aside>",
-            r"<header[^>]*>[\s\S]*?</header>",
-        ]
-        for tag in useless_tags:
-            text = re.sub(tag, "", text.strip())
-
-        # remove multiple <span>
-        text = re.sub(r"(<span[^>]*>)(\s*<span[^>]*>)+", r"\1", text)
-        text = re.sub(r"(</span>)(\s*</span>)+", r"\1", text)
-
-        # simplify li, td, th
-        text = re.sub(r"<li[^>]*>\s*<span[^>]*>([^<>]+?)</span>\s*</li>", r"<li>\1</li>", text)
-        text = re.sub(r"<td[^>]*>\s*<span[^>]*>([^<>]+?)</span>\s*</td>", r"<td>\1</td>", text)
-        text = re.sub(r"<th[^>]*>\s*<span[^>]*>([^<>]+?)</span>\s*</th>", r"<th>\1</th>", text)
-
-        # remove comments
-        text = re.sub(r"<!--.*?-->", "", text)
-        # remove multiple \n
-        text = re.sub(r"(\n\s*){2,}", r"\n\n", text)
-
-        return text
@@ -0,0 +1,165 @@
+"""
+Executor running the CPU bound extraction of crawled pages out of the event loop.
+
+Parsing, cleaning and markdown conversion of a large page take long enough to stall every other
+request served by the event loop. The page html and the crawl configuration are sent to a worker
+thread (or process), only the extracted result comes back. The cleaned page and its markdown are
+rendered by a second job, only when the caller needs them.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from .config import CrawlerConfig, CrewlerResult
+
+EXTRACT_MODES = ("process", "thread", "inline")
+
+# crawlers of the worker by cleaner, created on first use
+_worker_crawlers = {}
+
+
+def _worker_crawler(cleaner: str):
+    from .crawler import Crawler
+
+    crawler = _worker_crawlers.get(cleaner)
+    if crawler is None:
+        crawler = _worker_crawlers[cleaner] = Crawler(browser_pool=None, cleaner=cleaner)
+    return crawler
+
+
+def _extract_in_worker(
+    url: str, config: CrawlerConfig, html: str, cleaner: str, submitted_at: float
+) -> Tuple[CrewlerResult, Dict[str, float], float]:
+    """Extract a page in a worker, return the result, the time of each stage and the time spent queued"""
+    started_at = time.time()
+    from .crawler import CrawlSession
+
+    session = CrawlSession(url=url, config=config)
+    result = _worker_crawler(cleaner)._extract(session, html)
+    return result, session.timings, started_at - submitted_at
+
+
+def _render_in_worker(
+    url: str, html: str, remove_link: bool, markdown: bool, cleaner: str, submitted_at: float
+) -> Tuple[Tuple[str, Optional[str]], Dict[str, float], float]:
+    """Clean a page in a worker and convert it to markdown, return them, the time of each stage and the time queued"""
+    started_at = time.time()
+    crawler = _worker_crawler(cleaner)
+    cleaned_html = crawler.clean_page(html, url, remove_link)
+    timings = {"clean": round(time.time() - started_at, 4)}
+    if markdown:
+        markdown_at = time.time()
+        markdown = crawler._mark_it_down(cleaned_html)
+        timings["markdown"] = round(time.time() - markdown_at, 4)
+    return (cleaned_html, markdown or None), timings, started_at - submitted_at
+
+
+class ExtractPool:
+    """Pool of workers extracting crawled pages, with queue depth and per stage timing statistics"""
+
+    def __init__(self, mode: str = "thread", workers: int = 0, cleaner: str = "lxml"):
+        """
+        Args:
+            mode: "thread" runs extractions in worker threads, "process" in worker processes
+                and "inline" in the event loop. A worker process imports the whole package when it starts,
+                with the state built at import time, so threads are the default
+            workers: Number of workers, 0 uses the number of CPUs, at most 4
+            cleaner: HTML cleaner backend of the extractions, "lxml" or "soup"
+        """
+        if mode not in EXTRACT_MODES:
+            raise ValueError(f"Invalid extract mode '{mode}', expected one of {', '.join(EXTRACT_MODES)}")
+        self.mode = mode
+        self.cleaner = cleaner
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._executor: Optional[Executor] = None
+
+        # extractions submitted and not finished yet
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_time = 0.0
+        self._stage_time: Dict[str, float] = {}
+        self._stage_count: Dict[str, int] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                # spawn, forking a process running the browser driver threads is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        return self._executor
+
+    async def extract(self, url: str, config: CrawlerConfig, html: str) -> Tuple[CrewlerResult, Dict[str, float]]:
+        """
+        Extract a crawled page
+
+        Returns:
+            tuple: The result and the time in seconds spent in each stage, queue wait included
+        """
+        return await self._run(_extract_in_worker, url, config, html)
+
+    async def render(
+        self, url: str, html: str, remove_link: bool = False, markdown: bool = True
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Clean a crawled page, and convert it to markdown
+
+        Returns:
+            tuple: The cleaned html and the markdown, None when markdown is False
+        """
+        rendered, _ = await self._run(_render_in_worker, url, html, remove_link, markdown)
+        return rendered
+
+    async def _run(self, job: Callable, *args) -> Tuple[object, Dict[str, float]]:
+        self._pending += 1
+        try:
+            if self.mode == "inline":
+                output, timings, wait = job(*args, self.cleaner, time.time())
+            else:
+                loop = asyncio.get_running_loop()
+                output, timings, wait = await loop.run_in_executor(
+                    self._get_executor(), job, *args, self.cleaner, time.time()
+                )
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        self._completed += 1
+        self._wait_time += wait
+        for stage, seconds in timings.items():
+            self._stage_time[stage] = self._stage_time.get(stage, 0) + seconds
+            self._stage_count[stage] = self._stage_count.get(stage, 0) + 1
+        return output, {**timings, "extract_wait": round(wait, 4)}
+
+    def stats(self) -> dict:
+        completed = self._completed or 1
+        return {
+            "mode": self.mode,
+            "cleaner": self.cleaner,
+            "workers": self.workers if self.mode != "inline" else 0,
+            "in_flight": self._pending,
+            # extractions waiting for a free worker
+            "queue_depth": max(0, self._pending - self.workers) if self.mode != "inline" else 0,
+            # extraction and render jobs
+            "extractions": self._completed,
+            "extraction_errors": self._failed,
+            "wait_avg_ms": round(self._wait_time / completed * 1000, 2),
+            "stage_avg_ms": {
+                stage: round(t / self._stage_count[stage] * 1000, 2) for stage, t in self._stage_time.items()
+            },
+        }
+
+    def shutdown(self):
+        """Stop the workers, they are started again on the next extraction"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
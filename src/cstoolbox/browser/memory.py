@@ -0,0 +1,119 @@
+"""
+Memory sampling of browser process trees and inspection of the Playwright driver processes.
+
+A browser is identified by its profile directory, which is on the command line of the browser
+process and of its helper processes. psutil is used when it is installed, otherwise the sampler
+falls back to /proc, so it works out of the box on Linux only.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# (pid, parent pid, command line, resident memory in bytes)
+_ProcessInfo = Tuple[int, int, List[str], int]
+
+
+def memory_sampling_available() -> bool:
+    """Whether the memory of browser processes can be sampled on this system"""
+    return psutil is not None or os.path.isdir("/proc/self")
+
+
+def _iter_processes() -> Iterable[_ProcessInfo]:
+    return _iter_processes_psutil() if psutil is not None else _iter_processes_proc()
+
+
+def _iter_processes_psutil() -> Iterable[_ProcessInfo]:
+    for proc in psutil.process_iter(["pid", "ppid", "cmdline", "memory_info"]):
+        info = proc.info
+        if info.get("memory_info") is None:
+            continue
+        yield info["pid"], info["ppid"] or 0, info["cmdline"] or [], info["memory_info"].rss
+
+
+def _iter_processes_proc() -> Iterable[_ProcessInfo]:
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/cmdline", "rb") as f:
+                cmdline = f.read().decode("utf-8", "replace").split("\0")
+            with open(f"/proc/{entry.name}/stat") as f:
+                # the command name may contain spaces, the fields after it are space separated
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry.name}/statm") as f:
+                rss = int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+        yield int(entry.name), ppid, cmdline, rss
+
+
+def sample_browser_memory(user_data_dirs: Iterable[Path]) -> Dict[str, int]:
+    """
+    Sample the resident memory of the browsers using the given profile directories.
+
+    Args:
+        user_data_dirs: Profile directories of the browsers to sample
+
+    Returns:
+        dict: Resident memory in bytes of each browser process tree, keyed by profile directory.
+            Browsers that are not running are left out.
+    """
+    dirs = {str(Path(d).resolve()) for d in user_data_dirs}
+    if not dirs or not memory_sampling_available():
+        return {}
+
+    processes = list(_iter_processes())
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    owners: Dict[str, List[int]] = {}
+    for pid, ppid, cmdline, mem in processes:
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = mem
+        owner = _profile_of(cmdline, dirs)
+        if owner:
+            owners.setdefault(owner, []).append(pid)
+
+    samples = {}
+    for owner, pids in owners.items():
+        seen = set()
+        stack = list(pids)
+        while stack:
+            pid = stack.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            stack.extend(children.get(pid, []))
+        samples[owner] = sum(rss.get(pid, 0) for pid in seen)
+    return samples
+
+
+def count_driver_processes() -> Optional[int]:
+    """Number of Playwright driver processes started by this process, None when it cannot be inspected"""
+    if not memory_sampling_available():
+        return None
+    pid = os.getpid()
+    return sum(1 for _, ppid, cmdline, _ in _iter_processes() if ppid == pid and "run-driver" in cmdline)
+
+
+def _profile_of(cmdline: List[str], dirs: set) -> Optional[str]:
+    """Return the profile directory a command line runs with, chromium uses --user-data-dir=, firefox -profile"""
+    for arg in cmdline:
+        if arg.startswith("--user-data-dir="):
+            value = arg.split("=", 1)[1]
+        elif arg in dirs:
+            value = arg
+        else:
+            continue
+        if value in dirs:
+            return value
+        resolved = str(Path(value).resolve())
+        if resolved in dirs:
+            return resolved
+    return None
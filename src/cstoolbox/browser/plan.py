@@ -0,0 +1,173 @@
+"""
+Compiled extraction plans.
+
+A plan is compiled once from the base selector and the fields of a schema: the selectors are
+compiled, fields using the same selector share one lookup, so each result row runs every distinct
+selector once, however many fields read the element it finds.
+
+Plans made only of text and attribute fields can also run inside the page with IN_PAGE_EXTRACT_JS,
+which returns the field values instead of the whole document.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import soupsieve
+
+# namespaces BeautifulSoup gives the selectors of an html page
+_NAMESPACES = {"xml": "http://www.w3.org/XML/1998/namespace"}
+# field types read without the cleaner, which can be extracted in the page
+IN_PAGE_TYPES = ("text", "attribute")
+
+# Evaluates a plan in the page. Texts are read the way BeautifulSoup's get_text() reads them from the
+# serialized page, the strings are stripped in Python. Returns {error} when a selector is not supported
+# by the browser, like the soupsieve only :-soup-contains().
+IN_PAGE_EXTRACT_JS = """
+({base, groups, size, links}) => {
+    const SKIPPED = new Set(["script", "style", "template"]);
+    const SPACES = /^[ \\n\\t\\f\\r]+$/;
+    const textOf = (root) => {
+        let text = "";
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            const parent = node.parentElement;
+            const name = parent ? parent.localName : "";
+            if (SKIPPED.has(name)) continue;
+            let value = node.data;
+            if (name === "noscript") {
+                // the content of noscript is markup the browser does not parse when scripts run
+                const fragment = document.createElement("template");
+                fragment.innerHTML = value;
+                value = textOf(fragment.content);
+            } else if (SPACES.test(value) && !parent.closest("pre, textarea")) {
+                // the parser of BeautifulSoup collapses the whitespace only strings
+                value = value.includes("\\n") ? "\\n" : " ";
+            }
+            text += value;
+        }
+        return text;
+    };
+    const extract = (root) => {
+        const values = new Array(size).fill(null);
+        for (const [selector, fields] of groups) {
+            const element = root.querySelector(selector);
+            if (!element) continue;
+            for (const [index, type, attribute] of fields) {
+                values[index] = type === "text" ? textOf(element) : attribute ? element.getAttribute(attribute) : null;
+            }
+        }
+        return values;
+    };
+    try {
+        return {
+            rows: base ? Array.from(document.querySelectorAll(base), extract) : [extract(document)],
+            title: ["title", "h1", "h2"].map((selector) => {
+                const element = document.querySelector(selector);
+                return element ? textOf(element) : null;
+            }),
+            links: links
+                ? Array.from(document.querySelectorAll(links))
+                      .filter((element) => element.hasAttribute("href"))
+                      .map((element) => [element.getAttribute("href"), textOf(element)])
+                : [],
+        };
+    } catch (error) {
+        return {error: String(error)};
+    }
+}
+"""
+
+
+class PlanField(NamedTuple):
+    """Field of a plan, with its index among the fields of the schema"""
+
+    index: int
+    name: str
+    type: str
+    attribute: Optional[str]
+    remove_link: bool
+    remove_img: bool
+
+
+class SelectorGroup(NamedTuple):
+    """A compiled selector and the fields reading the element it finds"""
+
+    selector: Any
+    fields: Tuple[PlanField, ...]
+
+
+class ExtractionPlan:
+    """Compiled base selector and fields of a schema, get one with compile_plan"""
+
+    def __init__(self, key: Tuple):
+        base_selector, fields = key
+        self.key = key
+        self.base_selector = base_selector
+        self.base = soupsieve.compile(base_selector, namespaces=_NAMESPACES) if base_selector else None
+        self.names: List[str] = [field[0] for field in fields]
+        self.types: List[str] = [field[2] for field in fields]
+        # whether the plan can run in the page, see IN_PAGE_EXTRACT_JS
+        self.in_page = all(type in IN_PAGE_TYPES for type in self.types)
+
+        groups = {}
+        for index, (name, selector, type, attribute, remove_link, remove_img) in enumerate(fields):
+            groups.setdefault(selector, []).append(PlanField(index, name, type, attribute, remove_link, remove_img))
+        self.groups: List[SelectorGroup] = [
+            SelectorGroup(soupsieve.compile(selector, namespaces=_NAMESPACES), tuple(group))
+            for selector, group in groups.items()
+        ]
+
+    def in_page_args(self, links_selector: Optional[str] = None) -> dict:
+        """Argument of IN_PAGE_EXTRACT_JS"""
+        return {
+            "base": self.base_selector,
+            "groups": [
+                [group.selector.pattern, [[field.index, field.type, field.attribute] for field in group.fields]]
+                for group in self.groups
+            ],
+            "size": len(self.names),
+            "links": links_selector,
+        }
+
+    def in_page_row(self, values: List[Optional[str]]) -> Dict[str, Any]:
+        """Field values of a row extracted in the page, stripped the way the fields are stripped in Python"""
+        row = []
+        for type, value in zip(self.types, values):
+            if value and type == "text":
+                # texts are stripped before the emptiness check, attributes after
+                value = value.strip()
+            row.append(value.strip() if value else None)
+        return dict(zip(self.names, row))
+
+    def __reduce__(self):
+        # sent to the extraction workers as its key, each worker compiles a plan once
+        return _compile, (self.key,)
+
+    def stats(self) -> dict:
+        return {"fields": len(self.names), "selectors": len(self.groups)}
+
+
+@lru_cache(maxsize=256)
+def _compile(key: Tuple) -> ExtractionPlan:
+    return ExtractionPlan(key)
+
+
+def plan_key(base_selector: Optional[str], fields: Sequence[Any]) -> Tuple:
+    """Hashable description of a schema, fields are any objects with the attributes of FieldConfig"""
+    return (
+        base_selector or None,
+        tuple(
+            (field.name, field.selector, str(field.type), field.attribute, bool(field.remove_link), bool(field.remove_img))
+            for field in fields
+        ),
+    )
+
+
+def compile_plan(base_selector: Optional[str], fields: Sequence[Any]) -> ExtractionPlan:
+    """
+    Compile the extraction plan of a schema, plans are cached so a schema is compiled once
+
+    Raises:
+        soupsieve.SelectorSyntaxError: A selector is invalid
+    """
+    return _compile(plan_key(base_selector, fields))
@@ -2,13 +2,17 @@
 Playwright browser implementation for web crawling.
 """
 
+import asyncio
 import os
+import time
 from pathlib import Path
+from typing import Optional, Set
 from appdirs import user_cache_dir
 
-from playwright.async_api import BrowserContext, async_playwright
+from playwright.async_api import BrowserContext, Playwright, async_playwright
 
 from . import BrowserConfig, BrowserType
+from .memory import count_driver_processes
 from cstoolbox.logger import get_logger
 
 logger = get_logger(__name__)
@@ -101,6 +105,87 @@ IGNORE_ARGS = [
 ]
 
 
+class PlaywrightDriver:
+    """
+    Playwright driver shared by every browser launch of the process.
+
+    The driver is a Node process. It is started on first use, restarted when its connection is lost,
+    and stopped when the last PlaywrightManager using it is closed.
+    """
+
+    def __init__(self):
+        self._playwright: Optional[Playwright] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = asyncio.Lock()
+        self._users: Set["PlaywrightManager"] = set()
+        self.starts = 0
+        # driver processes counted when the driver was last started or stopped
+        self.processes: Optional[int] = None
+
+    async def _is_healthy(self) -> bool:
+        """Whether the driver answers, checked with a request context that needs a round trip to it"""
+        if self._playwright is None or self._loop is not asyncio.get_running_loop():
+            return False
+        try:
+            request = await asyncio.wait_for(self._playwright.request.new_context(), timeout=5)
+            await request.dispose()
+            return True
+        except Exception:
+            return False
+
+    async def acquire(self, user: "PlaywrightManager") -> Playwright:
+        """Get the running driver, starting it if needed"""
+        async with self._lock:
+            self._users.add(user)
+            if not await self._is_healthy():
+                if self._playwright is not None:
+                    logger.warning("Playwright driver connection lost, restarting it")
+                    await self._stop()
+                self._playwright = await async_playwright().start()
+                self._loop = asyncio.get_running_loop()
+                self.starts += 1
+                logger.info("Playwright driver started")
+                await self._count_processes()
+            return self._playwright
+
+    async def release(self, user: "PlaywrightManager"):
+        """Stop using the driver, the driver is stopped when it has no more users"""
+        async with self._lock:
+            self._users.discard(user)
+            if not self._users and self._playwright is not None:
+                await self._stop()
+                logger.info("Playwright driver stopped")
+                await self._count_processes()
+
+    async def _stop(self):
+        playwright, self._playwright = self._playwright, None
+        # a driver started by a loop that is gone cannot be stopped from this one, its process went with it
+        if self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await playwright.stop()
+        except Exception as e:
+            logger.warning(f"Error stopping Playwright driver: {e}")
+
+    async def _count_processes(self):
+        # scanning the processes blocks, it only runs when the driver is started or stopped
+        self.processes = await asyncio.to_thread(count_driver_processes)
+
+    def stats(self) -> dict:
+        """Driver status"""
+        return {
+            "running": self._playwright is not None,
+            "starts": self.starts,
+            "users": len(self._users),
+            # actual driver processes, more than one means a driver leaked
+            "processes": self.processes,
+        }
+
+
+# Driver shared by all the browser pools of the process
+playwright_driver = PlaywrightDriver()
+
+
 class PlaywrightManager:
     """Playwright implementation of browser pool"""
 
@@ -135,9 +220,30 @@ class PlaywrightManager:
 
         self.config = config
 
-    async def launch_browser(self) -> BrowserContext:
-        """Launch browser with configuration"""
-        playwright = await async_playwright().start()
+        # browser launch latency
+        self.launches = 0
+        self.launch_time = 0.0
+        self.last_launch_time = 0.0
+
+    def user_data_dir(self, profile: Optional[str] = None) -> Path:
+        """Get the profile directory a browser launched with the given profile name uses"""
+        if profile:
+            return Path(user_cache_dir("cstoolbox")) / self.config.type / profile
+        if self.config.user_data_dir:
+            return Path(os.path.expanduser(self.config.user_data_dir))
+        # 如果没有提供user_data_dir，使用缓存目录
+        return Path(user_cache_dir("cstoolbox")) / self.config.type
+
+    async def launch_browser(self, profile: Optional[str] = None) -> BrowserContext:
+        """
+        Launch browser with configuration
+
+        Args:
+            profile: Name of a dedicated profile directory under the cache dir. Every running persistent
+                context needs its own profile, so the pool passes one for each extra context.
+        """
+        start = time.perf_counter()
+        playwright = await playwright_driver.acquire(self)
 
         launch_options = {
             "headless": self.config.headless,
@@ -149,24 +255,14 @@ class PlaywrightManager:
             "ignore_default_args": IGNORE_ARGS,
         }
 
-        if self.config.user_data_dir:
-            user_data_dir = Path(os.path.expanduser(self.config.user_data_dir))
-            if not user_data_dir.exists():
-                try:
-                    os.makedirs(user_data_dir, exist_ok=True)
-                except Exception as e:
-                    logger.warning(f"Failed to setup user data dir: {e}")
-            launch_options["user_data_dir"] = str(user_data_dir)
-            logger.info(f"Using user data dir: {user_data_dir}")
-        else:
-            # 如果没有提供user_data_dir，创建一个临时目录
-            user_data_dir = Path(user_cache_dir("cstoolbox")) / self.config.type
+        user_data_dir = self.user_data_dir(profile)
+        if not user_data_dir.exists():
             try:
                 os.makedirs(user_data_dir, exist_ok=True)
             except Exception as e:
                 logger.warning(f"Failed to setup user data dir: {e}")
-            launch_options["user_data_dir"] = str(user_data_dir)
-            logger.info(f"Using user data dir: {user_data_dir}")
+        launch_options["user_data_dir"] = str(user_data_dir)
+        logger.info(f"Using user data dir: {user_data_dir}")
 
         if self.config.executable_path:
             launch_options["executable_path"] = self.config.executable_path
@@ -177,8 +273,25 @@ class PlaywrightManager:
             launch_options["viewport"] = self.config.viewport
 
         if self.config.type == BrowserType.CHROMIUM:
-            return await playwright.chromium.launch_persistent_context(**launch_options)
+            context = await playwright.chromium.launch_persistent_context(**launch_options)
         elif self.config.type == BrowserType.FIREFOX:
-            return await playwright.firefox.launch_persistent_context(**launch_options)
+            context = await playwright.firefox.launch_persistent_context(**launch_options)
         else:
-            return await playwright.webkit.launch_persistent_context(**launch_options)
+            context = await playwright.webkit.launch_persistent_context(**launch_options)
+
+        self.launches += 1
+        self.last_launch_time = time.perf_counter() - start
+        self.launch_time += self.last_launch_time
+        return context
+
+    async def close(self):
+        """Release the shared Playwright driver, call after every browser of this manager is closed"""
+        await playwright_driver.release(self)
+
+    def stats(self) -> dict:
+        """Browser launch latency"""
+        return {
+            "browser_launches": self.launches,
+            "browser_launch_last_ms": round(self.last_launch_time * 1000, 1),
+            "browser_launch_avg_ms": round(self.launch_time / self.launches * 1000, 1) if self.launches else 0,
+        }
@@ -6,57 +6,439 @@ Contains:
 """
 
 import asyncio
-from typing import Optional
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Set
 
-from playwright.async_api import Browser, BrowserContext, Page
+from playwright.async_api import BrowserContext, Page
 
-from .config import BrowserConfig, PageConfig
+from .block import RequestBlocker
+from .config import BrowserConfig, PageConfig, PoolConfig
+from .memory import memory_sampling_available, sample_browser_memory
 from .playwright_manager import PlaywrightManager
-from cstoolbox.config import server_root
 from cstoolbox.logger import get_logger
 
 logger = get_logger(__name__)
 
+# default timeout of the page operations in ms, Playwright's, for the requests not setting page_timeout
+DEFAULT_PAGE_TIMEOUT = 30000
+
+
+class _PooledPage:
+    """A page kept open between requests"""
+
+    def __init__(self, page: Page):
+        self.page = page
+        self.uses = 0
+
+
+class _ContextSlot:
+    """A browser context of the pool and the tabs admitted to it"""
+
+    def __init__(self, index: int, max_pages: int, profile: Optional[str] = None):
+        self.index = index
+        # profile directory name, None uses the configured profile
+        self.profile = profile
+        self.context: Optional[BrowserContext] = None
+        self.semaphore = asyncio.BoundedSemaphore(max_pages)
+        self.lock = asyncio.Lock()
+        # pages admitted to this slot, including the ones still waiting for a free tab
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        # warm pages ready to be handed out
+        self.idle_pages: List[_PooledPage] = []
+        # recycling state: launch time and pages served by the current context,
+        # a draining slot admits no new pages and is closed once its last page is done
+        self.created_at = time.monotonic()
+        self.pages_served = 0
+        self.draining = False
+        # a context retired for its memory keeps its place in max_contexts until it is closed,
+        # so the replacement is only launched once the memory is given back
+        self.holds_capacity = False
+        # last sampled resident memory of the browser process tree in bytes
+        self.memory = 0
+
+
+class _Spare:
+    """Hot spare browser context, launched in the background and promoted when a context is needed"""
+
+    def __init__(self, profile: Optional[str]):
+        self.profile = profile
+        # None while the spare is still launching
+        self.context: Optional[BrowserContext] = None
+
 
 class BrowserPool:
-    """Browser pool for managing browser instances"""
+    """Browser pool managing several browser contexts with a bounded number of tabs each"""
 
-    def __init__(self, config: BrowserConfig):
+    def __init__(self, config: BrowserConfig, pool_config: Optional[PoolConfig] = None, name: str = ""):
+        """
+        Args:
+            config: Browser configuration
+            pool_config: Pool sizing, defaults to PoolConfig()
+            name: Name of the pool, pools with a name keep all their profiles in the cache dir
+        """
         self.playwright_manager = PlaywrightManager(config)
+        self.pool_config = pool_config or PoolConfig()
+        self.name = name
+        self.blocker = RequestBlocker(self.pool_config.blocked_resource_types) if self.pool_config.block_requests else None
 
-        self._browser_context: Optional[BrowserContext] = None
+        self._slots: List[_ContextSlot] = []
         self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._supervisor: Optional[asyncio.Task] = None
+        self._slot_removed = asyncio.Event()
+        self._contexts_recycled = 0
+        self._memory_rotations = 0
+        self._memory_peak = 0
+        # profiles of contexts removed from the pool that are still shutting down
+        self._closing_profiles: Set[Optional[str]] = set()
+        self._spare: Optional[_Spare] = None
+        self._spare_promotions = 0
 
-    async def _get_context(self) -> BrowserContext:
-        """Get or create context instance with health check"""
-        async with self._lock:
-            if self._browser_context is None or (
-                self._browser_context.browser is not None and not self._browser_context.browser.is_connected()
-            ):
-                if self._browser_context:
-                    await self._browser_context.close()
-                    self._browser_context = None
-                self._browser_context = await self.playwright_manager.launch_browser()
-                await self._browser_context.add_init_script(
-                    script='Object.defineProperty(navigator, "webdriver", {get: () => false,});'
-                )
-                logger.info(f"Browser context created: {self.playwright_manager.config.type}")
-        return self._browser_context
-
-    # async def initialize(self):
-    #     """Initialize browser and context"""
-    #     try:
-    #         page = await self.new_page(PageConfig())
-    #         page.goto(f"https://www.bing.com")
-    #     except Exception as e:
-    #         logger.warning(f"Error initializing browser: {e}")
-    #     finally:
-    #         if page:
-    #             await page.close()
-
-    async def new_page(self, config: PageConfig) -> Page:
-        """Create new page with given configuration and health check"""
-        context = await self._get_context()
+        # page reuse statistics
+        self._page_hits = 0
+        self._page_misses = 0
+        self._pages_created = 0
+        self._pages_recycled = 0
+        self._page_create_time = 0.0
+
+    @property
+    def load(self) -> int:
+        """Number of pages currently open or waiting for a tab"""
+        return sum(slot.in_flight for slot in self._slots)
+
+    @property
+    def capacity(self) -> int:
+        """Number of pages the pool can open at the same time"""
+        return self.pool_config.max_contexts * self.pool_config.max_pages_per_context
+
+    def _profile(self, index: int) -> Optional[str]:
+        """The first context of an unnamed pool uses the configured profile, every other context gets its own"""
+        if not self.name:
+            return f"ctx-{index}" if index else None
+        return f"{self.name}-ctx-{index}" if index else self.name
+
+    def _free_profile(self) -> Optional[str]:
+        """Get a profile no running or starting browser of the pool is using"""
+        used = {slot.profile for slot in self._slots} | self._closing_profiles
+        if self._spare is not None:
+            used.add(self._spare.profile)
+        return next(profile for profile in map(self._profile, itertools.count()) if profile not in used)
+
+    async def _launch(self, profile: Optional[str]) -> BrowserContext:
+        context = await self.playwright_manager.launch_browser(profile)
+        await context.add_init_script(script='Object.defineProperty(navigator, "webdriver", {get: () => false,});')
+        if self.blocker:
+            await context.route("**/*", self.blocker.handle)
+        return context
+
+    async def _get_context(self, slot: _ContextSlot) -> BrowserContext:
+        """
+        Get or create the context of a slot with health check.
+        A ready hot spare is promoted instead of launching a browser, the slot's profile then goes to the next spare.
+        """
+        async with slot.lock:
+            if slot.context is None or (slot.context.browser is not None and not slot.context.browser.is_connected()):
+                if slot.context:
+                    await self._close_context(slot)
+                spare = self._take_spare()
+                if spare:
+                    context = spare.context
+                    slot.profile = spare.profile
+                    self._spare_promotions += 1
+                    logger.info(f"Hot spare browser promoted to context #{slot.index}")
+                else:
+                    context = await self._launch(slot.profile)
+                context.on("close", lambda _: self._on_context_closed(slot, context))
+                slot.context = context
+                slot.created_at = time.monotonic()
+                slot.pages_served = 0
+                logger.info(f"Browser context #{slot.index} created: {self.playwright_manager.config.type}")
+                if self.pool_config.max_page_reuse:
+                    self._spawn(self._warm_pages(slot, context))
+                self._ensure_spare()
+        return slot.context
+
+    def _take_spare(self) -> Optional[_Spare]:
+        spare = self._spare
+        if spare is None or spare.context is None:
+            return None
+        self._spare = None
+        return spare
+
+    def _ensure_spare(self):
+        """Start launching a hot spare browser in the background if the pool keeps one and has none"""
+        if self.pool_config.hot_spare and self._spare is None:
+            self._spare = _Spare(self._free_profile())
+            self._spawn(self._build_spare(self._spare))
+
+    async def _build_spare(self, spare: _Spare):
+        try:
+            context = await self._launch(spare.profile)
+        except Exception as e:
+            logger.warning(f"Error launching hot spare browser: {e}")
+            if self._spare is spare:
+                self._spare = None
+            return
+        if self._spare is not spare:
+            # the pool was closed or went idle while the spare was launching
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"Error closing hot spare browser: {e}")
+            return
+        context.on("close", lambda _: self._on_spare_closed(spare))
+        spare.context = context
+        logger.info("Hot spare browser ready")
+
+    def _on_spare_closed(self, spare: _Spare):
+        """Forget a spare that crashed, a new one is launched with the next context"""
+        if self._spare is spare:
+            logger.warning("Hot spare browser closed")
+            self._spare = None
+
+    async def _drop_spare(self):
+        spare, self._spare = self._spare, None
+        if spare is not None and spare.context is not None:
+            try:
+                await spare.context.close()
+            except Exception as e:
+                logger.warning(f"Error closing hot spare browser: {e}")
+
+    def _on_context_closed(self, slot: _ContextSlot, context: BrowserContext):
+        """Forget a context that was closed or crashed, the next request promotes the spare or relaunches it"""
+        if slot.context is context:
+            logger.warning(f"Browser context #{slot.index} closed")
+            slot.context = None
+            slot.idle_pages.clear()
+
+    async def _acquire_slot(self) -> _ContextSlot:
+        """
+        Admit a page to the least loaded context, growing the pool when every context is full.
+        Draining contexts are skipped and, unless they were retired for their memory, do not count against
+        max_contexts, so a context that is being recycled is replaced right away instead of making new
+        requests wait for it.
+        """
+        max_pages = self.pool_config.max_pages_per_context
+        while True:
+            async with self._lock:
+                self._ensure_supervisor()
+                active = [s for s in self._slots if not s.draining]
+                counted = len(active) + sum(1 for s in self._slots if s.draining and s.holds_capacity)
+                slot = min(active, key=lambda s: s.in_flight, default=None)
+                if (slot is None or slot.in_flight >= max_pages) and counted < self.pool_config.max_contexts:
+                    used = {s.index for s in self._slots}
+                    index = next(i for i in range(len(used) + 1) if i not in used)
+                    slot = _ContextSlot(index, max_pages, self._free_profile())
+                    self._slots.append(slot)
+                    self._slots.sort(key=lambda s: s.index)
+                if slot is not None:
+                    slot.in_flight += 1
+                    break
+                # every context is draining for its memory, wait until one of them is closed
+                slot_removed = self._slot_removed
+            await slot_removed.wait()
+
+        try:
+            await slot.semaphore.acquire()
+        except BaseException:
+            slot.in_flight -= 1
+            raise
+        return slot
+
+    def _release_slot(self, slot: _ContextSlot):
+        slot.in_flight -= 1
+        slot.pages_served += 1
+        slot.last_used = time.monotonic()
+        slot.semaphore.release()
+
+        recycle_after_pages = self.pool_config.recycle_after_pages
+        if slot.draining:
+            if slot.in_flight == 0:
+                self._remove_slot(slot)
+        elif recycle_after_pages and slot.pages_served >= recycle_after_pages:
+            self._retire(slot, f"served {slot.pages_served} pages")
+
+    def _retire(self, slot: _ContextSlot, reason: str, holds_capacity: bool = False):
+        """Stop admitting pages to a context and close it as soon as its in-flight pages are done"""
+        logger.info(f"Recycling browser context #{slot.index}: {reason}")
+        slot.draining = True
+        slot.holds_capacity = holds_capacity
+        self._contexts_recycled += 1
+        if slot.in_flight == 0:
+            self._remove_slot(slot)
+
+    def _remove_slot(self, slot: _ContextSlot):
+        if slot in self._slots:
+            self._slots.remove(slot)
+            self._closing_profiles.add(slot.profile)
+            self._spawn(self._close_slot(slot))
+            self._slot_removed.set()
+            self._slot_removed = asyncio.Event()
+
+    def _ensure_supervisor(self):
+        if self._supervisor is None or self._supervisor.done():
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _supervise(self):
+        """Background loop closing idle contexts and recycling contexts that are due"""
+        while True:
+            await asyncio.sleep(self.pool_config.supervise_interval)
+            try:
+                await self._check_memory()
+                self._reap()
+            except Exception as e:
+                logger.warning(f"Error supervising browser pool: {e}")
+
+    async def _check_memory(self):
+        """Sample the memory of every browser and retire the ones above memory_limit_mb"""
+        slots = {
+            str(self.playwright_manager.user_data_dir(slot.profile).resolve()): slot
+            for slot in self._slots
+            if slot.context is not None
+        }
+        if not slots or not memory_sampling_available():
+            return
+
+        samples = await asyncio.to_thread(sample_browser_memory, slots.keys())
+        for path, slot in slots.items():
+            slot.memory = samples.get(path, 0)
+        self._memory_peak = max(self._memory_peak, sum(slot.memory for slot in self._slots))
+
+        limit = self.pool_config.memory_limit_mb * 1024 * 1024
+        if not limit:
+            return
+        for slot in slots.values():
+            if not slot.draining and slot.memory > limit:
+                self._memory_rotations += 1
+                self._retire(slot, f"memory {slot.memory // (1024 * 1024)} MB over the limit", holds_capacity=True)
+
+    def _reap(self):
+        """
+        Close idle contexts and retire the ones due for a scheduled recycle.
+
+        When every context has been idle for idle_timeout the whole browser is closed, the next request
+        launches it again. Otherwise only the extra contexts above min_contexts are closed.
+        """
+        now = time.monotonic()
+        idle = [s for s in self._slots if s.in_flight == 0 and now - s.last_used > self.pool_config.idle_timeout]
+        if idle and len(idle) == len(self._slots):
+            logger.info(f"Closing idle browser pool {self.name or 'worker-0'}")
+            for slot in idle:
+                self._remove_slot(slot)
+            self._spawn(self._drop_spare())
+        else:
+            for slot in reversed(idle):
+                if len(self._slots) <= self.pool_config.min_contexts:
+                    break
+                logger.info(f"Closing idle browser context #{slot.index}")
+                self._remove_slot(slot)
+
+        recycle_interval = self.pool_config.recycle_interval
+        if recycle_interval:
+            for slot in list(self._slots):
+                if not slot.draining and slot.context is not None and now - slot.created_at > recycle_interval:
+                    self._retire(slot, f"running for {int(now - slot.created_at)} seconds")
+
+    def _spawn(self, coro):
+        """Run a housekeeping coroutine in the background, keeping a reference until it is done"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def initialize(self, preload_urls: Optional[List[str]] = None):
+        """
+        Warm up the pool: launch the browser, open the warm pages and visit the given URLs,
+        so the first requests skip the driver start, the browser launch and the first TLS handshakes.
+        """
+
+        async def preload(url: Optional[str]):
+            async with self.page(PageConfig()) as page:
+                if url:
+                    try:
+                        await page.goto(url, wait_until="domcontentloaded")
+                    except Exception as e:
+                        logger.warning(f"Error preloading {url}: {e}")
+
+        await asyncio.gather(*(preload(url) for url in (preload_urls or [None])))
+
+    @asynccontextmanager
+    async def page(self, config: PageConfig) -> AsyncIterator[Page]:
+        """
+        Open a configured page in the least loaded context.
+        The page is closed and its tab given back to the pool when the block exits.
+        """
+        slot = await self._acquire_slot()
+        pooled = None
+        reusable = False
+        try:
+            context = await self._get_context(slot)
+            pooled = await self._checkout_page(slot, context, config)
+            yield pooled.page
+            # init scripts cannot be removed from a page, and a failed request may leave it in any state
+            reusable = not config.init_js_code
+        finally:
+            if pooled:
+                pooled.uses += 1
+                if reusable and pooled.uses < self.pool_config.max_page_reuse:
+                    self._spawn(self._checkin_page(slot, pooled))
+                else:
+                    if reusable and self.pool_config.max_page_reuse:
+                        self._pages_recycled += 1
+                    await self._close_page(pooled.page)
+            self._release_slot(slot)
+
+    async def _checkout_page(self, slot: _ContextSlot, context: BrowserContext, config: PageConfig) -> _PooledPage:
+        """Hand out a warm page of the slot, or create a new one when none is available"""
+        while slot.idle_pages and not config.init_js_code:
+            pooled = slot.idle_pages.pop()
+            if pooled.page.is_closed():
+                continue
+            self._page_hits += 1
+            # not the timeout of the request that used the page last
+            pooled.page.set_default_timeout(config.page_timeout or DEFAULT_PAGE_TIMEOUT)
+            return pooled
+
+        self._page_misses += 1
+        return _PooledPage(await self._new_page(context, config))
+
+    async def _checkin_page(self, slot: _ContextSlot, pooled: _PooledPage):
+        """Reset a used page and keep it for the next request"""
+        try:
+            await pooled.page.unroute_all(behavior="ignoreErrors")
+            await pooled.page.goto("about:blank")
+        except Exception as e:
+            logger.debug(f"Error resetting page, closing it: {e}")
+            await self._close_page(pooled.page)
+            return
+        if slot.context is not None and len(slot.idle_pages) < self.pool_config.max_pages_per_context:
+            slot.idle_pages.append(pooled)
+        else:
+            await self._close_page(pooled.page)
+
+    async def _warm_pages(self, slot: _ContextSlot, context: BrowserContext):
+        """Open the configured number of pages ahead of the first requests of a new context"""
+        try:
+            for _ in range(self.pool_config.warm_pages - len(slot.idle_pages)):
+                page = await self._new_page(context, PageConfig())
+                if slot.context is not context:
+                    await self._close_page(page)
+                    return
+                slot.idle_pages.append(_PooledPage(page))
+        except Exception as e:
+            logger.warning(f"Error warming pages of browser context #{slot.index}: {e}")
+
+    async def _close_page(self, page: Page):
+        try:
+            await page.close()
+        except Exception as e:
+            logger.warning(f"Error closing page: {e}")
+
+    async def _new_page(self, context: BrowserContext, config: PageConfig) -> Page:
+        """Create new page with given configuration"""
+        start = time.perf_counter()
         page = await context.new_page()
 
         await page.set_extra_http_headers(
@@ -67,22 +449,71 @@ class BrowserPool:
             config.wait_until = 'domcontentloaded'
         await page.wait_for_load_state(config.wait_until, timeout=config.wait_timeout)
 
-        if config.page_timeout:
-            page.set_default_timeout(config.page_timeout)
+        page.set_default_timeout(config.page_timeout or DEFAULT_PAGE_TIMEOUT)
 
         if config.init_js_code:
             await page.add_init_script(script=config.init_js_code)
 
+        self._pages_created += 1
+        self._page_create_time += time.perf_counter() - start
         return page
 
+    def stats(self) -> dict:
+        """Current pool usage and page reuse statistics"""
+        requests = self._page_hits + self._page_misses
+        avg_create_time = self._page_create_time / self._pages_created if self._pages_created else 0
+        return {
+            "contexts": sum(1 for slot in self._slots if slot.context is not None),
+            "max_contexts": self.pool_config.max_contexts,
+            "max_pages_per_context": self.pool_config.max_pages_per_context,
+            "in_flight": self.load,
+            "draining_contexts": sum(1 for slot in self._slots if slot.draining),
+            "contexts_recycled": self._contexts_recycled,
+            "memory_rss_mb": round(sum(slot.memory for slot in self._slots) / (1024 * 1024), 1),
+            "memory_peak_mb": round(self._memory_peak / (1024 * 1024), 1),
+            "memory_by_context_mb": {slot.index: round(slot.memory / (1024 * 1024), 1) for slot in self._slots},
+            "memory_rotations": self._memory_rotations,
+            "hot_spare": None if self._spare is None else ("ready" if self._spare.context else "launching"),
+            "spare_promotions": self._spare_promotions,
+            **self.playwright_manager.stats(),
+            **(self.blocker.stats() if self.blocker else {}),
+            "idle_pages": sum(len(slot.idle_pages) for slot in self._slots),
+            "pages_created": self._pages_created,
+            "pages_recycled": self._pages_recycled,
+            "page_reuse_hits": self._page_hits,
+            "page_reuse_misses": self._page_misses,
+            "page_reuse_hit_rate": round(self._page_hits / requests, 4) if requests else 0,
+            "page_create_avg_ms": round(avg_create_time * 1000, 2),
+            # estimated from the average creation time of the pages that had to be created
+            "page_create_saved_ms": round(self._page_hits * avg_create_time * 1000, 2),
+        }
+
+    async def _close_slot(self, slot: _ContextSlot):
+        """Close the context of a slot removed from the pool, then give its profile back"""
+        try:
+            await self._close_context(slot)
+        finally:
+            self._closing_profiles.discard(slot.profile)
+
+    async def _close_context(self, slot: _ContextSlot):
+        context, slot.context = slot.context, None
+        slot.idle_pages.clear()
+        if context is None:
+            return
+        try:
+            browser = context.browser
+            await context.close()
+            if browser is not None and browser.is_connected():
+                await browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser context #{slot.index}: {e}")
+
     async def close(self):
-        """Close browser and context"""
-        if self._browser_context:
-            try:
-                if self._browser_context.browser.is_connected():
-                    await self._browser_context.browser.close()
-                await self._browser_context.close()
-            except Exception as e:
-                logger.warning(f"Error closing browser context: {e}")
-            finally:
-                self._browser_context = None
+        """Close browser and contexts"""
+        async with self._lock:
+            if self._supervisor:
+                self._supervisor.cancel()
+                self._supervisor = None
+            slots, self._slots = self._slots, []
+        await asyncio.gather(self._drop_spare(), *(self._close_context(slot) for slot in slots))
+        await self.playwright_manager.close()
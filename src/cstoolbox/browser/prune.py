@@ -0,0 +1,104 @@
+"""
+Pruning of the page before it is serialized.
+
+The cleaner throws away scripts, styles, forms, images and comments of the page, so they are
+dropped in the browser instead of being sent to Python. Nothing the extraction reads is touched:
+elements matched by the selectors of the schema and their ancestors are kept, and inside the
+elements read by the fields only what their text and cleaned html leave out is dropped.
+Removed nodes are replaced by empty comments, which the cleaner removes as well, so the text
+around them is parsed the way it was and the extraction gives the same results.
+"""
+
+import re
+from typing import Optional
+
+from .cleaner import REMOVED_TAGS
+from .plan import ExtractionPlan
+
+# selectors whose matches depend on the siblings or on the content of an element, which pruning changes
+_UNSAFE_SELECTOR = re.compile(r":(?!(?:not|is|where)\()|[+~]")
+
+# dropped inside the elements read by the fields, their text is not part of get_text() either
+_FIELD_REMOVED_TAGS = ("script", "style")
+# dropped elsewhere, images are removed from the cleaned content
+_PAGE_REMOVED_TAGS = tuple(sorted(REMOVED_TAGS | {"img"}))
+
+# Prunes the page and returns {html, pruned}, pruned being the number of characters left out of the html,
+# or null when a selector is not supported by the browser.
+PRUNE_PAGE_JS = """
+({kept, fields, fieldRemoved, pageRemoved}) => {
+    const keep = new Set();
+    const fieldElements = new Set();
+    try {
+        for (const selector of kept) {
+            for (const element of document.querySelectorAll(selector)) {
+                for (let node = element; node && !keep.has(node); node = node.parentElement) keep.add(node);
+            }
+        }
+        for (const selector of fields) {
+            for (const element of document.querySelectorAll(selector)) fieldElements.add(element);
+        }
+    } catch (error) {
+        return null;
+    }
+    fieldRemoved = new Set(fieldRemoved);
+    pageRemoved = new Set(pageRemoved);
+
+    let pruned = 0;
+    const stripAttributes = (element) => {
+        for (const name of element.getAttributeNames()) {
+            pruned += name.length + element.getAttribute(name).length + 4;
+            element.removeAttribute(name);
+        }
+        for (const child of element.children) stripAttributes(child);
+    };
+    const prune = (parent, inField) => {
+        for (let node = parent.firstChild; node; node = node.nextSibling) {
+            if (node.nodeType === Node.COMMENT_NODE) {
+                pruned += node.data.length;
+                node.data = "";
+            } else if (node.nodeType === Node.ELEMENT_NODE) {
+                const name = node.localName;
+                if (keep.has(node)) {
+                    prune(node, inField || fieldElements.has(node));
+                } else if ((inField ? fieldRemoved : pageRemoved).has(name)) {
+                    // the empty comment keeps the text before and after the node apart, like its removal does
+                    const comment = document.createComment("");
+                    pruned += node.outerHTML.length - 7;
+                    node.replaceWith(comment);
+                    node = comment;
+                } else {
+                    // svg is unwrapped by the cleaner, only its text is left
+                    if (name === "svg") stripAttributes(node);
+                    prune(node, inField);
+                }
+            }
+        }
+    };
+    prune(document, false);
+
+    const doctype = document.doctype ? new XMLSerializer().serializeToString(document.doctype) : "";
+    return {html: doctype + document.documentElement.outerHTML, pruned};
+}
+"""
+
+
+def prune_args(plan: ExtractionPlan, links_selector: Optional[str] = None) -> Optional[dict]:
+    """
+    Argument of PRUNE_PAGE_JS for a plan, None when the page can not be pruned without changing
+    what its selectors match
+    """
+    fields = [group.selector.pattern for group in plan.groups]
+    kept = fields + ["title", "h1", "h2"]
+    if plan.base_selector:
+        kept.append(plan.base_selector)
+    if links_selector:
+        kept.append(links_selector)
+    if any(_UNSAFE_SELECTOR.search(selector) for selector in kept):
+        return None
+    return {
+        "kept": kept,
+        "fields": fields,
+        "fieldRemoved": list(_FIELD_REMOVED_TAGS),
+        "pageRemoved": list(_PAGE_REMOVED_TAGS),
+    }
@@ -13,6 +13,37 @@ __all__ = [
     "executable_path",
     "browser_lang",
     "browser_timezone",
+    "browser_max_contexts",
+    "browser_max_pages",
+    "browser_idle_timeout",
+    "browser_warm_pages",
+    "browser_max_page_reuse",
+    "browser_recycle_pages",
+    "browser_recycle_interval",
+    "browser_memory_limit",
+    "browser_hot_spare",
+    "block_requests",
+    "block_resource_types",
+    "browser_workers",
+    "browser_routing",
+    "warmup",
+    "warmup_preload",
+    "search_cache_ttl",
+    "search_cache_negative_ttl",
+    "search_cache_size",
+    "search_cache_ttls",
+    "search_cache_disk",
+    "page_cache_size",
+    "page_cache_fresh_ttl",
+    "page_cache_max_age",
+    "schema_reload_interval",
+    "extract_mode",
+    "extract_workers",
+    "html_cleaner",
+    "search_in_page_extract",
+    "prune_page",
+    "crawl_fetch_mode",
+    "search_hedge",
     "region_urls",
     "server_root",
     "log_level",
@@ -19,6 +19,75 @@ executable_path = os.getenv("CS_EXECUTABLE_PATH")
 browser_lang = os.getenv("CS_BROWSER_LANG")
 browser_timezone = os.getenv("CS_BROWSER_TZ")
 
+# Browser pool: max browser contexts, max concurrent pages (tabs) per context,
+# and seconds a context may stay idle before it is closed (the whole browser once every context is idle).
+browser_max_contexts = int(os.getenv("CS_BROWSER_MAX_CONTEXTS", "3"))
+browser_max_pages = int(os.getenv("CS_BROWSER_MAX_PAGES", "8"))
+browser_idle_timeout = int(os.getenv("CS_BROWSER_IDLE_TIMEOUT", "300"))
+# Pages opened ahead of time in every browser context, and how many requests a page serves before it is replaced.
+browser_warm_pages = int(os.getenv("CS_BROWSER_WARM_PAGES", "2"))
+browser_max_page_reuse = int(os.getenv("CS_BROWSER_MAX_PAGE_REUSE", "50"))
+# Recycle a browser after it served this many pages or ran for this many seconds, 0 disables.
+browser_recycle_pages = int(os.getenv("CS_BROWSER_RECYCLE_PAGES", "1000"))
+browser_recycle_interval = int(os.getenv("CS_BROWSER_RECYCLE_INTERVAL", str(6 * 3600)))
+# Memory limit in MB of one browser process tree, the browser is rotated once it is crossed. 0 disables.
+browser_memory_limit = int(os.getenv("CS_BROWSER_MEMORY_LIMIT", "0"))
+# Keep a warm standby browser for instant failover.
+browser_hot_spare = os.getenv("CS_BROWSER_HOT_SPARE", "false")
+# Abort requests to ad and tracker domains, and of the resource types in CS_BLOCK_RESOURCE_TYPES. Default: "true".
+block_requests = os.getenv("CS_BLOCK_REQUESTS", "true")
+# Comma separated resource types that are never downloaded. Default: "image,font,media,websocket".
+block_resource_types = os.getenv("CS_BLOCK_RESOURCE_TYPES", "image,font,media,websocket")
+
+# Number of independent browser workers, and how requests are routed to them:
+# "domain" keeps each domain on one worker (cookie and session locality), "least_loaded" balances by load.
+browser_workers = int(os.getenv("CS_BROWSER_WORKERS", "1"))
+browser_routing = os.getenv("CS_BROWSER_ROUTING", "domain").lower()
+
+# Warm up the browser in the background when the server starts. Default: "true".
+warmup = os.getenv("CS_WARMUP", "true")
+# Comma separated providers whose base URL is visited during warm-up (e.g. "bing,google"), or "all". Default: none.
+warmup_preload = os.getenv("CS_WARMUP_PRELOAD", "")
+
+# Search result cache: seconds results are cached (0 disables the cache), seconds empty results are cached,
+# and entries kept in memory.
+search_cache_ttl = int(os.getenv("CS_SEARCH_CACHE_TTL", "3600"))
+search_cache_negative_ttl = int(os.getenv("CS_SEARCH_CACHE_NEGATIVE_TTL", "300"))
+search_cache_size = int(os.getenv("CS_SEARCH_CACHE_SIZE", "1000"))
+# TTL overrides in seconds keyed by provider or time period, the shortest applicable one wins.
+search_cache_ttls = os.getenv("CS_SEARCH_CACHE_TTLS", "google_news=600,baidu_news=600,day=600")
+# Also keep the search cache on disk, so it survives restarts. Default: "false".
+search_cache_disk = os.getenv("CS_SEARCH_CACHE_DISK", "false")
+
+# web_crawler page cache: max size in MB of the cached contents (0 disables the cache), seconds an entry is served
+# without asking the site whether the page changed, and seconds after which the page is always crawled again.
+page_cache_size = int(os.getenv("CS_PAGE_CACHE_SIZE", "256"))
+page_cache_fresh_ttl = int(os.getenv("CS_PAGE_CACHE_FRESH_TTL", "600"))
+page_cache_max_age = int(os.getenv("CS_PAGE_CACHE_MAX_AGE", str(7 * 86400)))
+
+# Seconds between two checks of the schema directory for changed schemas, 0 disables reloading.
+schema_reload_interval = float(os.getenv("CS_SCHEMA_RELOAD_INTERVAL", "5"))
+
+# Where crawled pages are parsed, cleaned and converted to markdown: "process" in worker processes,
+# "thread" in worker threads or "inline" in the event loop, and the number of workers (0 uses the CPUs, at most 4).
+extract_mode = os.getenv("CS_EXTRACT_MODE", "thread").lower()
+extract_workers = int(os.getenv("CS_EXTRACT_WORKERS", "0"))
+# HTML cleaner backend: "lxml" cleans the page in a single walk of lxml's tree, "soup" is the reference
+# BeautifulSoup cleaner, both produce the same output.
+html_cleaner = os.getenv("CS_HTML_CLEANER", "lxml").lower()
+# Extract the search results inside the browser page, only the field values are sent back instead of the
+# whole page. Default: "true".
+search_in_page_extract = os.getenv("CS_SEARCH_IN_PAGE_EXTRACT", "true")
+# Remove the scripts, styles, forms, images and comments the extraction throws away from the page in the browser,
+# before the page is sent to the crawler. Default: "true".
+prune_page = os.getenv("CS_PRUNE_PAGE", "true")
+# How web_crawler fetches the pages of the domains whose schema does not set fetch_mode: "auto" with a plain
+# HTTP request first and the browser when the content looks missing or rendered by JavaScript, "http" or "browser".
+crawl_fetch_mode = os.getenv("CS_CRAWL_FETCH_MODE", "auto").lower()
+# Request a result page again in a fresh tab when it is not served by the p90 latency of its provider, the first
+# response wins. Default: "false".
+search_hedge = os.getenv("CS_SEARCH_HEDGE", "false")
+
 # Region specific base URLs
 region_urls = {
     "google": {
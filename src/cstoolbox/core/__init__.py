@@ -1,4 +1,5 @@
 from .base_tool import BaseTool
 from .crawler_manager import crawler_manager
+from .http_client import HttpClient, http_client
 
-__all__ = ["BaseTool", "crawler_manager"]
+__all__ = ["BaseTool", "crawler_manager", "HttpClient", "http_client"]
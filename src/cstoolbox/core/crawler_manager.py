@@ -1,9 +1,15 @@
 import asyncio
+import bisect
+import hashlib
 import os
 from datetime import datetime, timedelta
+from typing import List, Optional
+from urllib.parse import urlparse
 
-from cstoolbox.browser.config import BrowserConfig, BrowserType
+from cstoolbox.browser.config import BrowserConfig, BrowserType, PoolConfig
 from cstoolbox.browser.crawler import Crawler
+from cstoolbox.browser.extractor import ExtractPool
+from cstoolbox.browser.playwright_manager import playwright_driver
 from cstoolbox.browser.pool import BrowserPool
 from cstoolbox.config import config
 from cstoolbox.logger import get_logger
@@ -11,6 +17,22 @@ from cstoolbox.logger import get_logger
 logger = get_logger(__name__)
 
 
+class _HashRing:
+    """Consistent hash ring mapping domains to workers"""
+
+    def __init__(self, nodes: int, replicas: int = 160):
+        self._ring = sorted((self._hash(f"{node}:{i}"), node) for node in range(nodes) for i in range(replicas))
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def get(self, key: str) -> int:
+        """Return the worker owning key"""
+        return self._ring[bisect.bisect(self._keys, self._hash(key)) % len(self._ring)][1]
+
+
 class CrawlerManager:
     """Dynamic browser pool, supports auto expansion/shrinkage and health check"""
 
@@ -30,7 +52,7 @@ class CrawlerManager:
         if timezone:
             extra_args.append(f"--timezone={timezone}")
 
-        self.idle_timeout = timedelta(seconds=300)  # Idle instance timeout
+        self.idle_timeout = timedelta(seconds=config.browser_idle_timeout)  # Idle instance timeout
 
         # pool status
         self._lock = asyncio.Lock()
@@ -46,8 +68,38 @@ class CrawlerManager:
             executable_path=config.executable_path,
             extra_args=extra_args,
         )
-        self.pool = BrowserPool(self.browser_config)
-        self.crawler = Crawler(self.pool)
+        self.pool_config = PoolConfig(
+            max_contexts=config.browser_max_contexts,
+            max_pages_per_context=config.browser_max_pages,
+            idle_timeout=self.idle_timeout.total_seconds(),
+            warm_pages=config.browser_warm_pages,
+            max_page_reuse=config.browser_max_page_reuse,
+            recycle_after_pages=config.browser_recycle_pages,
+            recycle_interval=config.browser_recycle_interval,
+            memory_limit_mb=config.browser_memory_limit,
+            hot_spare=config.browser_hot_spare.lower() == "true",
+            block_requests=config.block_requests.lower() == "true",
+            blocked_resource_types=[t.strip() for t in config.block_resource_types.split(",") if t.strip()],
+        )
+
+        # Each worker is an independent browser pool with its own profiles. Worker 0 keeps the configured
+        # profile, the others get theirs under the cache dir.
+        self.routing = config.browser_routing
+        self.pools: List[BrowserPool] = [
+            BrowserPool(self.browser_config.model_copy(deep=True), self.pool_config, name=f"worker-{k}" if k else "")
+            for k in range(max(1, config.browser_workers))
+        ]
+        # the extraction workers are shared by all browser workers
+        self.extract_pool = ExtractPool(config.extract_mode, config.extract_workers, config.html_cleaner)
+        self.crawlers = [Crawler(pool, self.extract_pool, config.html_cleaner) for pool in self.pools]
+        self._ring = _HashRing(len(self.pools))
+
+        self.pool = self.pools[0]
+        self.crawler = self.crawlers[0]
+
+        # warm-up state: idle, warming_up, ready, failed, or disabled when the browsers launch on the first request
+        self.status = "idle"
+        self._warm_up_task: Optional[asyncio.Task] = None
 
     def _detect_timezone(self) -> str:
         """
@@ -67,28 +119,111 @@ class CrawlerManager:
         # Get system current timezone
         return datetime.now().astimezone().tzinfo.tzname(None) or 'Etc/UTC'
 
-    def initialize(self):
-        """Initialize browser pool"""
-        asyncio.run(self.pool.initialize())
+    def start_warm_up(self):
+        """Start warming up the browsers in the background, see initialize()"""
+        if config.warmup.lower() != "true":
+            self.status = "disabled"
+            return
+        if self._warm_up_task is None or self._warm_up_task.done():
+            self.status = "warming_up"
+            self._warm_up_task = asyncio.create_task(self.initialize())
+
+    @property
+    def ready(self) -> bool:
+        """Whether requests are served without waiting for the warm-up"""
+        return self.status in ("ready", "disabled")
+
+    async def initialize(self):
+        """
+        Initialize browser pool: launch the browser of every worker, open warm pages and
+        preload the base URLs of the providers listed in CS_WARMUP_PRELOAD on the worker they are routed to.
+        """
+        self.status = "warming_up"
+        preload_urls: List[List[str]] = [[] for _ in self.pools]
+        for url in self._preload_urls():
+            preload_urls[self._select_worker(url)].append(url)
 
-    def get_crawler(self):
-        """Get browser instance context manager"""
-        return BrowserContext(self)
+        start = datetime.now()
+        try:
+            await asyncio.gather(*(pool.initialize(urls) for pool, urls in zip(self.pools, preload_urls)))
+        except Exception as e:
+            self.status = "failed"
+            logger.error(f"Browser warm-up failed: {e}")
+            return
+        self.status = "ready"
+        logger.info(f"Browser warm-up finished in {(datetime.now() - start).total_seconds():.2f} seconds")
+
+    def _preload_urls(self) -> List[str]:
+        """Base URLs of the providers to preload, for the configured region"""
+        providers = [p.strip() for p in config.warmup_preload.split(",") if p.strip()]
+        if providers == ["all"]:
+            providers = list(config.region_urls)
+
+        urls = []
+        for provider in providers:
+            region_urls = config.region_urls.get(provider)
+            if not region_urls:
+                logger.warning(f"Unknown provider to preload: {provider}")
+                continue
+            url = region_urls.get(config.region) or region_urls["com"]
+            if url not in urls:
+                urls.append(url)
+        return urls
+
+    def get_crawler(self, url: Optional[str] = None):
+        """
+        Get browser instance context manager
+
+        Args:
+            url: URL that will be crawled, used to route the request to a worker
+        """
+        return BrowserContext(self, url)
+
+    def _select_worker(self, url: Optional[str] = None) -> int:
+        """
+        Pick the worker for a request.
+
+        With domain routing the same domain always goes to the same worker, so cookies and sessions stay
+        in one profile, unless that worker is full. Otherwise the least loaded worker is used.
+        """
+        if len(self.pools) == 1:
+            return 0
+
+        if self.routing == "domain" and url:
+            host = (urlparse(url).hostname or "").removeprefix("www.")
+            if host:
+                worker = self._ring.get(host)
+                if self.pools[worker].load < self.pools[worker].capacity:
+                    return worker
+
+        return min(range(len(self.pools)), key=lambda k: self.pools[k].load)
+
+    def stats(self) -> dict:
+        """Browser pool statistics"""
+        return {
+            "driver": playwright_driver.stats(),
+            "routing": self.routing,
+            "extract": self.extract_pool.stats(),
+            "workers": [{"name": pool.name or "worker-0", **pool.stats()} for pool in self.pools],
+        }
 
     async def close(self):
         """Close browser pool"""
-        if self.pool:
-            await self.pool.close()
+        if self._warm_up_task and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+        await asyncio.gather(*(pool.close() for pool in self.pools))
+        self.extract_pool.shutdown()
 
 
 class BrowserContext:
     """Browser instance context manager"""
 
-    def __init__(self, manager: CrawlerManager):
+    def __init__(self, manager: CrawlerManager, url: Optional[str] = None):
         self.manager = manager
+        self.url = url
 
     async def __aenter__(self) -> Crawler:
-        return self.manager.crawler
+        return self.manager.crawlers[self.manager._select_worker(self.url)]
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Return browser instance to pool"""
@@ -97,4 +232,3 @@ class BrowserContext:
 
 # Global browser pool instance
 crawler_manager = CrawlerManager()
-# asyncio.run(crawler_manager.pool.initialize())
@@ -0,0 +1,55 @@
+"""
+Shared aiohttp client for the requests made without a browser.
+"""
+
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+from cstoolbox.config import config
+
+# desktop Chrome, sites serve the same document to it as to the browser
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+
+
+class HttpClient:
+    """One aiohttp session shared by every caller, so connections and TLS sessions are reused"""
+
+    def __init__(self, timeout: float = 15, limit: int = 100):
+        """
+        Args:
+            timeout: Total timeout in seconds of a request
+            limit: Max open connections
+        """
+        self.timeout = timeout
+        self.limit = limit
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def proxy(self) -> Optional[str]:
+        return config.proxy or None
+
+    def session(self) -> aiohttp.ClientSession:
+        """Get the shared session, created on first use in the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.limit, ttl_dns_cache=300),
+                headers={"User-Agent": USER_AGENT},
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HttpClient()
@@ -8,11 +8,17 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from urllib.parse import unquote, urlparse
 
-from .core import crawler_manager
+from .core import crawler_manager, http_client
 from .config import config
 from .http_api_helper import fail, success
-from .mcp_helper import signal_handler, get_baidu_time_period, get_bing_time_period
-from .tools.crawl import SearchTool, CrawlTool
+from .mcp_helper import signal_handler
+from .tools.crawl import SearchTool, MultiSearchTool, CrawlTool
+from .tools.crawl.impl.hedge import search_hedger
+from .tools.crawl.impl.page_cache import page_cache
+from .tools.crawl.impl.registry import schema_registry
+from .tools.crawl.impl.search_cache import search_cache
+from .tools.crawl.impl.search_impl import search_fetcher
+from .tools.crawl.impl.static_fetch import static_fetcher
 from .tools.plot import PlotTool
 from .tools.pdf import PDFTool
 
@@ -27,10 +33,15 @@ async def lifespan(app: FastAPI):
     try:
         # Create the shutdown event
         shutdown_event = asyncio.Event()
+        # Warm up the browser without delaying the startup, /ping reports when it is ready
+        crawler_manager.start_warm_up()
+        schema_registry.start_watching()
         yield
     finally:
         # Clean up resources when closing
+        await schema_registry.stop_watching()
         await crawler_manager.close()
+        await http_client.close()
 
 
 # Create router with /chp prefix
@@ -68,6 +79,7 @@ async def web_search(
         "",
         description="Time range, such as day (one day ago), week (one week ago), month (one month ago), year (one year ago)",
     ),
+    fresh: bool = Query(False, description="Skip the search cache and search again"),
 ) -> JSONResponse:
     """
     Search data through search engine and return search results
@@ -78,35 +90,65 @@ async def web_search(
         kw (str, optional): Keyword.
         page (int, optional): Page number. Defaults to 1.
         number (int, optional): Number of requests. Defaults to 10.
+        fresh (bool, optional): Skip the search cache and search again. Defaults to False.
 
     Returns:
         JSONResponse: Search results.
     """
-    # Set time range parameter based on different search engine
-    if time_period:
-        if provider == "baidu":
-            time_period = get_baidu_time_period(time_period)
-        elif provider == "baidu_news":
-            time_period = ""
-        elif provider == "google":
-            time_period = f"qdr:{time_period[0]}"  # day -> d, week -> w, month -> m, year -> y
-        elif provider == "google_news":
-            time_period = f"qdr:{time_period[0]}"
-        elif provider == "bing":
-            time_period = get_bing_time_period(time_period)
     try:
         search_tool = SearchTool()
-        results = await search_tool.execute(provider=provider, kw=kw, page=page, number=number, time_period=time_period)
+        results = await search_tool.execute(
+            provider=provider, kw=kw, page=page, number=number, time_period=time_period, fresh=fresh
+        )
         return success(data=results if results else [])
     except Exception as e:
         return fail(message=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@router.get("/web_multi_search")
+async def web_multi_search(
+    kw: str = Query(..., description="Search keyword"),
+    providers: str = Query("bing,google,baidu", description="Comma separated search engine names"),
+    number: int = Query(10, description="Number of results, default is 10"),
+    time_period: str = Query("", description="Time range, such as day, week, month, year"),
+    timeout: float = Query(20, gt=0, description="Seconds to wait for the providers, default is 20"),
+    fresh: bool = Query(False, description="Skip the search cache and search again"),
+) -> JSONResponse:
+    """
+    Search several search engines concurrently, remove the duplicate results and merge their rankings
+    Note: /chp prefix is automatically mapped when chatspeed calls, do not remove
+
+    Args:
+        kw (str): Keyword.
+        providers (str, optional): Comma separated search engine names. Defaults to bing,google,baidu.
+        number (int, optional): Number of results. Defaults to 10.
+        timeout (float, optional): Seconds to wait, the results that arrived in time are returned. Defaults to 20.
+        fresh (bool, optional): Skip the search cache and search again. Defaults to False.
+
+    Returns:
+        JSONResponse: Merged search results and the status of every provider.
+    """
+    try:
+        search_tool = MultiSearchTool()
+        results = await search_tool.execute(
+            providers=[p.strip() for p in providers.split(",") if p.strip()],
+            kw=kw,
+            number=number,
+            time_period=time_period,
+            timeout=timeout,
+            fresh=fresh,
+        )
+        return success(data=results)
+    except Exception as e:
+        return fail(message=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @router.get("/web_crawler")
 async def web_crawler(
     url: str = Query(..., description="Data extraction URL"),
     format: str = Query("markdown", description="Output format, markdown or html"),
     remove_link: bool = Query(True, description="Whether to remove links from the extracted content"),
+    fresh: bool = Query(False, description="Skip the page cache and crawl the page again"),
 ) -> JSONResponse:
     """
     Extract data from the provided URL and return the result
@@ -115,6 +157,7 @@ async def web_crawler(
     Args:
         url (str, optional): Data extraction URL.
         format (str, optional): Output format, markdown or html. Defaults to markdown.
+        fresh (bool, optional): Skip the page cache and crawl the page again. Defaults to False.
 
     Raises:
         HTTPException: If extraction fails
@@ -171,7 +214,7 @@ async def web_crawler(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid URL format")
 
         crawl_tool = CrawlTool()
-        results = await crawl_tool.execute(url=decoded_url, format=format, remove_link=remove_link)
+        results = await crawl_tool.execute(url=decoded_url, format=format, remove_link=remove_link, fresh=fresh)
 
         if not results:
             return fail(
@@ -187,6 +230,24 @@ async def web_crawler(
         return fail(message=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@router.get("/schemas")
+async def schemas() -> JSONResponse:
+    """List the content and search schemas with their validation errors"""
+    return success(data=schema_registry.list())
+
+
+@router.post("/schemas/validate")
+async def validate_schema(
+    kind: str = Body(..., description="Schema kind, content or search"),
+    schema: dict = Body(..., description="Schema to validate"),
+) -> JSONResponse:
+    """Validate a content or search schema without installing it"""
+    error = schema_registry.validate(kind, schema)
+    if error:
+        return fail(message="Invalid schema", detail=error, status_code=status.HTTP_400_BAD_REQUEST)
+    return success(data={"valid": True})
+
+
 @router.get("/pdf")
 async def pdf(
     url: str = Query(..., description="URL of the PDF document"),
@@ -198,7 +259,22 @@ async def pdf(
 
 @app.get("/ping")
 async def ping() -> JSONResponse:
-    return success(data={"ping": "pong"})
+    return success(data={"ping": "pong", "ready": crawler_manager.ready, "status": crawler_manager.status})
+
+
+@app.get("/stats")
+async def stats() -> JSONResponse:
+    return success(
+        data={
+            **crawler_manager.stats(),
+            "search_cache": search_cache.stats(),
+            "search_fetch": search_fetcher.stats(),
+            "search_hedge": search_hedger.stats(),
+            "page_cache": page_cache.stats(),
+            "crawl_fetch": static_fetcher.stats(),
+            "schemas": schema_registry.stats(),
+        }
+    )
 
 
 # Register router with the app after all endpoints are defined
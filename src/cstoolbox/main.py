@@ -1,17 +1,33 @@
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
 from urllib.parse import unquote, urlparse
 
 from pydantic import Field
-from typing import Literal
+from typing import List, Literal
 
-from cstoolbox.core.crawler_manager import crawler_manager
-from cstoolbox.mcp_helper import fail, success, signal_handler, get_baidu_time_period, get_bing_time_period
-from cstoolbox.tools.crawl import SearchTool, CrawlTool
+from cstoolbox.core import crawler_manager, http_client
+from cstoolbox.mcp_helper import fail, success, signal_handler
+from cstoolbox.tools.crawl import SearchTool, MultiSearchTool, CrawlTool
+from cstoolbox.tools.crawl.impl.registry import schema_registry
 from cstoolbox.tools.plot import PlotTool
 from cstoolbox.tools.pdf import PDFTool
 
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """Warm up the browser and load the schemas while the server starts"""
+    crawler_manager.start_warm_up()
+    schema_registry.start_watching()
+    try:
+        yield
+    finally:
+        await schema_registry.stop_watching()
+        await crawler_manager.close()
+        await http_client.close()
+
+
 # Create MCP server instance
-mcp = FastMCP("CSToolbox")
+mcp = FastMCP("CSToolbox", lifespan=lifespan)
 
 
 @mcp.tool(description="Perform web search using the specified search engine provider")
@@ -25,6 +41,7 @@ async def web_search(
     time_period: Literal["day", "week", "month", "year", ""] = Field(
         "", description="Time range filter. Default: empty (no time filter)."
     ),
+    fresh: bool = Field(False, description="Skip cached results, for searches that need the latest results"),
 ) -> dict:
     """
     Perform web search using specified provider
@@ -50,34 +67,74 @@ async def web_search(
             - "month" (Last month)
             - "year" (Last year)
             Default: empty (no time filter)
+        fresh (bool, optional):
+            Skip cached results and search again. Default: False
 
     Returns:
         dict - Search results in dictionary format
     """
-    if time_period:
-        if provider == "baidu":
-            time_period = get_baidu_time_period(time_period)
-        elif provider == "baidu_news":
-            time_period = ""
-        elif provider == "google":
-            time_period = f"qdr:{time_period[0]}"  # day -> d, week -> w, month -> m, year -> y
-        elif provider == "google_news":
-            time_period = f"qdr:{time_period[0]}"
-        elif provider == "bing":
-            time_period = get_bing_time_period(time_period)
     try:
         search_tool = SearchTool()
-        results = await search_tool.execute(provider=provider, kw=kw, page=page, number=number, time_period=time_period)
+        results = await search_tool.execute(
+            provider=provider, kw=kw, page=page, number=number, time_period=time_period, fresh=fresh
+        )
         return success(data=results if results else [])
     except Exception as e:
         return fail(message="Error performing web search", detail=str(e), status_code=500)
 
 
+@mcp.tool(description="Search several search engines at once, with duplicate results removed and rankings merged")
+async def web_multi_search(
+    kw: str = Field(..., description="Keywords for search"),
+    providers: List[Literal["google", "bing", "baidu", "google_news", "baidu_news"]] = Field(
+        ["bing", "google", "baidu"], description="Names of the providers searched"
+    ),
+    number: int = Field(10, ge=1, le=50, description="Number of results"),
+    time_period: Literal["day", "week", "month", "year", ""] = Field(
+        "", description="Time range filter. Default: empty (no time filter)."
+    ),
+    timeout: float = Field(20, gt=0, le=60, description="Seconds to wait for the providers"),
+    fresh: bool = Field(False, description="Skip cached results, for searches that need the latest results"),
+) -> dict:
+    """
+    Search several providers concurrently and merge their results
+
+    Results found by several providers are returned once, ranked by reciprocal rank fusion of
+    their ranks, and list the providers that found them.
+
+    Args:
+        kw (str):
+            Search keyword. Example: "AI trends 2024"
+        providers (list, optional):
+            Search engine names, see web_search. Default: ["bing", "google", "baidu"]
+        number (int, optional):
+            Number of results. Default: 10. Max: 50.
+        time_period (str, optional):
+            Filter results by time range: "day", "week", "month" or "year". Default: empty
+        timeout (float, optional):
+            Seconds to wait for the providers, the results that arrived in time are returned. Default: 20
+        fresh (bool, optional):
+            Skip cached results and search again. Default: False
+
+    Returns:
+        dict - Merged search results, and the status of every provider
+    """
+    try:
+        search_tool = MultiSearchTool()
+        results = await search_tool.execute(
+            providers=providers, kw=kw, number=number, time_period=time_period, timeout=timeout, fresh=fresh
+        )
+        return success(data=results)
+    except Exception as e:
+        return fail(message="Error performing multi-provider web search", detail=str(e), status_code=500)
+
+
 @mcp.tool(description="Extract and return structured data from the provided URL")
 async def web_crawler(
     url: str = Field(..., description="Url to extract data"),
     format: Literal["markdown", "html"] = Field("markdown", description="Data format"),
     remove_link: bool = Field(True, description="Whether to remove links from the content"),
+    fresh: bool = Field(False, description="Skip the cached page, for pages that need the latest content"),
 ) -> dict:
     """
     Extract data from the provided URL and return the result
@@ -86,6 +143,7 @@ async def web_crawler(
         url (str, optional): Data extraction URL.
         format (str, optional): Output format, markdown or html. Defaults to markdown.
         remove_link (bool, optional): Whether to remove links from the content. Defaults to True.
+        fresh (bool, optional): Skip the cached page and crawl it again. Defaults to False.
 
     Raises:
         HTTPException: If extraction fails
@@ -142,7 +200,7 @@ async def web_crawler(
             return fail(message="Invalid URL format", status_code=400)
 
         crawl_tool = CrawlTool()
-        results = await crawl_tool.execute(url=decoded_url, format=format, remove_link=remove_link)
+        results = await crawl_tool.execute(url=decoded_url, format=format, remove_link=remove_link, fresh=fresh)
 
         if not results:
             return fail(
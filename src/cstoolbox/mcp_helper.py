@@ -3,7 +3,7 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import Dict
 
-from .core import crawler_manager
+from .core import crawler_manager, http_client
 
 shutdown_event = asyncio.Event()
 
@@ -56,6 +56,7 @@ def signal_handler():
         # Wait for all tasks to complete and clean up resources
         if crawler_manager:
             await crawler_manager.close()
+        await http_client.close()
         # Stop the event loop
         loop.stop()
 
@@ -107,3 +108,26 @@ def get_bing_time_period(time_period: str) -> str:
         return 'ex1%3a"ez3"'
     elif time_period == "year":
         return 'ex1%3a"ez5"'
+
+
+def get_time_period(provider: str, time_period: str) -> str:
+    """
+    Translate a time range into the time parameter of a search provider
+    Args:
+        provider (str): Search engine name
+        time_period (str): Time range, e.g. day (one day), week (one week), month (one month), year (one year).
+            Any other value is taken as a parameter of the provider already and returned as is.
+    Returns:
+        str: Search time parameter of the provider
+    """
+    if time_period not in ("day", "week", "month", "year"):
+        return time_period
+    if provider == "baidu":
+        return get_baidu_time_period(time_period)
+    elif provider == "baidu_news":
+        return ""
+    elif provider in ("google", "google_news"):
+        return f"qdr:{time_period[0]}"  # day -> d, week -> w, month -> m, year -> y
+    elif provider == "bing":
+        return get_bing_time_period(time_period)
+    return time_period
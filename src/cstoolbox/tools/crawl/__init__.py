@@ -1,4 +1,5 @@
 from .search_tool import SearchTool
+from .multi_search_tool import MultiSearchTool
 from .crawl_tool import CrawlTool
 
-__all__ = ["SearchTool", "CrawlTool"]
+__all__ = ["SearchTool", "MultiSearchTool", "CrawlTool"]
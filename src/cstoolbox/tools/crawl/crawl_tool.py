@@ -21,6 +21,7 @@ class CrawlTool(BaseTool):
 
         Args:
             url: URL to crawl
+            fresh: Skip the page cache, default is False
 
         Returns:
             Crawl results dictionary
@@ -32,9 +33,10 @@ class CrawlTool(BaseTool):
         elif format not in ["markdown", "html"]:
             format = "html"
         remove_link = kwargs.get("remove_link", False)
+        fresh = kwargs.get("fresh", False)
 
         extractor = DataExtractor()
-        result = await extractor.extract(url, format, remove_link)
+        result = await extractor.extract(url, format, remove_link, fresh=fresh)
         if result and not result.get("content"):
             return None
         return result
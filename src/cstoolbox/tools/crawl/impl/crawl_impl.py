@@ -1,42 +1,26 @@
-import json
+import hashlib
 import traceback
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from urllib.parse import urlparse
 
-from pydantic import BaseModel, ValidationError
-
-from cstoolbox.browser.crawler import CrawlerConfig
+from cstoolbox.browser.config import CrewlerResult
+from cstoolbox.browser.crawler import Crawler, CrawlerConfig
 from cstoolbox.config import config as global_config
 from cstoolbox.core import crawler_manager
 from cstoolbox.logger import get_logger
 
-from .schema import ExtractField, ExtractSchema
+from .page_cache import page_cache
+from .registry import schema_registry
+from .schema import ContentConfiguration, ContentExtractConfig, ExtractField, ExtractSchema, FetchMode
+from .static_fetch import content_missing, static_fetcher
 
 logger = get_logger(__name__)
 
 
-@dataclass
-class ContentExtractConfig:
-    name: str
-    page_timeout: int
-    wait_for: str
-    wait_until: Optional[str] = "domcontentloaded"
-    wait_timeout: Optional[int] = 15000
-    init_js_code: Optional[str] = None
-    js_code: Optional[str] = None
-
-
-class ContentConfiguration(BaseModel):
-    """crawl configuration"""
-
-    config: ContentExtractConfig
-    selectors: ExtractSchema
-
-
 class DataExtractor:
-    async def extract(self, url: str, format: str = "html", remove_link: bool = True) -> Dict[str, str]:
+    async def extract(
+        self, url: str, format: str = "html", remove_link: bool = True, fresh: bool = False
+    ) -> Dict[str, str]:
         """
         Extract content from specified URL using crawler pool
 
@@ -44,17 +28,27 @@ class DataExtractor:
             url (str): URL of the webpage to extract content from
             format (str): Output format, markdown or html
             remove_link (bool): Whether to remove links from the content
+            fresh (bool): Skip the page cache and crawl the page again
 
         Returns:
             dict: Dictionary containing title and content
         """
+        domain = ""
         try:
             # 解析URL获取domain
             parsed_url = urlparse(url)
             domain = parsed_url.netloc
             config, schema = self._load_configs(domain)
 
-            async with crawler_manager.get_crawler() as crawler:
+            # entries extracted by a schema that was reloaded since are not served
+            cache_key = page_cache.key(url, format, remove_link, self._schema_version(config, schema))
+            if not fresh:
+                data = await page_cache.get(cache_key)
+                if data is not None:
+                    logger.info(f"page cache hit, url: {url}")
+                    return data
+
+            async with crawler_manager.get_crawler(url) as crawler:
                 fields = [
                     {
                         "name": field.name,
@@ -78,21 +72,41 @@ class DataExtractor:
                     base_selector=schema.base_selector or None,
                     fields=fields,
                     return_full_html=global_config.log_level.lower() == "debug",
+                    prune_page=global_config.prune_page.lower() == "true",
                     remove_link=remove_link,
                 )
-                results = await crawler.crawl(
-                    url=url,
-                    config=crawler_config,
-                )
+                crawler_config.plan = schema_registry.plan(crawler_config.base_selector, crawler_config.fields)
+
+                # server rendered pages are extracted from a plain GET, the browser is used when it fails
+                mode = static_fetcher.mode_of(config.fetch_mode)
+                path = "browser"
+                results = data = None
+                if mode != FetchMode.BROWSER:
+                    results, data = await self._fetch_static(crawler, crawler_config, url, format)
+                    if data is not None and (mode == FetchMode.HTTP or not content_missing(data.get("content"))):
+                        path = "http"
+                    elif mode == FetchMode.HTTP:
+                        static_fetcher.record("http_failed")
+                        raise Exception(f"Unavailable to fetch the url {url}")
+                    else:
+                        logger.info(f"content missing from the static page, crawling it with the browser: {url}")
+                        path = "fallback"
+                        results = data = None
 
-                if not results:
-                    logger.info("crawler result is None: %s", url)
-                    raise Exception("crawler result is None")
+                if data is None:
+                    results = await crawler.crawl(
+                        url=url,
+                        config=crawler_config,
+                    )
 
-                if not results.success:
-                    raise Exception(f"Unavailable to crawl the url {url}")
-                if not results.results and not results.markdown:
-                    raise Exception(f"No data extracted from the page, url: {url}")
+                    if not results:
+                        logger.info("crawler result is None: %s", url)
+                        raise Exception("crawler result is None")
+
+                    if not results.success:
+                        raise Exception(f"Unavailable to crawl the url {url}")
+                    data = await self._collect(crawler, results, url, format)
+                static_fetcher.record(path)
 
                 if global_config.log_level.lower() == "debug":
                     if results.html:
@@ -103,25 +117,10 @@ class DataExtractor:
                         with open(f"{global_config.log_dir}/crawl.md", "w") as f:
                             f.write(results.markdown)
 
-                data = {}
-                if isinstance(results.results, list):
-                    data = results.results[0] if results.results else {}
-                elif isinstance(results.results, dict):
-                    data = results.results
-
-                if not data.get("title"):
-                    # First use the title from metadata
-                    data["title"] = results.title if results.title else ""
-
-                if not data.get("content"):
-                    if format == "markdown":
-                        data["content"] = results.markdown.strip() if results.markdown else ""
-                    else:
-                        data["content"] = results.cleaned_html
-                data["url"] = url
-
-                logger.info(f"content length: {len(data.get('content', ''))}, url: {url}")
+                logger.info(f"content length: {len(data.get('content', ''))}, url: {url}, fetched by: {path}")
 
+                if results.status_code == 200 and data.get("content"):
+                    await page_cache.put(cache_key, url, data, results.headers)
                 return data
 
         except Exception as e:
@@ -134,64 +133,79 @@ class DataExtractor:
             logger.error(f"Error extracting content: {error_details}")
             raise Exception(e)
 
-    def _load_configs(self, domain):
-        """Load all content extraction configurations"""
-        self.configs = {}
-        config_path = self._find_domain_config(domain)
-        if config_path:
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                # Use Pydantic model to validate the entire configuration
-                cfg = ContentConfiguration(**data)
-
-                return cfg.config, cfg.selectors
-
-            except (json.JSONDecodeError, ValidationError) as e:
-                raise ValueError(f"Invalid configuration file for domain '{domain}': {e}")
-        else:
-            # Build a JS condition to wait for any of the selectors
-            selectors = ["body", "article", "main", "#content", ".content", "#app"]
-            wait_condition = "||".join([f"document.querySelector('{sel}')" for sel in selectors])
-
-            config = ContentExtractConfig(
-                name=domain,
-                wait_for=f"js:() => {wait_condition}",
-                page_timeout=10000,
-            )
-            schema = ExtractSchema(
-                base_selector="html",
-                fields=[
-                    ExtractField(name="title", selector="title", type="text"),
-                ],
-            )
-        return config, schema
+    async def _fetch_static(
+        self, crawler: Crawler, crawler_config: CrawlerConfig, url: str, format: str
+    ) -> Tuple[Optional[CrewlerResult], Optional[Dict[str, str]]]:
+        """Fetch and extract a page without the browser, the data is None when the page could not be extracted"""
+        page = await static_fetcher.fetch(url)
+        if page is None:
+            return None, None
+        results = await crawler.extract(page.url, crawler_config, page.html, page.status_code, page.headers)
+        if not results.success:
+            return results, None
+        try:
+            return results, await self._collect(crawler, results, url, format)
+        except Exception as e:
+            logger.info(f"{e}, from the static page")
+            return results, None
 
-    def _find_domain_config(self, domain: str) -> Path | None:
+    async def _collect(self, crawler: Crawler, results: CrewlerResult, url: str, format: str) -> Dict[str, str]:
         """
-        Find configuration file by domain.
+        Data returned for a page, with the content of the whole page when the schema did not extract it
 
-        :param domain: Input domain, e.g., "a.b.c.d.com"
-        :return: Return the first matching configuration file path, or None if not found
+        Raises:
+            Exception: Nothing was extracted
         """
-        # Split the domain by '.' into multiple parts
-        parts = domain.split(".")
+        data = {}
+        if isinstance(results.results, list):
+            data = results.results[0] if results.results else {}
+        elif isinstance(results.results, dict):
+            data = results.results
+
+        if not data.get("title"):
+            # First use the title from metadata
+            data["title"] = results.title if results.title else ""
+
+        if not data.get("content"):
+            # the whole page is only cleaned when the schema did not extract the content
+            await crawler.render_content(results, markdown=format == "markdown")
+            if format == "markdown":
+                data["content"] = results.markdown.strip() if results.markdown else ""
+            else:
+                data["content"] = results.cleaned_html
+        if not results.results and not data["content"]:
+            raise Exception(f"No data extracted from the page, url: {url}")
+        data["url"] = url
+        return data
+
+    @staticmethod
+    def _schema_version(config: ContentExtractConfig, schema: ExtractSchema) -> str:
+        """Digest of the schema of a domain, changes when the schema file is changed"""
+        data = f"{config!r}{schema.model_dump_json()}"
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()[:12]
 
-        # Start from the most specific subdomain and check level by level
-        for i in range(len(parts)):
-            # Build the current subdomain
-            subdomain = ".".join(parts[i:])
-
-            # Build the configuration file path
-            config_path = Path(global_config.server_root) / "schema" / "content" / f"{subdomain}.json"
-
-            # Check if the file exists
-            if config_path.exists():
-                return config_path
-
-        # If all level configuration files do not exist, return None
-        return None
+    def _load_configs(self, domain):
+        """Get the content extraction configuration of a domain, or a generic one when it has none"""
+        cfg = schema_registry.find_content(domain)
+        if cfg:
+            return cfg.config, cfg.selectors
+
+        # Build a JS condition to wait for any of the selectors
+        selectors = ["body", "article", "main", "#content", ".content", "#app"]
+        wait_condition = "||".join([f"document.querySelector('{sel}')" for sel in selectors])
+
+        config = ContentExtractConfig(
+            name=domain,
+            wait_for=f"js:() => {wait_condition}",
+            page_timeout=10000,
+        )
+        schema = ExtractSchema(
+            base_selector="html",
+            fields=[
+                ExtractField(name="title", selector="title", type="text"),
+            ],
+        )
+        return config, schema
 
     def _get_js_code(self, js_code: str | None) -> str:
         code = [
@@ -0,0 +1,160 @@
+"""
+Hedged result page requests of web_search.
+
+The latency of the search engines has a heavy tail: a consent page or a slow render can take many
+times the median. When a result page of a provider is not served by the p90 of the latencies seen
+for that provider, the same page is requested again in a fresh tab, the first response wins and
+the other request is cancelled. About one request in ten is hedged, in exchange for the tail.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from cstoolbox.config import config
+from cstoolbox.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# latencies kept by provider, and the number needed before requests are hedged
+WINDOW = 200
+MIN_SAMPLES = 20
+HEDGE_QUANTILE = 0.9
+
+
+def percentile(samples: List[float], quantile: float) -> float:
+    """Nearest rank percentile of the samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class _ProviderStats:
+    def __init__(self):
+        # latency of the requests, hedges included, the cancelled ones counting the time they ran, and of the
+        # responses served
+        self.attempts: Deque[float] = deque(maxlen=WINDOW)
+        self.served: Deque[float] = deque(maxlen=WINDOW)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        # hedges not sent because the provider had no free request
+        self.hedges_skipped = 0
+
+
+class SearchHedger:
+    """Hedges the requests of a provider taking longer than its p90, and reports the latencies"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._providers: Dict[str, _ProviderStats] = {}
+
+    def _stats(self, provider: str) -> _ProviderStats:
+        stats = self._providers.get(provider)
+        if stats is None:
+            stats = self._providers[provider] = _ProviderStats()
+        return stats
+
+    def delay(self, provider: str) -> Optional[float]:
+        """Seconds after which a request of the provider is hedged, None until enough latencies were seen"""
+        stats = self._providers.get(provider)
+        if not self.enabled or stats is None or len(stats.attempts) < MIN_SAMPLES:
+            return None
+        return percentile(list(stats.attempts), HEDGE_QUANTILE)
+
+    async def run(
+        self,
+        provider: str,
+        request: Callable[[], Awaitable[T]],
+        limit: Optional[asyncio.Semaphore] = None,
+        accept: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """
+        Run a request of the provider, hedged with a second one past the hedge delay
+
+        Args:
+            provider: Provider whose latencies set the hedge delay
+            request: Coroutine function sending the request, called again for the hedge
+            limit: Semaphore of the requests of the provider, the hedge needs a free permit of its own
+                and is skipped when there is none
+            accept: Whether a response can be served, a request failing it or raising leaves the other one a
+                chance. The first response is served when neither is accepted
+        """
+        stats = self._stats(provider)
+        stats.requests += 1
+        started_at = time.time()
+        delay = self.delay(provider)
+        primary = asyncio.create_task(self._timed(stats, request))
+        tasks = {primary: started_at}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and limit is not None and limit.locked():
+                # a hedge would take the provider past its max concurrency
+                stats.hedges_skipped += 1
+                done, _ = await asyncio.wait(tasks)
+            elif not done:
+                stats.hedged += 1
+                logger.info("%s request still running after %.2fs, hedging it", provider, delay)
+                if limit is not None:
+                    # a permit is free, acquired without waiting
+                    await limit.acquire()
+                hedge = asyncio.create_task(self._timed(stats, request))
+                if limit is not None:
+                    hedge.add_done_callback(lambda _: limit.release())
+                tasks[hedge] = time.time()
+                pending = set(tasks)
+                # a failed request leaves the other one a chance
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    if any(self._accepted(task, accept) for task in done):
+                        break
+                done = {task for task in tasks if task.done()}
+            winner = next((task for task in done if self._accepted(task, accept)), primary)
+            if winner is not primary:
+                stats.hedge_wins += 1
+            result = winner.result()
+            stats.served.append(time.time() - started_at)
+            # the request that lost took at least this long, left out its latency would pull the hedge delay down
+            for task, task_started_at in tasks.items():
+                if not task.done():
+                    stats.attempts.append(time.time() - task_started_at)
+            return result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _accepted(task: "asyncio.Task[T]", accept: Optional[Callable[[T], bool]]) -> bool:
+        return task.exception() is None and (accept is None or accept(task.result()))
+
+    async def _timed(self, stats: _ProviderStats, request: Callable[[], Awaitable[T]]) -> T:
+        started_at = time.time()
+        result = await request()
+        stats.attempts.append(time.time() - started_at)
+        return result
+
+    def stats(self) -> dict:
+        """Hedge rate and served latency percentiles by provider, compare them with hedging disabled"""
+        providers: Dict[str, Any] = {}
+        for provider, stats in self._providers.items():
+            served = list(stats.served)
+            delay = self.delay(provider)
+            providers[provider] = {
+                "requests": stats.requests,
+                "hedged": stats.hedged,
+                "hedge_rate": round(stats.hedged / stats.requests, 4) if stats.requests else 0,
+                "hedge_wins": stats.hedge_wins,
+                "hedges_skipped": stats.hedges_skipped,
+                "hedge_delay_ms": round(delay * 1000) if delay is not None else None,
+                **{
+                    f"p{int(q * 100)}_ms": round(percentile(served, q) * 1000) if served else None
+                    for q in (0.5, 0.9, 0.99)
+                },
+            }
+        return {"enabled": self.enabled, "providers": providers}
+
+
+search_hedger = SearchHedger(config.search_hedge.lower() == "true")
@@ -0,0 +1,145 @@
+"""
+Search several providers with one query.
+
+The providers are searched concurrently, their results are deduplicated by normalized url and
+merged with reciprocal rank fusion: a result scores the sum of 1 / (k + rank) over the providers
+that returned it, so results found by several engines rise to the top. The providers still
+searching when the deadline expires are cancelled and the results that arrived are returned.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cstoolbox.logger import get_logger
+
+from .search_impl import SearchExtractor
+
+logger = get_logger(__name__)
+
+DEFAULT_PROVIDERS = ["bing", "google", "baidu"]
+# constant of reciprocal rank fusion, damps the weight of the top ranks
+RRF_K = 60
+
+# query parameters only tracking where the click came from
+_TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "yclid", "spm", "from", "ref", "ref_src", "source"}
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Key of a result url, the same for the urls of a page returned by different engines.
+
+    The scheme, "www.", default ports, fragments, trailing slashes and tracking parameters are
+    ignored, the other query parameters are sorted.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    host = (parts.hostname or "").removeprefix("www.")
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in _TRACKING_PARAMS
+    )
+    return urlunsplit(("", host, parts.path.rstrip("/"), urlencode(query), "")).lstrip("/")
+
+
+def fuse(rankings: Dict[str, List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge the ranked results of the providers with reciprocal rank fusion.
+
+    A result found by several providers keeps the fields of the provider ranking it best, completed
+    with the fields the others filled, and lists the providers that found it, best rank first. Of
+    results scoring the same, the one with the best rank comes first.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    depth = max((len(results) for results in rankings.values()), default=0)
+    for rank in range(depth):
+        for provider, results in rankings.items():
+            if rank >= len(results):
+                continue
+            result = results[rank]
+            url = result.get("url")
+            if not url:
+                continue
+            key = normalize_url(url)
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {**result, "providers": []}
+                scores[key] = 0.0
+            elif provider in entry["providers"]:
+                # listed twice by the same provider, the best rank counts
+                continue
+            else:
+                for name, value in result.items():
+                    if not entry.get(name) and value:
+                        entry[name] = value
+            entry["providers"].append(provider)
+            scores[key] += 1 / (k + rank + 1)
+
+    ordered = sorted(merged, key=lambda key: scores[key], reverse=True)
+    return [{**merged[key], "score": round(scores[key], 6)} for key in ordered]
+
+
+async def multi_search(
+    kw: str,
+    providers: Optional[List[str]] = None,
+    number: int = 10,
+    time_period: str = "",
+    fresh: bool = False,
+    timeout: float = 20,
+) -> Dict[str, Any]:
+    """
+    Search the providers concurrently and merge their results.
+
+    Args:
+        kw: Search keyword
+        providers: Providers to search, default is bing, google and baidu
+        number: Number of results asked from every provider and returned
+        time_period: Time range, default is empty
+        fresh: Skip the search cache
+        timeout: Deadline in seconds, the providers still searching are cancelled
+
+    Returns:
+        The merged results, and the status, result count and time of every provider
+    """
+    providers = list(dict.fromkeys(providers or DEFAULT_PROVIDERS))
+    started_at = time.time()
+    elapsed: Dict[str, float] = {}
+
+    async def search(provider: str) -> List[Dict[str, Any]]:
+        try:
+            extractor = SearchExtractor(provider)
+            return await extractor.search(kw, number=number, time_period=time_period, fresh=fresh) or []
+        finally:
+            elapsed[provider] = time.time() - started_at
+
+    tasks = {provider: asyncio.create_task(search(provider)) for provider in providers}
+    try:
+        await asyncio.wait(tasks.values(), timeout=timeout)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    rankings: Dict[str, List[Dict[str, Any]]] = {}
+    statuses: Dict[str, Dict[str, Any]] = {}
+    for provider, task in tasks.items():
+        status: Dict[str, Any] = {"elapsed_ms": round(elapsed.get(provider, timeout) * 1000)}
+        if task.cancelled():
+            status["status"] = "timeout"
+        elif task.exception() is not None:
+            logger.info("%s search failed for %s: %s", provider, kw, task.exception())
+            status.update(status="error", error=str(task.exception()))
+        else:
+            rankings[provider] = task.result()
+            status.update(status="ok", count=len(rankings[provider]))
+        statuses[provider] = status
+
+    return {"results": fuse(rankings)[:number], "providers": statuses}
@@ -0,0 +1,244 @@
+"""
+Persistent cache of web_crawler results.
+
+The extracted results are stored compressed under the cache dir, named by the hash of their
+content, and a sqlite index maps each crawl to its content with the ETag and Last-Modified
+validators of the page. Recent entries are served directly, older ones are revalidated with a
+conditional GET before the browser is used again.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from appdirs import user_cache_dir
+
+from cstoolbox.config import config
+from cstoolbox.core.http_client import http_client
+from cstoolbox.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Entry:
+    key: str
+    url: str
+    digest: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # time the page was crawled, and time it was crawled or last revalidated
+    stored_at: float
+    validated_at: float
+
+
+class PageCache:
+    """Content addressed, compressed on-disk cache of crawl results with LRU eviction"""
+
+    def __init__(self, path: Path, max_size_mb: int = 256, fresh_ttl: int = 600, max_age: int = 7 * 86400):
+        """
+        Args:
+            path: Directory of the cache
+            max_size_mb: Size of the stored contents above which the least recently used entries are evicted,
+                0 disables the cache
+            fresh_ttl: Seconds an entry is served without revalidation
+            max_age: Seconds after which an entry is crawled again, even when the page says it did not change
+        """
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(url: str, format: str, remove_link: bool, schema: str = "") -> str:
+        """Key of a crawl, schema is the version of the schema extracting it so a changed schema misses"""
+        return f"{format}:{int(remove_link)}:{schema}:{url}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result of a crawl, None when it is missing, expired or the page changed"""
+        if not self.enabled:
+            return None
+        try:
+            async with self._lock:
+                entry = await asyncio.to_thread(self._lookup, key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            age = time.time() - entry.validated_at
+            if age >= self.fresh_ttl:
+                if not await self._revalidate(entry):
+                    self.changed += 1
+                    return None
+                self.revalidated += 1
+
+            async with self._lock:
+                data = await asyncio.to_thread(self._load, entry, age >= self.fresh_ttl)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return data
+        except Exception as e:
+            logger.warning(f"Error reading the page cache: {e}")
+            return None
+
+    async def put(self, key: str, url: str, data: Dict[str, Any], headers: Dict[str, str]):
+        """Store the result of a crawl with the validators of the response headers"""
+        if not self.enabled or "no-store" in headers.get("cache-control", ""):
+            return
+        content = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        try:
+            async with self._lock:
+                await asyncio.to_thread(
+                    self._store, key, url, content, headers.get("etag"), headers.get("last-modified")
+                )
+        except Exception as e:
+            logger.warning(f"Error writing the page cache: {e}")
+
+    async def _revalidate(self, entry: _Entry) -> bool:
+        """Ask the site whether the page changed since it was cached, without downloading it"""
+        if time.time() - entry.stored_at >= self.max_age or not (entry.etag or entry.last_modified):
+            return False
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        try:
+            session = http_client.session()
+            # the body is not read, the connection is dropped when the page changed
+            async with session.get(entry.url, headers=headers, proxy=http_client.proxy, allow_redirects=False) as resp:
+                if resp.status == 304:
+                    return True
+                # servers ignoring conditional requests still return the same validators for an unchanged page
+                return resp.status == 200 and (
+                    (entry.etag is not None and resp.headers.get("ETag") == entry.etag)
+                    or (entry.etag is None and resp.headers.get("Last-Modified") == entry.last_modified)
+                )
+        except Exception as e:
+            logger.debug(f"Error revalidating {entry.url}: {e}")
+            return False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            (self.path / "objects").mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path / "index.sqlite"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, url TEXT, digest TEXT, etag TEXT, "
+                "last_modified TEXT, stored_at REAL, validated_at REAL, accessed_at REAL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, size INTEGER)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def _object_path(self, digest: str) -> Path:
+        return self.path / "objects" / digest[:2] / f"{digest}.json.z"
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        row = (
+            self._connect()
+            .execute("SELECT key, url, digest, etag, last_modified, stored_at, validated_at FROM pages WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return _Entry(*row) if row else None
+
+    def _load(self, entry: _Entry, revalidated: bool) -> Optional[Dict[str, Any]]:
+        db = self._connect()
+        try:
+            data = json.loads(zlib.decompress(self._object_path(entry.digest).read_bytes()))
+        except (OSError, ValueError, zlib.error):
+            # the content file is gone or damaged, forget the entry
+            db.execute("DELETE FROM pages WHERE key = ?", (entry.key,))
+            db.commit()
+            return None
+        now = time.time()
+        if revalidated:
+            db.execute("UPDATE pages SET accessed_at = ?, validated_at = ? WHERE key = ?", (now, now, entry.key))
+        else:
+            db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, entry.key))
+        db.commit()
+        return data
+
+    def _store(self, key: str, url: str, content: bytes, etag: Optional[str], last_modified: Optional[str]):
+        db = self._connect()
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(content)
+            tmp.replace(path)
+        db.execute("INSERT OR REPLACE INTO objects VALUES (?, ?)", (digest, len(content)))
+
+        old = db.execute("SELECT digest FROM pages WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, digest, etag, last_modified, now, now, now),
+        )
+        if old and old[0] != digest:
+            self._drop_unreferenced(old[0])
+        self._evict()
+        db.commit()
+
+    def _evict(self):
+        """Drop the least recently used entries until the contents fit in the size limit"""
+        db = self._connect()
+        size = db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        while size > self.max_size:
+            row = db.execute("SELECT key, digest FROM pages ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            db.execute("DELETE FROM pages WHERE key = ?", (row[0],))
+            size -= self._drop_unreferenced(row[1])
+            self.evictions += 1
+
+    def _drop_unreferenced(self, digest: str) -> int:
+        """Delete a content no entry refers to anymore, return the bytes freed"""
+        db = self._connect()
+        if db.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return 0
+        row = db.execute("SELECT size FROM objects WHERE digest = ?", (digest,)).fetchone()
+        db.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+        self._object_path(digest).unlink(missing_ok=True)
+        return row[0] if row else 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.changed + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "changed": self.changed,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
+
+
+page_cache = PageCache(
+    Path(user_cache_dir("cstoolbox")) / "pages",
+    max_size_mb=config.page_cache_size,
+    fresh_ttl=config.page_cache_fresh_ttl,
+    max_age=config.page_cache_max_age,
+)
@@ -0,0 +1,232 @@
+"""
+In-memory registry of the content and search schemas.
+
+The schema directory is read and validated once, content schemas are indexed in a trie of
+reversed domain labels, so finding the schema of a url costs a few dict lookups and no file
+access. The extraction plans of the schemas are compiled once and kept with them. A background
+task reloads the registry when a schema file changes, the new schemas replace the old ones at once.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from soupsieve import SelectorSyntaxError
+
+from cstoolbox.browser.plan import ExtractionPlan, compile_plan, plan_key
+from cstoolbox.config import config
+from cstoolbox.logger import get_logger
+
+from .schema import ContentConfiguration, SearchConfiguration
+
+logger = get_logger(__name__)
+
+SCHEMA_KINDS = ("content", "search")
+
+
+class _DomainTrie:
+    """Trie of reversed domain labels, finds the schema of the most specific domain suffix"""
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+
+    def add(self, domain: str, value: Any):
+        node = self._root
+        for label in reversed(domain.lower().split(".")):
+            node = node.setdefault(label, {})
+        node[""] = value
+
+    def find(self, domain: str) -> Optional[Any]:
+        node, value = self._root, None
+        for label in reversed(domain.lower().split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            value = node.get("", value)
+        return value
+
+
+@dataclass
+class _Snapshot:
+    """Schemas of one load of the schema directory"""
+
+    content: _DomainTrie = field(default_factory=_DomainTrie)
+    search: Dict[str, Union[SearchConfiguration, str]] = field(default_factory=dict)
+    # name -> validation error of every schema file, None when it is valid
+    files: Dict[str, Dict[str, Optional[str]]] = field(default_factory=lambda: {kind: {} for kind in SCHEMA_KINDS})
+    # compiled extraction plans by plan key
+    plans: Dict[Tuple, ExtractionPlan] = field(default_factory=dict)
+    signature: Tuple = ()
+
+
+class SchemaRegistry:
+    """Content and search schemas loaded from the schema directory"""
+
+    def __init__(self, root: Path, reload_interval: float = 5):
+        """
+        Args:
+            root: Schema directory, with a content and a search sub directory
+            reload_interval: Seconds between two checks of the schema directory for changes, 0 disables reloading
+        """
+        self.root = root
+        self.reload_interval = reload_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    @property
+    def snapshot(self) -> _Snapshot:
+        if self._snapshot is None:
+            self.reload()
+        return self._snapshot
+
+    def find_content(self, domain: str) -> Optional[ContentConfiguration]:
+        """
+        Find the content schema of a domain, the schema of the most specific parent domain is used
+
+        Raises:
+            ValueError: The schema file of the domain is invalid
+        """
+        schema = self.snapshot.content.find(domain)
+        if isinstance(schema, str):
+            raise ValueError(f"Invalid configuration file for domain '{domain}': {schema}")
+        return schema
+
+    def get_search(self, provider: str) -> SearchConfiguration:
+        """
+        Get the schema of a search provider
+
+        Raises:
+            ValueError: There is no valid schema for the provider
+        """
+        schema = self.snapshot.search.get(provider)
+        if schema is None:
+            logger.error(f"Configuration file not found for provider '{provider}'")
+            raise ValueError(f"Configuration file not found for provider '{provider}'")
+        if isinstance(schema, str):
+            raise ValueError(f"Invalid configuration file for provider '{provider}': {schema}")
+        return schema
+
+    def plan(self, base_selector: Optional[str], fields: List[Any]) -> ExtractionPlan:
+        """
+        Get the compiled extraction plan of a schema, compiled on first use and kept until the schemas change
+
+        Args:
+            base_selector: Selector of the result rows, None extracts the fields from the whole page
+            fields: Fields of the schema as sent to the crawler, FieldConfig or ExtractField
+        """
+        plans = self.snapshot.plans
+        key = plan_key(base_selector, fields)
+        plan = plans.get(key)
+        if plan is None:
+            plan = plans[key] = compile_plan(base_selector, fields)
+        return plan
+
+    def list(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Schemas of each kind with their validation error, None when they are valid"""
+        return {
+            kind: [{"name": name, "valid": error is None, "error": error} for name, error in sorted(files.items())]
+            for kind, files in self.snapshot.files.items()
+        }
+
+    @staticmethod
+    def validate(kind: str, data: Any) -> Optional[str]:
+        """Validate a schema, return the validation error or None when it is valid"""
+        if kind not in SCHEMA_KINDS:
+            return f"Unknown schema kind '{kind}', expected one of {', '.join(SCHEMA_KINDS)}"
+        model = ContentConfiguration if kind == "content" else SearchConfiguration
+        try:
+            schema = model.model_validate(data)
+            compile_plan(schema.selectors.base_selector, schema.selectors.fields)
+        except (ValidationError, SelectorSyntaxError) as e:
+            return str(e)
+        return None
+
+    def reload(self) -> bool:
+        """Load the schema directory again, return whether anything changed"""
+        signature = self._signature()
+        if self._snapshot is not None and signature == self._snapshot.signature:
+            return False
+
+        snapshot = _Snapshot(signature=signature)
+        for kind in SCHEMA_KINDS:
+            for path in sorted((self.root / kind).glob("*.json")):
+                name = path.stem
+                try:
+                    schema, error = self._load(kind, path), None
+                    # invalid selectors are reported with the schema instead of failing its crawls
+                    plan = compile_plan(schema.selectors.base_selector, schema.selectors.fields)
+                    snapshot.plans[plan.key] = plan
+                except (OSError, ValueError, ValidationError, SelectorSyntaxError) as e:
+                    schema, error = None, str(e)
+                    logger.error(f"Invalid {kind} schema '{path}': {e}")
+                snapshot.files[kind][name] = error
+                if kind == "content":
+                    snapshot.content.add(name, schema or error)
+                else:
+                    snapshot.search[name] = schema or error
+
+        # readers see either the old or the new schemas, never a mix of both
+        self._snapshot = snapshot
+        self.reloads += 1
+        logger.info(f"Loaded {sum(len(files) for files in snapshot.files.values())} schemas from {self.root}")
+        return True
+
+    def _load(self, kind: str, path: Path) -> Union[ContentConfiguration, SearchConfiguration]:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        model = ContentConfiguration if kind == "content" else SearchConfiguration
+        return model(**data)
+
+    def _signature(self) -> Tuple:
+        """Name, modification time and size of every schema file"""
+        files = []
+        for kind in SCHEMA_KINDS:
+            for path in (self.root / kind).glob("*.json"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((kind, path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(files))
+
+    def start_watching(self):
+        """Load the schemas and reload them in the background when the schema directory changes"""
+        if self._snapshot is None:
+            self.reload()
+        if self.reload_interval > 0 and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop_watching(self):
+        if self._watcher and not self._watcher.done():
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+        self._watcher = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"Error reloading schemas: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "content_schemas": len(self.snapshot.files["content"]),
+            "search_schemas": len(self.snapshot.files["search"]),
+            "invalid_schemas": sum(error is not None for files in self.snapshot.files.values() for error in files.values()),
+            "plans": len(self.snapshot.plans),
+            "reloads": self.reloads,
+        }
+
+
+schema_registry = SchemaRegistry(
+    Path(config.server_root) / "schema", reload_interval=config.schema_reload_interval
+)
@@ -1,5 +1,10 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional, List
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from cstoolbox.browser.config import EventConfig
 
 
 class ExtractField(BaseModel):
@@ -25,3 +30,91 @@ class ExtractSchema(BaseModel):
         if not v:
             raise ValueError("fields list cannot be empty")
         return v
+
+
+class FetchMode(str, Enum):
+    """how pages are fetched, by web_crawler for a domain or by web_search for a provider"""
+
+    AUTO = "auto"  # without the browser first, with the browser when the content looks missing
+    HTTP = "http"  # without the browser only
+    BROWSER = "browser"  # with the browser only
+
+
+@dataclass
+class ContentExtractConfig:
+    name: str
+    page_timeout: int
+    wait_for: str
+    wait_until: Optional[str] = "domcontentloaded"
+    wait_timeout: Optional[int] = 15000
+    init_js_code: Optional[str] = None
+    js_code: Optional[str] = None
+    # None uses CS_CRAWL_FETCH_MODE
+    fetch_mode: Optional[FetchMode] = None
+
+
+class ContentConfiguration(BaseModel):
+    """crawl configuration"""
+
+    config: ContentExtractConfig
+    selectors: ExtractSchema
+
+
+class PaginationType(str, Enum):
+    """pagination enum"""
+
+    PAGE = "page"  # use page number, like page=1
+    OFFSET = "offset"  # use offset, like first=10
+
+
+class SearchProviderConfig(BaseModel):
+    """search provider config"""
+
+    name: str = ""
+    url_template: str
+
+    # pagination type, default is offset
+    pagination_type: PaginationType = PaginationType.OFFSET
+    # pagination param name, default is page or offset
+    pagination_param: str = ""
+    # max results per page
+    max_results_per_page: Optional[int] = 10
+    # result pages of the provider fetched at the same time, by all searches
+    max_concurrency: int = Field(default=2, gt=0)
+    # seconds between the starts of two result page fetches of a search read from the links of its first page,
+    # jittered by +-50%, the pages built from url_template start together
+    page_interval: float = Field(default=1.0, ge=0)
+    # pagination selector, the links of the next pages when url_template has no pagination parameter
+    pages_selector: Optional[str] = None
+    # how the result pages are fetched: "browser", "auto" with a plain HTTP request first and the browser when
+    # it fails, an error selector matches or no result is found, or "http" without the browser only
+    fetch_mode: FetchMode = FetchMode.BROWSER
+
+    wait_until: Optional[str] = "domcontentloaded"
+    wait_timeout: Optional[int] = 15000
+
+    # A CSS selector or JS condition to wait for before extracting content.  Default: None.
+    wait_for: str = ""
+
+    # Timeout in ms for page operations like navigation. Default: 60000 (60 seconds).
+    page_timeout: int = Field(default=60000, gt=0)
+
+    # js_code
+    js_code: Optional[str] = None
+
+    click_config: Optional[List[dict]] = Field(
+        default=None,
+        description="Multi-step click configuration, example: [{'selector': '.more', 'wait': 1000}, {'selector': '.details', 'wait': 2000}]",
+    )
+
+    events: Optional[List[EventConfig]] = Field(
+        default=None,
+        description="keyboard configuration, example: [{'event':'enter', 'selector': '.input'},{'event':'fill','selector': '.textarea','value':'abc'},{'event':'click','selector': '.button'}]",
+    )
+
+
+class SearchConfiguration(BaseModel):
+    """search configuration"""
+
+    config: SearchProviderConfig
+    selectors: ExtractSchema
@@ -0,0 +1,267 @@
+"""
+TTL cache of web search results.
+
+Results are kept in an in-memory LRU and, optionally, in a sqlite database under the cache dir,
+so repeated searches skip the browser navigation of the search engine and the captcha risk that
+comes with it.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from appdirs import user_cache_dir
+
+from cstoolbox.config import config
+from cstoolbox.logger import get_logger
+
+logger = get_logger(__name__)
+
+# provider, normalized keyword, page, number, time period, region
+CacheKey = Tuple[str, str, int, int, str, str]
+
+
+def normalize_keyword(kw: str) -> str:
+    """Keywords differing only in case or whitespace give the same results"""
+    return " ".join(kw.split()).casefold()
+
+
+def parse_ttls(value: str) -> Dict[str, int]:
+    """Parse "name=seconds,..." TTL overrides"""
+    ttls = {}
+    for item in value.split(","):
+        name, sep, seconds = item.partition("=")
+        if not sep:
+            continue
+        try:
+            ttls[name.strip()] = int(seconds)
+        except ValueError:
+            logger.warning(f"Invalid search cache TTL: {item}")
+    return ttls
+
+
+class _DiskCache:
+    """Compressed cache entries in a sqlite database"""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS search (key TEXT PRIMARY KEY, expires REAL, data BLOB)")
+        self._db.commit()
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        async with self._lock:
+            return await asyncio.to_thread(self._get, key)
+
+    def _get(self, key: str) -> Optional[Tuple[float, Any]]:
+        row = self._db.execute("SELECT expires, data FROM search WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[0] <= time.time():
+            self._db.execute("DELETE FROM search WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return row[0], json.loads(zlib.decompress(row[1]))
+
+    async def set(self, key: str, expires: float, value: Any):
+        data = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, expires, data)
+
+    def _set(self, key: str, expires: float, data: bytes):
+        self._db.execute("INSERT OR REPLACE INTO search VALUES (?, ?, ?)", (key, expires, data))
+        # expired entries are dropped on write, so the file does not grow forever
+        self._db.execute("DELETE FROM search WHERE expires <= ?", (time.time(),))
+        self._db.commit()
+
+
+class _FetchCancelled(Exception):
+    """The fetch a search was waiting for was cancelled"""
+
+
+class SearchCache:
+    """LRU cache of search results with TTLs per provider and per time period"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: int = 3600,
+        negative_ttl: int = 300,
+        ttls: Optional[Dict[str, int]] = None,
+        disk_path: Optional[Path] = None,
+    ):
+        """
+        Args:
+            max_entries: Entries kept in memory, the least recently used ones are evicted first
+            ttl: Seconds results are cached, 0 disables the cache
+            negative_ttl: Seconds empty results are cached
+            ttls: TTL overrides keyed by provider or time period, the shortest applicable one is used
+            disk_path: sqlite database keeping the entries across restarts, None keeps them in memory only
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.ttls = ttls or {}
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._disk = _DiskCache(disk_path) if disk_path else None
+        # searches being fetched, concurrent identical searches wait for the same result
+        self._pending: Dict[CacheKey, asyncio.Future] = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def key(self, provider: str, kw: str, page: int, number: int, time_period: str, region: str) -> CacheKey:
+        return provider, normalize_keyword(kw), page, number, time_period or "", region
+
+    def ttl_of(self, key: CacheKey, empty: bool = False) -> int:
+        """TTL of an entry: the shortest of the default, the provider and the time period TTLs"""
+        provider, _, _, _, time_period, _ = key
+        ttls = [self.ttl] + [self.ttls[name] for name in (provider, time_period) if name in self.ttls]
+        ttl = min(ttls)
+        return min(ttl, self.negative_ttl) if empty else ttl
+
+    async def get_or_fetch(self, key: CacheKey, fetch: Callable[[], Awaitable[Any]], fresh: bool = False) -> Any:
+        """
+        Return the cached results of a search, fetching and caching them on a miss.
+
+        Args:
+            key: Cache key of the search, see key()
+            fetch: Coroutine function fetching the results
+            fresh: Skip the cached results and fetch them again, the new results are still cached
+        """
+        if not self.enabled:
+            return await fetch()
+
+        if fresh:
+            self.bypasses += 1
+        else:
+            while True:
+                entry = await self._lookup(key)
+                if entry is not None:
+                    return entry
+                pending = self._pending.get(key)
+                if pending is None:
+                    break
+                try:
+                    value = await asyncio.shield(pending)
+                except _FetchCancelled:
+                    # the search that was fetching was cancelled, not this one
+                    continue
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            # the searches waiting for this fetch search again
+            future.set_exception(_FetchCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # retrieve the exception so a future nobody waits for does not log it
+            future.exception()
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+        future.set_result(value)
+        await self._store(key, value)
+        return value
+
+    async def _lookup(self, key: CacheKey) -> Optional[Any]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self._count_hit(entry[1])
+                return entry[1]
+            del self._entries[key]
+
+        if self._disk is not None:
+            try:
+                entry = await self._disk.get(self._disk_key(key))
+            except Exception as e:
+                logger.warning(f"Error reading the search cache: {e}")
+                entry = None
+            if entry is not None:
+                self.disk_hits += 1
+                self._count_hit(entry[1])
+                self._remember(key, entry)
+                return entry[1]
+        return None
+
+    def _count_hit(self, value: Any):
+        self.hits += 1
+        if not value:
+            self.negative_hits += 1
+
+    async def _store(self, key: CacheKey, value: Any):
+        ttl = self.ttl_of(key, empty=not value)
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        self._remember(key, (expires, value))
+        if self._disk is not None:
+            try:
+                await self._disk.set(self._disk_key(key), expires, value)
+            except Exception as e:
+                logger.warning(f"Error writing the search cache: {e}")
+
+    def _remember(self, key: CacheKey, entry: Tuple[float, Any]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _disk_key(key: CacheKey) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
+
+
+search_cache = SearchCache(
+    max_entries=config.search_cache_size,
+    ttl=config.search_cache_ttl,
+    negative_ttl=config.search_cache_negative_ttl,
+    ttls=parse_ttls(config.search_cache_ttls),
+    disk_path=(
+        Path(user_cache_dir("cstoolbox")) / "search_cache.sqlite" if config.search_cache_disk.lower() == "true" else None
+    ),
+)
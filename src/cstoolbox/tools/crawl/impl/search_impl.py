@@ -1,27 +1,47 @@
 import asyncio
 import base64
-import json
 import random
 import time
 from dataclasses import dataclass
-from enum import Enum
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import quote, urljoin
 
-from bs4 import BeautifulSoup
-from pydantic import BaseModel, Field, ValidationError
-
-from cstoolbox.browser.config import EventConfig
+from cstoolbox.browser.config import CrewlerResult
 from cstoolbox.browser.crawler import Crawler, CrawlerConfig
 from cstoolbox.config import config as global_config
 from cstoolbox.core import crawler_manager
 from cstoolbox.logger import get_logger
+from cstoolbox.mcp_helper import get_time_period
 
-from .schema import ExtractSchema
+from .registry import schema_registry
+from .schema import ExtractSchema, FetchMode, PaginationType, SearchConfiguration, SearchProviderConfig
+from .hedge import search_hedger
+from .search_cache import search_cache
+from .static_fetch import StaticFetcher
 
 logger = get_logger(__name__)
 
+# result pages of the providers served as static html, shorter timeout than web_crawler's, searches are interactive
+search_fetcher = StaticFetcher(FetchMode.BROWSER, timeout=5)
+
+# result page fetches running by provider, with the event loop of the semaphores
+_provider_limits: Dict[str, asyncio.Semaphore] = {}
+_provider_limits_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _provider_limit(provider: str, max_concurrency: int) -> asyncio.Semaphore:
+    """Semaphore limiting the result pages of a provider fetched at the same time"""
+    global _provider_limits_loop
+    loop = asyncio.get_running_loop()
+    if _provider_limits_loop is not loop:
+        _provider_limits.clear()
+        _provider_limits_loop = loop
+    limit = _provider_limits.get(provider)
+    if limit is None:
+        limit = _provider_limits[provider] = asyncio.Semaphore(max_concurrency)
+    return limit
+
 
 @dataclass
 class SearchResult:
@@ -40,58 +60,6 @@ class SearchResult:
     metadata: Optional[Dict[str, Any]] = None
 
 
-class PaginationType(str, Enum):
-    """pagination enum"""
-
-    PAGE = "page"  # use page number, like page=1
-    OFFSET = "offset"  # use offset, like first=10
-
-
-class SearchProviderConfig(BaseModel):
-    """search provider config"""
-
-    name: str = ""
-    url_template: str
-
-    # pagination type, default is offset
-    pagination_type: PaginationType = PaginationType.OFFSET
-    # pagination param name, default is page or offset
-    pagination_param: str = ""
-    # max results per page
-    max_results_per_page: Optional[int] = 10
-    # pagination selector
-    pages_selector: Optional[str] = None
-
-    wait_until: Optional[str] = "domcontentloaded"
-    wait_timeout: Optional[int] = 15000
-
-    # A CSS selector or JS condition to wait for before extracting content.  Default: None.
-    wait_for: str = ""
-
-    # Timeout in ms for page operations like navigation. Default: 60000 (60 seconds).
-    page_timeout: int = Field(default=60000, gt=0)
-
-    # js_code
-    js_code: Optional[str] = None
-
-    click_config: Optional[List[dict]] = Field(
-        default=None,
-        description="Multi-step click configuration, example: [{'selector': '.more', 'wait': 1000}, {'selector': '.details', 'wait': 2000}]",
-    )
-
-    events: Optional[List[EventConfig]] = Field(
-        default=None,
-        description="keyboard configuration, example: [{'event':'enter', 'selector': '.input'},{'event':'fill','selector': '.textarea','value':'abc'},{'event':'click','selector': '.button'}]",
-    )
-
-
-class SearchConfiguration(BaseModel):
-    """search configuration"""
-
-    config: SearchProviderConfig
-    selectors: ExtractSchema
-
-
 class SearchExtractor:
     """Class for extracting search results based on configured schema"""
 
@@ -107,23 +75,9 @@ class SearchExtractor:
         self.config, self.schema = self._load_provider_data(provider)
 
     def _load_provider_data(self, provider: str) -> tuple[SearchProviderConfig, ExtractSchema]:
-        """Load provider configuration and schema from JSON file"""
-        config_path = Path(global_config.server_root) / "schema" / "search" / f"{provider}.json"
-        if not config_path.exists():
-            logger.error(f"Configuration file not found: '{config_path}'")
-            raise ValueError(f"Configuration file not found for provider '{provider}'")
-
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # use Pydantic model to validate the entire configuration
-            cfg = SearchConfiguration(**data)
-
-            return cfg.config, cfg.selectors
-
-        except (json.JSONDecodeError, ValidationError) as e:
-            raise ValueError(f"Invalid configuration file for provider '{provider}': {e}")
+        """Get the provider configuration and schema from the schema registry"""
+        cfg = schema_registry.get_search(provider)
+        return cfg.config, cfg.selectors
 
     def _get_search_url(self, kw: str, page: int = 1, number: int = 10, time_period: str = "") -> str:
         """Generate search URL with given parameters"""
@@ -146,19 +100,44 @@ class SearchExtractor:
             "number": number,
             "timestamp": int(time.time() * 1000),
             "rand": random.randint(10000, 99999),
-            "time_period": time_period,
+            "time_period": get_time_period(self.provider, time_period),
         }
         params[param_name] = page_value
 
-        # get base URL
+        path = self.config.url_template.format(**params)
+        return f"{self._get_base_url().rstrip('/')}{path}"
+
+    def _pages_from_links(self) -> bool:
+        """Whether the urls of the next result pages are read from the first one, url_template cannot page"""
+        if not self.config.pages_selector:
+            return False
+        param_name = self.config.pagination_param or (
+            "page" if self.config.pagination_type == PaginationType.PAGE else "offset"
+        )
+        return param_name not in {field for _, field, _, _ in Formatter().parse(self.config.url_template)}
+
+    def _get_base_url(self) -> str:
+        """Get the provider base URL for the configured region"""
         base_url = global_config.region_urls.get(self.provider, {}).get(global_config.region)
         if not base_url:
             base_url = global_config.region_urls[self.provider]["com"]
+        return base_url
 
-        path = self.config.url_template.format(**params)
-        return f"{base_url.rstrip('/')}{path}"
+    async def extract_results(
+        self, kw: str, page: int = 1, number: int = 10, time_period: str = "", fresh: bool = False
+    ) -> Optional[str]:
+        """
+        Extract search results, served from the search cache when the same search was done recently
 
-    async def extract_results(self, kw: str, page: int = 1, number: int = 10, time_period: str = "") -> Optional[str]:
+        Args:
+            fresh: Skip the cache and search again, for freshness-sensitive searches
+        """
+        key = search_cache.key(self.provider, kw, page, number, time_period, global_config.region)
+        return await search_cache.get_or_fetch(
+            key, lambda: self._fetch_results(kw, page, number, time_period), fresh=fresh
+        )
+
+    async def _fetch_results(self, kw: str, page: int = 1, number: int = 10, time_period: str = "") -> Optional[str]:
         """Extract search results using crawl4ai"""
         # get max results per page
         max_per_page = min(number, getattr(self.config, "max_results_per_page", 10))
@@ -179,6 +158,7 @@ class SearchExtractor:
         ]
 
         default_timeout = 15000
+        debug = global_config.log_level.lower() == "debug"
         crawler_config = CrawlerConfig(
             wait_until=self.config.wait_until,
             wait_for=self.config.wait_for,  # Use merged selector list
@@ -188,12 +168,16 @@ class SearchExtractor:
             events=self.config.events,
             base_selector=self.schema.base_selector or None,
             fields=fields,
-            return_full_html=(
-                True if self.config.pages_selector or global_config.log_level.lower() == "debug" else False
-            ),
+            links_selector=self.config.pages_selector if self._pages_from_links() else None,
+            error_selectors=self.schema.error_selectors,
+            # the debug pages are written from the full html
+            return_full_html=debug,
+            extract_in_page=global_config.search_in_page_extract.lower() == "true" and not debug,
+            prune_page=global_config.prune_page.lower() == "true",
         )
+        crawler_config.plan = schema_registry.plan(crawler_config.base_selector, crawler_config.fields)
 
-        async with crawler_manager.get_crawler() as crawler:
+        async with crawler_manager.get_crawler(self._get_base_url()) as crawler:
             js_code = [self.config.js_code.format(number=max_per_page)] if self.config.js_code else []
             if self.config.click_config:
                 for click_step in self.config.click_config:
@@ -221,6 +205,7 @@ class SearchExtractor:
                 kw,
                 time_period,
                 request_times,
+                number,
             )
 
     async def _extract_search_result(
@@ -232,81 +217,139 @@ class SearchExtractor:
         kw: str = "",
         time_period: str = "",
         request_times: int = 1,
-    ):
-        """
-        Extract search results using crawl4ai
+        number: int = 0,
+    ) -> List[Dict[str, Any]]:
         """
+        Extract the result pages of a search.
 
-        all_results = []
+        The pages are fetched in parallel tabs, at most max_concurrency pages of the provider at a time, and merged
+        in page order. Their urls are built from url_template when it has the pagination parameter, otherwise
+        they are read from the links of the first page and fetched after it, their starts spaced by the jittered
+        page_interval. Fetching stops once number results are collected or a page has no result, the pages still
+        running are cancelled.
+        """
+        number = number or request_times * max_per_page
+        first_offset = (page - 1) * max_per_page
+        pages: List[List[Dict[str, Any]]] = []
         page_urls = []
-        current_offset = (page - 1) * max_per_page
-        for i in range(request_times):
-            if page_urls:
-                url = page_urls.pop(0)
-            else:
-                url = self._get_search_url(kw, current_offset // max_per_page + 1, max_per_page, time_period)
-            logger.info("search url: %s", url)
 
-            results = await crawler.crawl(url=url, config=crawler_config)
-
-            if not results:
-                logger.info(
-                    "No search results found for query: '%s' at offset %s",
-                    kw,
-                    current_offset,
-                )
-                raise Exception("crawler result is None")
-
-            if not results.success:
-                logger.info("%s: %s", results.error_message, url)
-                raise Exception(results.error_message)
-
-            if global_config.log_level.lower() == "debug":
-                if results.html:
-                    with open(f"{global_config.log_dir}/search.html", "w") as f:
-                        f.write(results.html)
-
-                if results.markdown:
-                    with open(f"{global_config.log_dir}/search.md", "w") as f:
-                        f.write(results.markdown)
-
-            if not results.results:
-                logger.info(
-                    "No search results found for query: '%s' at offset %s",
-                    kw,
-                    current_offset,
+        def url_of(i: int) -> str:
+            if i > 0 and i <= len(page_urls):
+                return page_urls[i - 1]
+            return self._get_search_url(kw, page + i, max_per_page, time_period)
+
+        def enough() -> bool:
+            return sum(len(rows) for rows in pages) >= number or bool(pages and not pages[-1])
+
+        next_page = 0
+        last_page = request_times
+        if self._pages_from_links():
+            # the urls of the next pages are read from the first one
+            rows, results = await self._search_page(crawler, crawler_config, url_of(0), kw, first_offset)
+            pages.append(rows)
+            page_urls = list(
+                dict.fromkeys(
+                    urljoin(results.url, link["href"])  # 使用 urljoin 转换
+                    for link in results.links
+                    if link["text"] != "1"
                 )
-                break
-
-            logger.info(
-                "Query: %s, offset: %s, found %s results",
-                kw,
-                current_offset,
-                len(results.results),
             )
+            logger.info(f"Found {len(page_urls)} page links")
+            next_page = 1
+            last_page = min(request_times, len(page_urls) + 1)
+            if enough():
+                return rows
+
+        async def fetch(i: int, delay: float):
+            await asyncio.sleep(delay)
+            return await self._search_page(crawler, crawler_config, url_of(i), kw, first_offset + i * max_per_page)
+
+        tasks = []
+        delay = 0.0
+        for i in range(next_page, last_page):
+            if next_page > 0 and i > next_page:
+                delay += self.config.page_interval * random.uniform(0.5, 1.5)
+            tasks.append(asyncio.create_task(fetch(i, delay)))
+        try:
+            for task in tasks:
+                if enough():
+                    break
+                rows, _ = await task
+                pages.append(rows)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # the failures of the cancelled pages are not reported
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return [row for rows in pages for row in rows]
+
+    async def _search_page(
+        self, crawler: Crawler, crawler_config: CrawlerConfig, url: str, kw: str, offset: int
+    ) -> Tuple[List[Dict[str, Any]], CrewlerResult]:
+        """
+        Fetch and extract a result page, once one of the max_concurrency pages of the provider is free
 
-            all_results.extend(results.results)
-            current_offset += max_per_page
-
-            # only extract page links on the first page
-            if i == 0 and self.config.pages_selector and results.html:
-                soup = BeautifulSoup(results.html, "lxml")
-                page_links = soup.select(self.config.pages_selector)
-                page_urls = list(
-                    dict.fromkeys(
-                        urljoin(results.url, link["href"])  # 使用 urljoin 转换
-                        for link in page_links
-                        if link.has_attr("href") and link.text.strip() != "1"
-                    )
-                )
-                logger.info(f"Found {len(page_urls)} page links")
-
-            # add delay between requests, unless it's the last request
-            if i < request_times - 1:
-                await asyncio.sleep(1)  # 300ms delay
-
-        return all_results
+        Raises:
+            Exception: The page could not be crawled
+        """
+        limit = _provider_limit(self.provider, self.config.max_concurrency)
+        async with limit:
+            logger.info("search url: %s", url)
+            # a page served slower than the p90 of the provider is requested again in a fresh tab, with a permit
+            # of its own, a failed page is not served while the other request may still succeed
+            results = await search_hedger.run(
+                self.provider,
+                lambda: self._crawl(crawler, url, crawler_config),
+                limit,
+                accept=lambda result: result is not None and result.success,
+            )
 
-    async def search(self, kw: str, page: int = 1, number: int = 10, time_period: str = "") -> List[SearchResult]:
+        if not results:
+            logger.info("No search results found for query: '%s' at offset %s", kw, offset)
+            raise Exception("crawler result is None")
+
+        if not results.success:
+            logger.info("%s: %s", results.error_message, url)
+            raise Exception(results.error_message)
+
+        # the markdown of search pages is never converted, only the results are used
+        if global_config.log_level.lower() == "debug" and results.html:
+            with open(f"{global_config.log_dir}/search.html", "w") as f:
+                f.write(results.html)
+
+        if not results.results:
+            logger.info("No search results found for query: '%s' at offset %s", kw, offset)
+            return [], results
+
+        logger.info("Query: %s, offset: %s, found %s results", kw, offset, len(results.results))
+        return results.results, results
+
+    async def _crawl(self, crawler: Crawler, url: str, crawler_config: CrawlerConfig) -> CrewlerResult:
+        """Get a result page, without the browser first for the providers serving static result pages"""
+        mode = self.config.fetch_mode
+        if mode == FetchMode.BROWSER:
+            search_fetcher.record("browser")
+            return await crawler.crawl(url=url, config=crawler_config)
+
+        page = await search_fetcher.fetch(url)
+        results = None
+        if page is not None:
+            results = await crawler.extract(page.url, crawler_config, page.html, page.status_code, page.headers)
+            if results.success and not results.error_match and results.results:
+                search_fetcher.record("http")
+                return results
+        if mode == FetchMode.HTTP:
+            search_fetcher.record("http_failed")
+            return results or CrewlerResult(error_message=f"Unavailable to fetch the url {url}", success=False)
+
+        reason = "fetch failed" if results is None else results.error_match or results.error_message or "no results"
+        logger.info("static search page unusable (%s), searching with the browser: %s", reason, url)
+        search_fetcher.record("fallback")
+        return await crawler.crawl(url=url, config=crawler_config)
+
+    async def search(
+        self, kw: str, page: int = 1, number: int = 10, time_period: str = "", fresh: bool = False
+    ) -> List[SearchResult]:
         """Convenience method to perform search and extract results"""
-        return await self.extract_results(kw, page, number, time_period)
+        return await self.extract_results(kw, page, number, time_period, fresh=fresh)
@@ -0,0 +1,137 @@
+"""
+Browserless fast path of web_crawler.
+
+Server rendered pages are fetched with one GET of the shared HTTP client and extracted with the
+schema of their domain like crawled pages. The browser is only used when the page could not be
+fetched, or when its content looks missing or rendered by JavaScript.
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import aiohttp
+from bs4 import UnicodeDammit
+
+from cstoolbox.config import config
+from cstoolbox.core.http_client import http_client
+from cstoolbox.logger import get_logger
+
+from .schema import FetchMode
+
+logger = get_logger(__name__)
+
+# content shorter than this, in characters of text, is taken for a page rendered by JavaScript
+MIN_CONTENT_LENGTH = 200
+# pages asking for JavaScript, only checked on short contents since articles may mention it
+_JS_REQUIRED = re.compile(
+    r"(enable|turn on|activate) javascript|javascript (is )?(required|disabled)|(启用|开启|打开)\s*javascript",
+    re.IGNORECASE,
+)
+_JS_REQUIRED_MAX_LENGTH = 2000
+_TAG = re.compile(r"<[^>]*>")
+
+
+@dataclass
+class StaticPage:
+    url: str
+    html: str
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def content_missing(content: Optional[str]) -> bool:
+    """Whether the content extracted from a static page, html or markdown, looks missing or rendered by JavaScript"""
+    text = " ".join(_TAG.sub(" ", content or "").split())
+    if len(text) < MIN_CONTENT_LENGTH:
+        return True
+    return len(text) < _JS_REQUIRED_MAX_LENGTH and _JS_REQUIRED.search(text) is not None
+
+
+class StaticFetcher:
+    """Fetches pages without the browser and counts which path served the crawls"""
+
+    def __init__(self, mode: str = "auto", timeout: float = 8, max_size_mb: int = 10):
+        """
+        Args:
+            mode: Default fetch mode of the schemas not setting one, "auto", "http" or "browser"
+            timeout: Timeout in seconds of a fetch, the browser is used past it
+            max_size_mb: Pages larger than this are left to the browser
+        """
+        try:
+            self.mode = FetchMode(mode)
+        except ValueError:
+            logger.warning(f"Invalid fetch mode '{mode}', using {FetchMode.AUTO.value}")
+            self.mode = FetchMode.AUTO
+        self.timeout = timeout
+        self.max_size = max_size_mb * 1024 * 1024
+
+        # crawls served by the fast path, by the browser after trying it, and by the browser only, and the fast
+        # path failures of the "http" mode, which has no browser to fall back to
+        self.http = 0
+        self.fallback = 0
+        self.http_failed = 0
+        self.browser = 0
+        self._fetch_time = 0.0
+        self._fetches = 0
+
+    def mode_of(self, schema_mode: Optional[FetchMode]) -> FetchMode:
+        return schema_mode or self.mode
+
+    async def fetch(self, url: str) -> Optional[StaticPage]:
+        """Fetch an html page, None when it is not an html page served with status 200"""
+        started_at = time.time()
+        try:
+            session = http_client.session()
+            async with session.get(
+                url,
+                proxy=http_client.proxy,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8"},
+            ) as resp:
+                if resp.status != 200 or "html" not in resp.headers.get("Content-Type", ""):
+                    return None
+                if (resp.content_length or 0) > self.max_size:
+                    return None
+                # chunked responses have no length, the download stops once the body passes the limit
+                chunks, size = [], 0
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_size:
+                        return None
+                    chunks.append(chunk)
+                body = b"".join(chunks)
+                # the charset of the headers, or of the meta tags of the page
+                html = UnicodeDammit(body, [resp.charset] if resp.charset else [], is_html=True).unicode_markup
+                if html is None:
+                    return None
+                return StaticPage(str(resp.url), html, resp.status, {k.lower(): v for k, v in resp.headers.items()})
+        except Exception as e:
+            logger.debug(f"Error fetching {url} without the browser: {e}")
+            return None
+        finally:
+            self._fetches += 1
+            self._fetch_time += time.time() - started_at
+
+    def record(self, path: str):
+        """
+        Count a crawl served by "http", the browser after the fast path ("fallback") or the "browser" only,
+        or failed without the browser ("http_failed")
+        """
+        setattr(self, path, getattr(self, path) + 1)
+
+    def stats(self) -> dict:
+        tried = self.http + self.fallback + self.http_failed
+        return {
+            "mode": self.mode.value,
+            "http": self.http,
+            "fallback": self.fallback,
+            "http_failed": self.http_failed,
+            "browser": self.browser,
+            "http_rate": round(self.http / tried, 4) if tried else 0,
+            "fetch_avg_ms": round(self._fetch_time / self._fetches * 1000, 2) if self._fetches else 0,
+        }
+
+
+static_fetcher = StaticFetcher(config.crawl_fetch_mode)
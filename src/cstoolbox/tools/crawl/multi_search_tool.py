@@ -0,0 +1,40 @@
+from typing import Any
+
+from cstoolbox.core.base_tool import BaseTool
+from .impl.multi_search import multi_search
+
+
+class MultiSearchTool(BaseTool):
+    """Multi-provider search tool implementation"""
+
+    @property
+    def tool_name(self) -> str:
+        return "multi_search"
+
+    @property
+    def description(self) -> str:
+        return "Used to search several search engines at once and merge their results"
+
+    async def execute(self, **kwargs: Any) -> dict:
+        """
+        Execute multi-provider search operation
+
+        Args:
+            providers: Search engine names, default is bing, google and baidu
+            kw: Search keyword
+            number: Number of results, default is 10
+            time_period: Time range, default is empty
+            fresh: Skip the search cache, default is False
+            timeout: Deadline in seconds, default is 20
+
+        Returns:
+            Merged search results and the status of every provider
+        """
+        return await multi_search(
+            kwargs["kw"],
+            providers=kwargs.get("providers"),
+            number=kwargs.get("number", 10),
+            time_period=kwargs.get("time_period", ""),
+            fresh=kwargs.get("fresh", False),
+            timeout=kwargs.get("timeout", 20),
+        )
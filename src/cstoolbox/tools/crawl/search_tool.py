@@ -25,6 +25,7 @@ class SearchTool(BaseTool):
             page: Page number, default is 1
             number: Number of results per page, default is 10
             time_period: Time range, default is empty
+            fresh: Skip the search cache, default is False
 
         Returns:
             Search results dictionary
@@ -34,6 +35,7 @@ class SearchTool(BaseTool):
         page = kwargs.get("page", 1)
         number = kwargs.get("number", 10)
         time_period = kwargs.get("time_period", "")
+        fresh = kwargs.get("fresh", False)
 
         extractor = SearchExtractor(provider)
-        return await extractor.search(kw, page=page, number=number, time_period=time_period)
+        return await extractor.search(kw, page=page, number=number, time_period=time_period, fresh=fresh)
@@ -0,0 +1,80 @@
+"""
+Golden file tests of the HTML cleaners.
+
+Each page of cleaner_corpus is cleaned the way the crawler does it, and the output of every cleaner
+must match the golden file written by the reference soup cleaner.
+
+regenerate the golden files: `python tests/cleaner_test.py`
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from cstoolbox.browser.cleaner import _UNPARSED, CLEANERS, get_cleaner
+
+CORPUS = Path(__file__).resolve().parent / "cleaner_corpus"
+BASE_URL = "https://example.com/news/2024/article.html"
+# elements cleaned like html and markdown fields
+SELECTORS = ["article", "div", "table", "td", "ul", "pre", "p", "a", "figure", "nav"]
+
+
+def _read(path: Path) -> str:
+    # the newlines of the pages are part of the test
+    return path.read_bytes().decode("utf-8")
+
+
+def clean(cleaner_name: str, html: str) -> dict:
+    cleaner = get_cleaner(cleaner_name)
+    soup = BeautifulSoup(html, "lxml")
+    page = cleaner.load(soup, html)
+    output = {"elements": {}}
+    for selector in SELECTORS:
+        element = soup.select_one(selector)
+        if element is not None:
+            output["elements"][selector] = cleaner.clean_element(page, element, base_url=BASE_URL)
+            output["elements"][f"{selector} (links, images)"] = cleaner.clean_element(
+                page, element, remove_link=False, remove_img=False, base_url=BASE_URL
+            )
+            output["elements"][f"{selector} (no links)"] = cleaner.clean_element(
+                page, element, remove_link=True, base_url=BASE_URL
+            )
+    output["content"] = cleaner.clean_content(page, base_url=BASE_URL)
+
+    # the content is cleaned in place, so each variant needs its own page, loaded unparsed like clean_page does
+    output["content (no links)"] = cleaner.clean_content(cleaner.load(None, html), remove_link=True, base_url=BASE_URL)
+    return output
+
+
+@pytest.mark.parametrize("cleaner", CLEANERS)
+@pytest.mark.parametrize("page", sorted(path.stem for path in CORPUS.glob("*.html")))
+def test_cleaner_matches_golden_file(cleaner, page):
+    expected = json.loads(_read(CORPUS / f"{page}.json"))
+    assert clean(cleaner, _read(CORPUS / f"{page}.html")) == expected
+
+
+def test_lxml_tree_is_parsed_when_first_needed():
+    html = _read(sorted(CORPUS.glob("*.html"))[0])
+    soup = BeautifulSoup(html, "lxml")
+    page = get_cleaner("lxml").load(soup, html)
+    assert page._root is _UNPARSED
+    get_cleaner("lxml").clean_element(page, soup.body.find("p") or soup.body)
+    assert page._root is not _UNPARSED
+
+    # cleaning the whole page does not parse it with BeautifulSoup
+    page = get_cleaner("lxml").load(None, html)
+    assert get_cleaner("lxml").clean_content(page) and page._soup is None
+
+
+def test_invalid_cleaner():
+    with pytest.raises(ValueError):
+        get_cleaner("regex")
+
+
+if __name__ == "__main__":
+    for path in sorted(CORPUS.glob("*.html")):
+        golden = json.dumps(clean("soup", _read(path)), ensure_ascii=False, indent=2)
+        path.with_suffix(".json").write_bytes((golden + "\n").encode("utf-8"))
+        print(f"wrote {path.with_suffix('.json').name}")
@@ -0,0 +1,74 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+
+from cstoolbox.browser.config import CrawlerConfig
+from cstoolbox.browser.crawler import Crawler
+
+PAGE_HTML = """<html><head><title>Article {index}</title></head><body>
+<div id="content"><p>Body of article {index}</p>
+<p><a href="detail.html">relative</a> <a href="/root-{index}.html">absolute path</a></p>
+</div></body></html>"""
+
+
+async def _yield():
+    """Give the other crawls a chance to run, so the crawls interleave at every await"""
+    await asyncio.sleep(random.random() / 100)
+
+
+class FakePage:
+    """Serves a page whose relative links only resolve correctly against its own url"""
+
+    def __init__(self):
+        self.url = ""
+        self.html = ""
+
+    async def goto(self, url, timeout=None):
+        await _yield()
+        self.url = url
+        self.html = PAGE_HTML.format(index=url.split("/")[-2])
+
+    async def wait_for_selector(self, selector, timeout=None):
+        await _yield()
+
+    async def content(self):
+        await _yield()
+        return self.html
+
+
+class FakePool:
+    @asynccontextmanager
+    async def page(self, config):
+        await _yield()
+        yield FakePage()
+
+
+def test_concurrent_crawls_resolve_links_against_their_own_url():
+    crawler = Crawler(FakePool())
+    config = CrawlerConfig(
+        wait_for="body",
+        fields=[
+            {"name": "title", "selector": "title", "type": "text"},
+            {"name": "content", "selector": "#content", "type": "html"},
+        ],
+    )
+    urls = [f"https://site{i}.example.com/news/{i}/index.html" for i in range(50)]
+
+    async def crawl(url):
+        result = await crawler.crawl(url, config)
+        await crawler.render_content(result)
+        return result
+
+    async def crawl_all():
+        return await asyncio.gather(*(crawl(url) for url in urls))
+
+    results = asyncio.run(crawl_all())
+
+    for i, (url, result) in enumerate(zip(urls, results)):
+        assert result.success, result.error_message
+        assert result.url == url
+        assert result.results["title"] == f"Article {i}"
+        for html in (result.results["content"], result.cleaned_html):
+            assert f'href="https://site{i}.example.com/news/{i}/detail.html"' in html
+            assert f'href="https://site{i}.example.com/root-{i}.html"' in html
+        assert f"(https://site{i}.example.com/news/{i}/detail.html)" in result.markdown
@@ -0,0 +1,188 @@
+"""
+Benchmark of the extraction of a crawled page, single parse pipeline against the previous one,
+with the soup and the lxml cleaners.
+
+For each bundled content schema a page matching its selectors is generated, with a large article
+and the usual page chrome (scripts, navigation, ads), and extracted with each pipeline.
+
+run: `python tests/extract_benchmark.py [article paragraphs, default 400]`
+"""
+
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from cstoolbox.browser.cleaner import SoupCleaner
+from cstoolbox.browser.config import CrawlerConfig, FieldType
+from cstoolbox.browser.crawler import Crawler, CrawlSession
+
+project_root = Path(__file__).resolve().parent.parent
+schema_dir = project_root / "src" / "cstoolbox" / "schema" / "content"
+
+PARAGRAPH = (
+    '<p class="p">Paragraph {i} of the article, with <a href="/news/{i}.html" class="link">a relative link</a>, '
+    '<span class="em"><span>nested spans</span></span> and <b>bold text</b>. '
+    '<img src="/img/{i}.jpg" data-src="/img/{i}.jpg"></p>'
+)
+TABLE = '<table class="t"><tr><th colspan="2">Head {i}</th></tr><tr><td>a</td><td rowspan="1">b</td></tr></table>'
+CHROME = (
+    '<script>var x = {i};</script><style>.c{i}{{color:red}}</style>'
+    '<div class="ad-{i}"><iframe src="https://ads.example.com/{i}"></iframe></div><!-- comment {i} -->'
+)
+
+
+def _element(compound: str, inner: str) -> str:
+    """Build an element matching a compound CSS selector like div.a#b[class^='c']"""
+    compound = re.sub(r":[\w-]+(\([^)]*\))?", "", compound)
+    tag = re.match(r"^[a-zA-Z][\w-]*", compound)
+    tag = tag.group(0) if tag else "div"
+    if tag in ("html", "body"):
+        return inner
+    ids = re.findall(r"#([\w-]+)", compound)
+    classes = re.findall(r"\.([\w-]+)", compound)
+    attrs = re.findall(r"\[([\w-]+)[\^$*]?=['\"]?([^'\"\]]+)['\"]?\]", compound)
+    parts = [f'id="{ids[0]}"'] if ids else []
+    class_values = classes + [value + "x" for name, value in attrs if name == "class"]
+    if class_values:
+        parts.append(f'class="{" ".join(class_values)}"')
+    parts += [f'{name}="{value}"' for name, value in attrs if name != "class"]
+    if tag == "meta":
+        return f'<meta {" ".join(parts)} content="{inner}">'
+    return f'<{tag} {" ".join(parts)}>{inner}</{tag}>'
+
+
+def _matching(selector: str, inner: str) -> str:
+    """Build nested elements matching a selector made of compounds and descendant or child combinators"""
+    for compound in reversed(re.sub(r"\s*>\s*", " ", selector).split()):
+        inner = _element(compound, inner)
+    return inner
+
+
+def build_page(schema: dict, paragraphs: int) -> str:
+    selectors = schema["selectors"]
+    article = "".join(
+        (TABLE if i % 50 == 0 else "") + PARAGRAPH.format(i=i) + (CHROME.format(i=i) if i % 20 == 0 else "")
+        for i in range(paragraphs)
+    )
+    fields = "".join(
+        _matching(field["selector"], article if field["name"] == "content" else f"Title of {schema['config']['name']}")
+        for field in selectors["fields"]
+    )
+    chrome = "".join(CHROME.format(i=i) for i in range(paragraphs // 10))
+    body = _matching(selectors["base_selector"], fields)
+    return (
+        f"<!DOCTYPE html><html><head><title>{schema['config']['name']}</title><meta charset='utf-8'></head><body>"
+        f"<header><nav><a href='/'>Home</a></nav></header>{chrome}{body}<footer>footer</footer></body></html>"
+    )
+
+
+def crawler_config(schema: dict, remove_link: bool) -> CrawlerConfig:
+    # the way DataExtractor builds the config, with markdown output
+    return CrawlerConfig(
+        base_selector=schema["selectors"]["base_selector"],
+        fields=[
+            {**field, "type": "markdown" if field["name"] == "content" else field["type"]}
+            for field in schema["selectors"]["fields"]
+            if field["type"] in ("text", "html", "markdown", "attribute")
+        ],
+        remove_link=remove_link,
+    )
+
+
+def legacy_extract(crawler: Crawler, body: str, html: str, config: CrawlerConfig, url: str) -> dict:
+    """The previous pipeline: parse the body, parse the page, parse every html and markdown field again"""
+    cleaner = SoupCleaner()
+
+    def select_one(soup, field):
+        element = soup.select_one(field.selector)
+        if not element:
+            return None
+        if field.type == FieldType.TEXT:
+            return element.get_text().strip()
+        if field.type == FieldType.HTML:
+            return cleaner.clean_html(str(element), field.remove_link, field.remove_img, url)
+        if field.type == FieldType.MARKDOWN:
+            return crawler._mark_it_down(cleaner.clean_html(str(element), field.remove_link, field.remove_img, url))
+        if field.type == FieldType.ATTRIBUTE and field.attribute:
+            return element.get(field.attribute)
+        return None
+
+    cleaned_html = cleaner.clean_for_content(cleaner.clean_html(body, config.remove_link, base_url=url))
+    soup = BeautifulSoup(html, "lxml")
+    title = next((t for t in (soup.select_one(s) for s in ["title", "h1", "h2"]) if t and t.get_text().strip()), None)
+    data = []
+    for element in soup.select(config.base_selector):
+        item = {}
+        for field in config.fields:
+            value = select_one(element, field)
+            item[field.name] = value.strip() if value else None
+        data.append(item)
+    return {
+        "title": title.get_text().strip() if title else None,
+        "cleaned_html": cleaned_html,
+        "markdown": crawler._mark_it_down(cleaned_html),
+        "results": data,
+    }
+
+
+def _rendered(crawler, url, config, html):
+    """Extract a page and render its cleaned html and markdown, what render_content does without workers"""
+    result = crawler._extract(CrawlSession(url=url, config=config), html)
+    cleaned_html = crawler.clean_page(html, url, config.remove_link)
+    result.set_content(cleaned_html, crawler._mark_it_down(cleaned_html))
+    return result
+
+
+def _measure(extract, repeat: int = 3):
+    """Best CPU time of a few runs, and the result of the extraction"""
+    times = []
+    for _ in range(repeat):
+        start = time.process_time()
+        result = extract()
+        times.append(time.process_time() - start)
+    return min(times), result
+
+
+def main(paragraphs: int):
+    crawler = Crawler(browser_pool=None, cleaner="soup")
+    lxml_crawler = Crawler(browser_pool=None, cleaner="lxml")
+    total_legacy = total_single = total_lxml = 0.0
+    mismatches = []
+    print(f"{'schema':32} {'page KB':>8} {'legacy ms':>10} {'soup ms':>10} {'lxml ms':>10} {'saved':>6}")
+    for path in sorted(schema_dir.glob("*.json")):
+        schema = json.loads(path.read_text(encoding="utf-8"))
+        html = build_page(schema, paragraphs)
+        url = f"https://{path.stem}/news/article.html"
+        config = crawler_config(schema, remove_link=False)
+        # in the previous pipeline the body came from a separate inner_html() call to the browser
+        body = BeautifulSoup(html, "lxml").body.decode_contents()
+
+        legacy_time, legacy = _measure(lambda: legacy_extract(crawler, body, html, config, url))
+        single_time, result = _measure(lambda: _rendered(crawler, url, config, html))
+        lxml_time, lxml_result = _measure(lambda: _rendered(lxml_crawler, url, config, html))
+
+        for cleaner, output in (("soup", result), ("lxml", lxml_result)):
+            current = {k: getattr(output, k) for k in ("title", "cleaned_html", "markdown", "results")}
+            if current != legacy:
+                mismatches.append(f"{path.stem} ({cleaner})")
+        total_legacy += legacy_time
+        total_single += single_time
+        total_lxml += lxml_time
+        print(
+            f"{path.stem:32} {len(html) // 1024:>8} {legacy_time * 1000:>10.1f} {single_time * 1000:>10.1f} "
+            f"{lxml_time * 1000:>10.1f} {1 - lxml_time / legacy_time:>6.0%}"
+        )
+
+    print(
+        f"{'total':32} {'':>8} {total_legacy * 1000:>10.1f} {total_single * 1000:>10.1f} {total_lxml * 1000:>10.1f} "
+        f"{1 - total_lxml / total_legacy:>6.0%}"
+    )
+    print(f"outputs differing from the previous pipeline: {mismatches or 'none'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400)
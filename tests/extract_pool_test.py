@@ -0,0 +1,62 @@
+import asyncio
+
+from cstoolbox.browser.config import CrawlerConfig
+from cstoolbox.browser.crawler import Crawler, CrawlSession
+from cstoolbox.browser.extractor import ExtractPool
+
+HTML = (
+    "<html><head><title>Page</title></head><body><script>var a;</script>"
+    "<div class='post'><h1>Heading</h1><p>Some <a href='/x'>text</a></p></div></body></html>"
+)
+CONFIG = CrawlerConfig(
+    base_selector="div.post",
+    fields=[{"name": "title", "selector": "h1", "type": "text"}, {"name": "content", "selector": "p", "type": "markdown"}],
+)
+
+
+def _extract_with(pool: ExtractPool):
+    async def run():
+        try:
+            return await asyncio.gather(*(pool.extract("https://example.com/a", CONFIG, HTML) for _ in range(3)))
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_workers_match_inline_extraction():
+    expected = Crawler(browser_pool=None)._extract(CrawlSession(url="https://example.com/a", config=CONFIG), HTML)
+    for mode in ("process", "thread", "inline"):
+        pool = ExtractPool(mode, workers=1)
+        for result, timings in _extract_with(pool):
+            assert result.model_dump() == expected.model_dump()
+            assert {"parse", "select", "extract_wait"} <= timings.keys()
+            # the page html is not sent back by the workers, the cleaned page is rendered by a separate job
+            assert result.content_source is None and result.cleaned_html == ""
+
+        stats = pool.stats()
+        assert stats["extractions"] == 3 and stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        assert "markdown" not in stats["stage_avg_ms"]
+
+
+def test_content_is_rendered_when_asked_for():
+    crawler = Crawler(browser_pool=None)
+    result = asyncio.run(crawler.extract("https://example.com/a", CONFIG, HTML))
+    assert result.content_source[0] == HTML and result.cleaned_html == result.markdown == ""
+    asyncio.run(crawler.render_content(result))
+    assert result.markdown == "Heading\n=======\nSome [text](https://example.com/x)"
+    # the page html is released once rendered, and the content is part of the result
+    assert result.content_source is None
+    assert result.model_dump()["markdown"] == result.markdown
+    expected_html = result.cleaned_html
+
+    for mode in ("process", "thread", "inline"):
+        crawler.extract_pool = pool = ExtractPool(mode, workers=1)
+        try:
+            result = asyncio.run(crawler.extract("https://example.com/a", CONFIG, HTML))
+            asyncio.run(crawler.render_content(result, markdown=False))
+        finally:
+            pool.shutdown()
+        assert result.content_source is None and result.cleaned_html == expected_html
+        assert result.markdown == ""
+        assert pool.stats()["stage_avg_ms"].keys() == {"parse", "select", "clean"}
@@ -0,0 +1,55 @@
+import pickle
+
+from bs4 import BeautifulSoup
+
+from cstoolbox.browser.config import CrawlerConfig, FieldConfig
+from cstoolbox.browser.crawler import Crawler, CrawlSession
+from cstoolbox.browser.plan import compile_plan
+
+ROW = (
+    '<li class="b_algo"><a class="tilk" aria-label="Site {i}" href="https://s{i}.example.com">s</a>'
+    '<h2><a href="/page/{i}">Title {i}</a></h2><div class="b_caption"><p>Summary {i}</p></div></li>'
+)
+HTML = f"<html><head><title>Results</title></head><body><ol id='b_results'>{''.join(ROW.format(i=i) for i in range(50))}</ol></body></html>"
+FIELDS = [
+    FieldConfig(name="sitename", selector=".tilk", type="attribute", attribute="aria-label"),
+    FieldConfig(name="title", selector="h2 a", type="text"),
+    FieldConfig(name="url", selector="h2 a", type="attribute", attribute="href"),
+    FieldConfig(name="summary", selector=".b_caption p", type="text"),
+    FieldConfig(name="missing", selector=".none", type="text"),
+]
+
+
+def test_plan_shares_selectors_between_fields():
+    plan = compile_plan("#b_results > li.b_algo", FIELDS)
+    assert plan.stats() == {"fields": 5, "selectors": 4}
+    assert compile_plan("#b_results > li.b_algo", FIELDS) is plan
+    # workers receive the key and compile the plan once
+    assert pickle.loads(pickle.dumps(plan)) is plan
+
+
+def test_plan_extracts_the_same_rows_as_field_by_field_selection():
+    config = CrawlerConfig(base_selector="#b_results > li.b_algo", fields=FIELDS)
+    result = Crawler(browser_pool=None)._extract(CrawlSession(url="https://www.bing.com/search", config=config), HTML)
+
+    soup = BeautifulSoup(HTML, "lxml")
+    expected = []
+    for row in soup.select(config.base_selector):
+        item = {}
+        for field in FIELDS:
+            element = row.select_one(field.selector)
+            value = None
+            if element is not None:
+                value = element.get_text().strip() if field.type == "text" else element.get(field.attribute)
+            item[field.name] = value or None
+        expected.append(item)
+
+    assert len(result.results) == 50
+    assert result.results == expected
+    assert result.results[3] == {
+        "sitename": "Site 3",
+        "title": "Title 3",
+        "url": "/page/3",
+        "summary": "Summary 3",
+        "missing": None,
+    }
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from cstoolbox.browser.config import CrewlerResult
+from cstoolbox.tools.crawl.impl.hedge import MIN_SAMPLES, SearchHedger
+
+
+class Requests:
+    """Requests answering after the given delays in turn, or failing when the delay is None"""
+
+    def __init__(self, *delays):
+        self.delays = delays
+        self.sent = 0
+        self.cancelled = []
+
+    async def __call__(self):
+        index = self.sent
+        self.sent += 1
+        delay = self.delays[index]
+        try:
+            await asyncio.sleep(delay or 0.01)
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        if delay is None:
+            raise Exception(f"request {index} failed")
+        return index
+
+
+def _hedger():
+    hedger = SearchHedger(enabled=True)
+    hedger._stats("bing").attempts.extend([0.02] * MIN_SAMPLES)
+    return hedger
+
+
+def test_slow_request_is_hedged():
+    hedger = _hedger()
+    requests = Requests(1, 0.01)
+    assert asyncio.run(hedger.run("bing", requests)) == 1
+    assert requests.cancelled == [0]
+
+    # served before the hedge delay
+    requests = Requests(0.005)
+    assert asyncio.run(hedger.run("bing", requests)) == 0 and requests.sent == 1
+
+    stats = hedger.stats()["providers"]["bing"]
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"], stats["hedge_rate"]) == (2, 1, 1, 0.5)
+    assert stats["hedge_delay_ms"] == 20 and stats["p99_ms"] < 100
+
+
+def test_failed_request_leaves_the_other_one_a_chance():
+    hedger = _hedger()
+    assert asyncio.run(hedger.run("bing", Requests(0.1, None))) == 0
+    # failing before the hedge delay
+    requests = Requests(None)
+    with pytest.raises(Exception, match="request 0 failed"):
+        asyncio.run(hedger.run("bing", requests))
+    assert requests.sent == 1
+
+
+def test_unsuccessful_response_leaves_the_other_request_a_chance():
+    hedger = _hedger()
+    requests = Requests(0.1, 0.01)
+
+    async def crawl():
+        # the crawler reports failures in the result
+        index = await requests()
+        return CrewlerResult(url=f"/{index}", success=index == 0, error_message="captcha")
+
+    result = asyncio.run(hedger.run("bing", crawl, accept=lambda result: result is not None and result.success))
+    assert result.url == "/0" and result.success
+    assert hedger.stats()["providers"]["bing"]["hedge_wins"] == 0
+
+    # neither is accepted, the primary is served
+    requests = Requests(0.1, 0.01)
+    result = asyncio.run(hedger.run("bing", crawl, accept=lambda result: False))
+    assert result.url == "/0"
+
+
+def test_requests_are_not_hedged_without_enough_latencies():
+    hedger = SearchHedger(enabled=True)
+    requests = Requests(0.1)
+    assert asyncio.run(hedger.run("bing", requests)) == 0 and requests.sent == 1
+    assert SearchHedger(enabled=False).delay("bing") is None
+
+
+def test_hedges_need_a_free_permit_and_lost_requests_are_sampled():
+    async def run():
+        hedger = _hedger()
+        limit = asyncio.Semaphore(2)
+        async with limit:
+            requests = Requests(0.1, 0.01)
+            assert await hedger.run("bing", requests, limit) == 1
+            assert not limit.locked()
+            # the cancelled request counts the time it ran
+            assert max(hedger._stats("bing").attempts) >= 0.02
+
+            async with limit:
+                requests = Requests(0.05, 0.01)
+                assert await hedger.run("bing", requests, limit) == 0 and requests.sent == 1
+        return hedger.stats()["providers"]["bing"]
+
+    stats = asyncio.run(run())
+    assert (stats["hedged"], stats["hedges_skipped"]) == (1, 1)
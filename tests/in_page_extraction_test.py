@@ -0,0 +1,113 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from cstoolbox.browser.config import CrawlerConfig
+from cstoolbox.browser.crawler import Crawler
+from cstoolbox.browser.plan import IN_PAGE_EXTRACT_JS, compile_plan
+
+PAGE_HTML = """<html><head><title> Results </title></head><body>
+<div class="r"><h3> First </h3><a href="/1">one</a><span class="s">  </span></div>
+<div class="r"><h3>Second</h3><span class="s">summary</span></div>
+<nav><a href="?p=1"> 1 </a><a href="?p=2"> 2 </a><a>3</a></nav>
+</body></html>"""
+
+# what IN_PAGE_EXTRACT_JS returns for PAGE_HTML, texts are not stripped in the page
+EXTRACTED = {
+    "rows": [[" First ", "/1", "  "], ["Second", None, "summary"]],
+    "title": [" Results ", None, None],
+    "links": [["?p=1", " 1 "], ["?p=2", " 2 "]],
+}
+
+
+class FakePage:
+    def __init__(self, extracted):
+        self.extracted = extracted
+        self.evaluated = []
+        self.serialized = False
+
+    async def goto(self, url, timeout=None):
+        return None
+
+    async def evaluate(self, script, arg=None):
+        self.evaluated.append((script, arg))
+        return self.extracted
+
+    async def content(self):
+        self.serialized = True
+        return PAGE_HTML
+
+
+class FakePool:
+    def __init__(self, page):
+        self.fake_page = page
+
+    @asynccontextmanager
+    async def page(self, config):
+        yield self.fake_page
+
+
+FIELDS = [
+    {"name": "title", "selector": "h3", "type": "text"},
+    {"name": "url", "selector": "a", "type": "attribute", "attribute": "href"},
+    {"name": "summary", "selector": ".s", "type": "text"},
+]
+
+
+def _config(fields=FIELDS, **kwargs) -> CrawlerConfig:
+    return CrawlerConfig(
+        base_selector="div.r",
+        fields=fields,
+        links_selector="nav a",
+        **kwargs,
+    )
+
+
+def _crawl(extracted, config):
+    page = FakePage(extracted)
+    result = asyncio.run(Crawler(FakePool(page)).crawl("https://example.com/search", config))
+    assert result.success, result.error_message
+    return page, result
+
+
+def test_in_page_extraction_matches_html_extraction():
+    page, in_page = _crawl(EXTRACTED, _config(extract_in_page=True))
+    assert not page.serialized
+    script, arg = page.evaluated[0]
+    assert script == IN_PAGE_EXTRACT_JS
+    assert arg == {
+        "base": "div.r",
+        "groups": [["h3", [[0, "text", None]]], ["a", [[1, "attribute", "href"]]], [".s", [[2, "text", None]]]],
+        "size": 3,
+        "links": "nav a",
+    }
+    assert in_page.metrics["extraction"] == "page"
+
+    page, from_html = _crawl(EXTRACTED, _config())
+    assert page.serialized and not page.evaluated
+    assert from_html.metrics["extraction"] == "html"
+
+    assert in_page.title == from_html.title == "Results"
+    assert in_page.results == from_html.results
+    assert in_page.results[0] == {"title": "First", "url": "/1", "summary": None}
+    assert in_page.links == from_html.links == [{"href": "?p=1", "text": "1"}, {"href": "?p=2", "text": "2"}]
+    assert in_page.metrics["transferred"] < from_html.metrics["transferred"]
+
+
+def test_page_without_title():
+    _, result = _crawl({**EXTRACTED, "title": [None, None, None]}, _config(extract_in_page=True))
+    assert result.title == "" and len(result.results) == 2
+
+
+def test_in_page_extraction_falls_back_to_html():
+    # selector the browser does not support
+    error = {"error": "SyntaxError: ':-soup-contains' is not a valid selector"}
+    page, result = _crawl(error, _config(extract_in_page=True))
+    assert page.evaluated and page.serialized
+    assert result.metrics["extraction"] == "html"
+    assert result.results[1]["summary"] == "summary"
+
+    # markdown fields need the cleaner
+    config = _config(FIELDS + [{"name": "content", "selector": ".s", "type": "markdown"}], extract_in_page=True)
+    assert not compile_plan(config.base_selector, config.fields).in_page
+    page, result = _crawl(EXTRACTED, config)
+    assert not page.evaluated and page.serialized
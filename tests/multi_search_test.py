@@ -0,0 +1,59 @@
+import asyncio
+
+from cstoolbox.tools.crawl.impl import multi_search as multi_search_module
+from cstoolbox.tools.crawl.impl.multi_search import fuse, multi_search, normalize_url
+
+RESULTS = {
+    "bing": [
+        {"title": "A", "url": "https://www.example.com/a/?utm_source=bing", "summary": None},
+        {"title": "B", "url": "https://example.com/b"},
+    ],
+    "google": [
+        {"title": "B", "url": "http://example.com/b#top"},
+        {"title": "A", "url": "https://example.com/a", "summary": "About A"},
+        {"title": "C", "url": "https://example.com/c"},
+    ],
+}
+
+
+class FakeExtractor:
+    """Serves RESULTS, baidu never answers and duckduckgo fails"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def search(self, kw, number=10, time_period="", fresh=False):
+        if self.provider == "baidu":
+            await asyncio.sleep(10)
+        if self.provider == "duckduckgo":
+            raise Exception("captcha")
+        return RESULTS[self.provider]
+
+
+def test_normalize_url():
+    assert normalize_url("https://www.Example.com:443/a/?b=2&a=1&utm_medium=x#frag") == "example.com/a?a=1&b=2"
+    assert normalize_url("http://example.com/a") == normalize_url("https://example.com/a/")
+    assert normalize_url("https://example.com:8080/a") == "example.com:8080/a"
+    assert normalize_url("https://example.com/a?id=1") != normalize_url("https://example.com/a?id=2")
+
+
+def test_fuse_merges_duplicates():
+    results = fuse(RESULTS)
+    assert [(row["title"], row["providers"]) for row in results] == [
+        ("A", ["bing", "google"]),
+        ("B", ["google", "bing"]),
+        ("C", ["google"]),
+    ]
+    # the fields of the provider ranking it best, completed by the others
+    assert results[0]["url"] == RESULTS["bing"][0]["url"] and results[0]["summary"] == "About A"
+    assert results[0]["score"] == round(1 / 61 + 1 / 62, 6)
+
+
+def test_results_arrived_before_the_deadline_are_returned(monkeypatch):
+    monkeypatch.setattr(multi_search_module, "SearchExtractor", FakeExtractor)
+    merged = asyncio.run(multi_search("kw", ["bing", "google", "baidu", "duckduckgo"], number=2, timeout=0.2))
+    assert [row["title"] for row in merged["results"]] == ["A", "B"]
+    statuses = merged["providers"]
+    assert (statuses["bing"]["status"], statuses["bing"]["count"]) == ("ok", 2)
+    assert statuses["baidu"]["status"] == "timeout"
+    assert statuses["duckduckgo"] == {"status": "error", "error": "captcha", "elapsed_ms": statuses["duckduckgo"]["elapsed_ms"]}
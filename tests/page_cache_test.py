@@ -0,0 +1,81 @@
+import asyncio
+
+from aiohttp import web
+
+from cstoolbox.core.http_client import http_client
+from cstoolbox.tools.crawl.impl.crawl_impl import DataExtractor
+from cstoolbox.tools.crawl.impl.page_cache import PageCache
+from cstoolbox.tools.crawl.impl.registry import schema_registry
+
+
+async def _serve(etag):
+    """Serve a page answering conditional requests for the given ETag"""
+
+    async def handler(request):
+        if request.headers.get("If-None-Match") == etag["value"]:
+            return web.Response(status=304)
+        return web.Response(text="page", headers={"ETag": etag["value"]})
+
+    app = web.Application()
+    app.router.add_get("/article", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/article"
+
+
+def test_page_cache_revalidates_and_evicts(tmp_path):
+    async def run():
+        etag = {"value": '"v1"'}
+        runner, url = await _serve(etag)
+        try:
+            cache = PageCache(tmp_path, fresh_ttl=600)
+            key = cache.key(url, "markdown", True)
+            assert await cache.get(key) is None
+
+            data = {"title": "Article", "content": "body", "url": url}
+            await cache.put(key, url, data, {"etag": '"v1"'})
+            assert await cache.get(key) == data
+
+            # identical contents are stored once
+            other = cache.key(url, "html", True)
+            await cache.put(other, url, data, {"etag": '"v1"'})
+            assert len(list((tmp_path / "objects").rglob("*.json.z"))) == 1
+
+            # stale entries are served after a 304, and dropped when the page changed
+            cache.fresh_ttl = 0
+            assert await cache.get(key) == data
+            etag["value"] = '"v2"'
+            assert await cache.get(key) is None
+
+            # pages without validators cannot be revalidated
+            await cache.put(key, url, data, {})
+            assert await cache.get(key) is None
+            # pages that must not be stored are not cached
+            await cache.put(key, url, {"content": "private"}, {"cache-control": "private, no-store"})
+
+            # the least recently used entries are evicted above the size limit
+            cache.max_size = 1
+            await cache.put(cache.key(url + "?2", "markdown", True), url, {"content": "x" * 100}, {})
+            assert cache.evictions == 3
+            assert len(list((tmp_path / "objects").rglob("*.json.z"))) == 0
+            return cache.stats()
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    stats = asyncio.run(run())
+    assert stats["hits"] == 2
+    assert stats["revalidated"] == 1
+    assert stats["changed"] == 2
+
+
+def test_changed_schema_misses_the_cache():
+    cfg = schema_registry.find_content("news.qq.com")
+    version = DataExtractor._schema_version(cfg.config, cfg.selectors)
+    assert version == DataExtractor._schema_version(cfg.config, cfg.selectors)
+
+    changed = cfg.selectors.model_copy(update={"base_selector": "article"})
+    assert DataExtractor._schema_version(cfg.config, changed) != version
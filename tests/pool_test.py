@@ -0,0 +1,31 @@
+import asyncio
+
+from cstoolbox.browser.config import BrowserConfig, PageConfig
+from cstoolbox.browser.pool import DEFAULT_PAGE_TIMEOUT, BrowserPool, _ContextSlot, _PooledPage
+
+
+class FakePage:
+    def __init__(self):
+        self.timeout = None
+
+    def is_closed(self):
+        return False
+
+    def set_default_timeout(self, timeout):
+        self.timeout = timeout
+
+
+def test_reused_pages_get_the_timeout_of_the_request():
+    pool = BrowserPool(BrowserConfig())
+    slot = _ContextSlot(0, 4)
+    page = FakePage()
+
+    async def checkout(config):
+        slot.idle_pages.append(_PooledPage(page))
+        return await pool._checkout_page(slot, None, config)
+
+    asyncio.run(checkout(PageConfig(page_timeout=5000)))
+    assert page.timeout == 5000
+    # the next request does not set one
+    asyncio.run(checkout(PageConfig(page_timeout=0)))
+    assert page.timeout == DEFAULT_PAGE_TIMEOUT
@@ -0,0 +1,76 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from cstoolbox.browser.config import CrawlerConfig
+from cstoolbox.browser.crawler import Crawler
+from cstoolbox.browser.plan import compile_plan
+from cstoolbox.browser.prune import PRUNE_PAGE_JS, prune_args
+
+FULL_HTML = """<html><head><title>Page</title><script>var a = 1;</script></head><body>
+<div class="post"><h1>Heading</h1><p>Some text</p><form><input name="q"></form></div></body></html>"""
+# what PRUNE_PAGE_JS returns for FULL_HTML
+PRUNED_HTML = """<html><head><title>Page</title><!----></head><body>
+<div class="post"><h1>Heading</h1><p>Some text</p><!----></div></body></html>"""
+FIELDS = [{"name": "title", "selector": "h1", "type": "text"}, {"name": "content", "selector": "p", "type": "html"}]
+
+
+class FakePage:
+    def __init__(self, pruned):
+        self.pruned = pruned
+        self.evaluated = []
+
+    async def goto(self, url, timeout=None):
+        return None
+
+    async def evaluate(self, script, arg=None):
+        self.evaluated.append((script, arg))
+        return self.pruned
+
+    async def content(self):
+        return FULL_HTML
+
+
+class FakePool:
+    def __init__(self, page):
+        self.fake_page = page
+
+    @asynccontextmanager
+    async def page(self, config):
+        yield self.fake_page
+
+
+def _crawl(pruned, config):
+    page = FakePage(pruned)
+    crawler = Crawler(FakePool(page))
+    result = asyncio.run(crawler.crawl("https://example.com/a", config))
+    assert result.success, result.error_message
+    asyncio.run(crawler.render_content(result, markdown=False))
+    return page, result
+
+
+def test_pruned_page_is_extracted():
+    config = CrawlerConfig(base_selector="div.post", fields=FIELDS, prune_page=True)
+    pruned = {"html": PRUNED_HTML, "pruned": len(FULL_HTML) - len(PRUNED_HTML)}
+    page, result = _crawl(pruned, config)
+    _, full = _crawl(None, CrawlerConfig(base_selector="div.post", fields=FIELDS))
+
+    script, args = page.evaluated[0]
+    assert script == PRUNE_PAGE_JS
+    assert args["kept"] == ["h1", "p", "title", "h1", "h2", "div.post"] and args["fields"] == ["h1", "p"]
+    assert (result.title, result.results, result.cleaned_html) == (full.title, full.results, full.cleaned_html)
+    assert "Some text" in result.cleaned_html
+    assert result.metrics["pruned"] == pruned["pruned"]
+    assert result.metrics["transferred"] == len(PRUNED_HTML)
+
+
+def test_page_is_serialized_when_it_can_not_be_pruned():
+    # selector the browser does not support
+    page, result = _crawl(None, CrawlerConfig(base_selector="div.post", fields=FIELDS, prune_page=True))
+    assert page.evaluated and result.metrics["pruned"] == 0
+    assert result.metrics["transferred"] == len(FULL_HTML)
+
+    # matches depending on the siblings of an element
+    for selector in ("li:nth-child(2)", "h1 + p", "h1 ~ p", "p:-soup-contains('text')"):
+        fields = [{"name": "value", "selector": selector, "type": "text"}]
+        assert prune_args(compile_plan(None, [CrawlerConfig(fields=fields).fields[0]])) is None
+    assert prune_args(compile_plan("div:not(.ad)", CrawlerConfig(fields=FIELDS).fields)) is not None
@@ -0,0 +1,84 @@
+import asyncio
+
+from cstoolbox.browser.block import DomainIndex, RequestBlocker, domain_index, track_blocked
+
+
+class FakeFrame:
+    def __init__(self, page, parent_frame=None):
+        self.page = page
+        self.parent_frame = parent_frame
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type, frame, navigation=False):
+        self.url = url
+        self.resource_type = resource_type
+        self.frame = frame
+        self._navigation = navigation
+
+    def is_navigation_request(self):
+        return self._navigation
+
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.action = None
+
+    async def abort(self, error_code=None):
+        self.action = "abort"
+
+    async def fallback(self):
+        self.action = "fallback"
+
+
+def test_domain_index_matches_hosts_and_paths():
+    index = DomainIndex(["**/*.doubleclick.net/**", "**/pos.baidu.com/**", "**/*.google.com/pagead/**"])
+
+    assert index.match("https://ad.doubleclick.net/x.js") == "doubleclick.net"
+    assert index.match("https://a.b.doubleclick.net/") == "doubleclick.net"
+    assert index.match("https://pos.baidu.com/s?id=1") == "pos.baidu.com"
+    assert index.match("https://www.baidu.com/s?wd=1") is None
+    assert index.match("https://baidu.com/") is None
+    assert index.match("https://www.google.com/pagead/conversion.js") == "google.com"
+    assert index.match("https://www.google.com/search?q=pagead") is None
+    assert index.match("https://notdoubleclick.net/") is None
+
+
+def test_compiled_index_covers_block_domains():
+    assert domain_index.match("https://www.google-analytics.com/analytics.js")
+    assert domain_index.match("https://connect.facebook.net/en_US/fbevents.js")
+    assert domain_index.match("https://www.facebook.com/tr/?id=1")
+    assert not domain_index.match("https://www.facebook.com/")
+    assert not domain_index.match("https://www.bing.com/search?q=ads")
+
+
+def test_blocker_counts_blocked_requests_per_page():
+    blocker = RequestBlocker(["image"])
+    page, other_page = object(), object()
+    main_frame = FakeFrame(page)
+
+    requests = [
+        # the page itself is never blocked, even on a blocked domain
+        (FakeRequest("https://bat.bing.com/", "document", main_frame, navigation=True), "fallback"),
+        (FakeRequest("https://example.com/app.js", "script", main_frame), "fallback"),
+        (FakeRequest("https://example.com/logo.png", "image", main_frame), "abort"),
+        (FakeRequest("https://www.googletagmanager.com/gtm.js", "script", main_frame), "fallback"),
+        (FakeRequest("https://ad.doubleclick.net/ad", "document", FakeFrame(page, main_frame), navigation=True), "abort"),
+        (FakeRequest("https://x.criteo.com/sync", "xhr", FakeFrame(other_page)), "abort"),
+    ]
+
+    async def route_all():
+        actions = []
+        with track_blocked(page) as stats:
+            for request, _ in requests:
+                route = FakeRoute(request)
+                await blocker.handle(route)
+                actions.append(route.action)
+        return actions, stats
+
+    actions, stats = asyncio.run(route_all())
+    assert actions == [expected for _, expected in requests]
+    assert stats.requests == 2
+    assert stats.bytes_avoided > 0
+    assert blocker.stats()["blocked_requests"] == 3
@@ -0,0 +1,70 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from cstoolbox.tools.crawl.impl.registry import SchemaRegistry
+
+SCHEMA_ROOT = Path(__file__).resolve().parent.parent / "src" / "cstoolbox" / "schema"
+
+
+def _content_schema(name, selector):
+    return {
+        "config": {"name": name, "page_timeout": 15000, "wait_for": "body"},
+        "selectors": {"base_selector": "body", "fields": [{"name": "content", "selector": selector, "type": "html"}]},
+    }
+
+
+def test_bundled_schemas_are_valid():
+    registry = SchemaRegistry(SCHEMA_ROOT)
+    listing = registry.list()
+    assert listing["content"] and listing["search"]
+    assert [s for kind in listing.values() for s in kind if not s["valid"]] == []
+    assert registry.get_search("bing").config.url_template
+
+
+def test_registry_finds_most_specific_domain_and_reloads(tmp_path):
+    (tmp_path / "content").mkdir()
+    (tmp_path / "search").mkdir()
+    (tmp_path / "content" / "example.com.json").write_text(json.dumps(_content_schema("example", ".a")))
+    (tmp_path / "content" / "news.example.com.json").write_text(json.dumps(_content_schema("news", ".b")))
+
+    registry = SchemaRegistry(tmp_path)
+    assert registry.find_content("www.example.com").config.name == "example"
+    assert registry.find_content("m.news.example.com").config.name == "news"
+    assert registry.find_content("NEWS.example.com").config.name == "news"
+    assert registry.find_content("example.org") is None
+    assert registry.find_content("com") is None
+    assert not registry.reload()
+
+    # a broken schema is reported and raises on use, the other schemas keep working
+    broken = tmp_path / "content" / "example.com.json"
+    broken.write_text("{")
+    os.utime(broken, ns=(1, 1))
+    assert registry.reload()
+    assert [s["name"] for s in registry.list()["content"] if not s["valid"]] == ["example.com"]
+    assert registry.find_content("news.example.com").config.name == "news"
+    with pytest.raises(ValueError):
+        registry.find_content("www.example.com")
+
+    assert registry.validate("content", _content_schema("x", ".c")) is None
+    assert registry.validate("content", {"config": {}}) is not None
+    assert registry.validate("other", {}) is not None
+
+
+def test_registry_compiles_and_caches_extraction_plans(tmp_path):
+    (tmp_path / "content").mkdir()
+    (tmp_path / "search").mkdir()
+    (tmp_path / "content" / "example.com.json").write_text(json.dumps(_content_schema("example", ".a")))
+    (tmp_path / "content" / "bad.example.com.json").write_text(json.dumps(_content_schema("bad", "div[")))
+
+    registry = SchemaRegistry(tmp_path)
+    # invalid selectors make the schema invalid
+    assert [s["name"] for s in registry.list()["content"] if not s["valid"]] == ["bad.example.com"]
+    assert registry.validate("content", _content_schema("x", "p:unknown")) is not None
+
+    selectors = registry.find_content("example.com").selectors
+    plan = registry.plan(selectors.base_selector, selectors.fields)
+    assert registry.plan(selectors.base_selector, selectors.fields) is plan
+    assert registry.stats()["plans"] == 1
@@ -0,0 +1,72 @@
+import asyncio
+
+from cstoolbox.tools.crawl.impl.search_cache import SearchCache
+
+
+def test_search_cache_hits_misses_and_ttls(tmp_path):
+    calls = []
+
+    def fetcher(value):
+        async def fetch():
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        return fetch
+
+    async def run():
+        cache = SearchCache(max_entries=2, ttl=3600, negative_ttl=0, ttls={"day": 60}, disk_path=tmp_path / "s.sqlite")
+        key = cache.key("bing", "  Python   Asyncio ", 1, 10, "", "com")
+        assert key == cache.key("bing", "python asyncio", 1, 10, "", "com")
+        assert cache.ttl_of(cache.key("bing", "python", 1, 10, "day", "com")) == 60
+
+        # concurrent identical searches only fetch once
+        results = await asyncio.gather(*(cache.get_or_fetch(key, fetcher([{"title": "a"}])) for _ in range(3)))
+        assert results == [[{"title": "a"}]] * 3
+        assert len(calls) == 1
+        assert await cache.get_or_fetch(key, fetcher([{"title": "b"}])) == [{"title": "a"}]
+
+        # fresh searches bypass the cache and refresh it
+        assert await cache.get_or_fetch(key, fetcher([{"title": "b"}]), fresh=True) == [{"title": "b"}]
+        assert await cache.get_or_fetch(key, fetcher([{"title": "c"}])) == [{"title": "b"}]
+
+        # empty results are not cached with a negative TTL of 0
+        empty = cache.key("bing", "nothing", 1, 10, "", "com")
+        assert await cache.get_or_fetch(empty, fetcher([])) == []
+        assert await cache.get_or_fetch(empty, fetcher([{"title": "d"}])) == [{"title": "d"}]
+
+        # entries evicted from memory are still on disk
+        for kw in ("x", "y"):
+            await cache.get_or_fetch(cache.key("bing", kw, 1, 10, "", "com"), fetcher([{"title": kw}]))
+        assert cache.evictions > 0
+        cache.clear()
+        assert await cache.get_or_fetch(key, fetcher([{"title": "e"}])) == [{"title": "b"}]
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["disk_hits"] == 1
+    assert stats["bypasses"] == 1
+    assert stats["hits"] == 5
+
+
+def test_cancelled_fetch_does_not_cancel_the_waiting_searches():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [{"title": "a"}]
+
+    async def run():
+        cache = SearchCache(ttl=3600)
+        key = cache.key("bing", "python", 1, 10, "", "com")
+        owner = asyncio.create_task(cache.get_or_fetch(key, fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_fetch(key, fetch))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        # the waiter fetches the results itself
+        assert await waiter == [{"title": "a"}]
+        assert owner.cancelled() and len(calls) == 2
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+import asyncio
+
+from aiohttp import web
+
+from cstoolbox.browser.config import CrawlerConfig, CrewlerResult
+from cstoolbox.browser.crawler import Crawler
+from cstoolbox.core.http_client import http_client
+from cstoolbox.tools.crawl.impl.schema import FetchMode
+from cstoolbox.tools.crawl.impl.search_impl import SearchExtractor, search_fetcher
+
+RESULTS = """<html><body><ol id="b_results">
+<li class="b_algo"><div class="tilk" aria-label="Example"></div><h2><a href="https://example.com/1">First</a></h2>
+<div class="b_caption"><p>First summary</p></div></li>
+<li class="b_algo"><h2><a href="https://example.com/2">Second</a></h2></li>
+</ol><li class="b_pag"><nav role="navigation"><a href="/search?q=kw&first=1">1</a><a href="/search?q=kw&first=11">2</a></nav></li>
+</body></html>"""
+CAPTCHA = '<html><body><div class="captcha">Verify you are human</div></body></html>'
+
+
+class BrowserCrawler(Crawler):
+    """Crawler standing in for the browser"""
+
+    def __init__(self):
+        super().__init__(browser_pool=None)
+        self.crawled = []
+
+    async def crawl(self, url, config):
+        self.crawled.append(url)
+        return CrewlerResult(url=url, results=[{"title": "from the browser"}], success=True)
+
+
+async def _serve():
+    async def search(request):
+        return web.Response(text=RESULTS, content_type="text/html")
+
+    async def captcha(request):
+        return web.Response(text=CAPTCHA, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/search", search)
+    app.router.add_get("/captcha", captcha)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_static_result_pages_fall_back_to_the_browser():
+    extractor = SearchExtractor("bing")
+    assert extractor.config.fetch_mode == FetchMode.AUTO
+    config = CrawlerConfig(
+        base_selector=extractor.schema.base_selector,
+        fields=[field.model_dump() for field in extractor.schema.fields],
+        links_selector=extractor.config.pages_selector,
+        error_selectors=extractor.schema.error_selectors,
+    )
+
+    async def run():
+        runner, base = await _serve()
+        try:
+            crawler = BrowserCrawler()
+            results = await extractor._crawl(crawler, f"{base}/search?q=kw", config)
+            assert not crawler.crawled
+            assert [row["title"] for row in results.results] == ["First", "Second"]
+            assert results.results[0] == {
+                "sitename": "Example",
+                "title": "First",
+                "url": "https://example.com/1",
+                "summary": "First summary",
+            }
+            assert [link["text"] for link in results.links] == ["1", "2"]
+
+            results = await extractor._crawl(crawler, f"{base}/captcha", config)
+            assert crawler.crawled == [f"{base}/captcha"]
+            assert results.results == [{"title": "from the browser"}]
+
+            # without the browser to fall back to, the failure is not counted as served
+            extractor.config = extractor.config.model_copy(update={"fetch_mode": FetchMode.HTTP})
+            results = await extractor._crawl(crawler, f"{base}/captcha", config)
+            assert not results.results and len(crawler.crawled) == 1
+            extractor.config = extractor.config.model_copy(update={"fetch_mode": FetchMode.AUTO})
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    http, fallback, failed = search_fetcher.http, search_fetcher.fallback, search_fetcher.http_failed
+    asyncio.run(run())
+    assert (search_fetcher.http - http, search_fetcher.fallback - fallback) == (1, 1)
+    assert search_fetcher.http_failed - failed == 1
@@ -0,0 +1,109 @@
+import asyncio
+from urllib.parse import parse_qs, urlparse
+
+from cstoolbox.browser.config import CrawlerConfig, CrewlerResult
+from cstoolbox.tools.crawl.impl.search_impl import SearchExtractor, _provider_limit
+
+
+class PagedExtractor(SearchExtractor):
+    """Serves result pages of the given sizes, the later pages answering first unless told otherwise"""
+
+    def __init__(self, sizes, max_concurrency=2, delays=None):
+        super().__init__("bing")
+        self.config = self.config.model_copy(
+            update={"pages_selector": None, "page_interval": 0, "max_concurrency": max_concurrency}
+        )
+        self.sizes = sizes
+        self.delays = delays or [0.05 * (len(sizes) - index) for index in range(len(sizes))]
+        self.running = 0
+        self.max_running = 0
+        self.started = []
+        self.cancelled = []
+
+    async def _crawl(self, crawler, url, crawler_config):
+        offset = int(parse_qs(urlparse(url).query)["first"][0])
+        index = offset // 10
+        self.started.append(index)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays[index])
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        finally:
+            self.running -= 1
+        rows = [{"title": f"{index}-{row}"} for row in range(self.sizes[index])]
+        # the pagination of the page
+        links = [{"text": str(page + 1), "href": f"?first={page * 10}"} for page in range(len(self.sizes))]
+        return CrewlerResult(url=url, results=rows, links=links, success=True)
+
+
+def _search(extractor, number, request_times):
+    return asyncio.run(
+        extractor._extract_search_result(
+            None, CrawlerConfig(), max_per_page=10, kw="kw", request_times=request_times, number=number
+        )
+    )
+
+
+def test_pages_are_fetched_concurrently_and_merged_in_order():
+    extractor = PagedExtractor([10, 10, 10, 10])
+    results = _search(extractor, 40, 4)
+    assert [row["title"] for row in results] == [f"{page}-{row}" for page in range(4) for row in range(10)]
+    assert extractor.max_running == 2
+    assert not extractor.cancelled
+
+
+def test_fetching_stops_once_enough_results_are_collected():
+    # the first page already has all the results
+    extractor = PagedExtractor([30, 10, 10], max_concurrency=3, delays=[0.01, 0.2, 0.2])
+    results = _search(extractor, 30, 3)
+    assert len(results) == 30 and {row["title"][0] for row in results} == {"0"}
+    assert sorted(extractor.cancelled) == [1, 2]
+
+    # a page without results ends the search
+    extractor = PagedExtractor([10, 0, 10, 10], max_concurrency=4)
+    results = _search(extractor, 40, 4)
+    assert len(results) == 10
+    assert not extractor.cancelled
+
+
+def test_pages_are_built_from_the_url_template_when_it_can_page():
+    # bing reads its page links, but its url template has the offset
+    extractor = PagedExtractor([10, 10, 10, 10], max_concurrency=4)
+    extractor.config = extractor.config.model_copy(update={"pages_selector": "nav a"})
+    results = _search(extractor, 40, 4)
+    assert len(results) == 40 and extractor.max_running == 4
+
+
+def _link_paged(sizes, max_concurrency):
+    extractor = PagedExtractor(sizes, max_concurrency=max_concurrency)
+    extractor.config = extractor.config.model_copy(
+        update={"pages_selector": "nav a", "url_template": "/search?q={kw}&first=0"}
+    )
+    return extractor
+
+
+def test_pages_are_read_from_the_first_one_when_the_url_template_cannot_page():
+    extractor = _link_paged([10, 10, 10], max_concurrency=3)
+    results = _search(extractor, 30, 3)
+    assert [row["title"][0] for row in results[::10]] == ["0", "1", "2"]
+    # the links are known once the first page is served
+    assert extractor.started[0] == 0 and extractor.max_running == 2
+
+
+def test_first_page_waits_for_the_provider_limit():
+    extractor = _link_paged([10, 10, 10], max_concurrency=1)
+
+    async def run():
+        # a page of another search holds the only slot of the provider
+        async with _provider_limit("bing", 1):
+            search = asyncio.create_task(
+                extractor._extract_search_result(None, CrawlerConfig(), max_per_page=10, kw="kw", number=10)
+            )
+            await asyncio.sleep(0.05)
+            assert not extractor.started
+        assert len(await search) == 10
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+import asyncio
+
+from aiohttp import web
+
+from cstoolbox.browser.config import CrawlerConfig
+from cstoolbox.browser.crawler import Crawler
+from cstoolbox.core.http_client import http_client
+from cstoolbox.tools.crawl.impl.schema import FetchMode
+from cstoolbox.tools.crawl.impl.static_fetch import StaticFetcher, content_missing
+
+PARAGRAPH = "<p>服务端渲染的文章正文，不需要浏览器就能读取。</p>"
+ARTICLE = (
+    '<html><head><meta charset="gbk"><title>文章</title></head><body>'
+    f'<h1>标题</h1><div id="content">{PARAGRAPH * 20}</div></body></html>'
+)
+SHELL = '<html><head><title>App</title></head><body><noscript>Please enable JavaScript.</noscript><div id="app"></div></body></html>'
+CONFIG = CrawlerConfig(
+    fields=[{"name": "title", "selector": "h1", "type": "text"}, {"name": "content", "selector": "#content", "type": "html"}]
+)
+
+
+async def _serve():
+    async def article(request):
+        # no charset in the headers, the page declares it
+        return web.Response(body=ARTICLE.encode("gbk"), content_type="text/html")
+
+    async def shell(request):
+        return web.Response(text=SHELL, content_type="text/html")
+
+    async def large(request):
+        # chunked, without a Content-Length
+        resp = web.StreamResponse(headers={"Content-Type": "text/html"})
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        for _ in range(3):
+            await resp.write(b"<p>" + b"x" * 1024 * 1024 + b"</p>")
+        await resp.write_eof()
+        return resp
+
+    async def pdf(request):
+        return web.Response(body=b"%PDF-1.4", content_type="application/pdf")
+
+    app = web.Application()
+    app.router.add_get("/article", article)
+    app.router.add_get("/app", shell)
+    app.router.add_get("/file.pdf", pdf)
+    app.router.add_get("/large", large)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_static_pages_are_extracted_without_the_browser():
+    async def run():
+        runner, base = await _serve()
+        try:
+            fetcher = StaticFetcher()
+            crawler = Crawler(browser_pool=None)
+
+            page = await fetcher.fetch(f"{base}/article")
+            result = await crawler.extract(page.url, CONFIG, page.html, page.status_code, page.headers)
+            assert result.success and result.status_code == 200
+            assert result.results["title"] == "标题"
+            assert not content_missing(result.results["content"])
+
+            page = await fetcher.fetch(f"{base}/app")
+            result = await crawler.extract(page.url, CONFIG, page.html, page.status_code, page.headers)
+            await crawler.render_content(result, markdown=False)
+            assert content_missing(result.results["content"]) and content_missing(result.cleaned_html)
+
+            assert await fetcher.fetch(f"{base}/file.pdf") is None
+            assert await StaticFetcher(max_size_mb=2).fetch(f"{base}/large") is None
+            assert len((await StaticFetcher(max_size_mb=4).fetch(f"{base}/large")).html) > 3 * 1024 * 1024
+            assert await fetcher.fetch(f"{base}/missing") is None
+
+            fetcher.record("http")
+            fetcher.record("fallback")
+            assert fetcher.stats()["http_rate"] == 0.5
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_content_missing():
+    assert content_missing(None)
+    assert content_missing("<div>  <p>short</p> </div>")
+    assert not content_missing("# Title\n" + "Article text. " * 30)
+    assert content_missing("You need to enable JavaScript to run this app. " * 5)
+
+
+def test_invalid_fetch_mode_falls_back_to_auto():
+    assert StaticFetcher("htttp").mode == FetchMode.AUTO
+    assert StaticFetcher("browser").mode == FetchMode.BROWSER
@@ -0,0 +1,23 @@
+import asyncio
+import json
+
+from cstoolbox.config import config
+from cstoolbox.core.crawler_manager import CrawlerManager, crawler_manager
+from cstoolbox.http_api import ping
+
+
+def test_ping_is_ready_with_the_warm_up_disabled(monkeypatch):
+    monkeypatch.setattr(config, "warmup", "false")
+    monkeypatch.setattr(crawler_manager, "status", "idle")
+    crawler_manager.start_warm_up()
+    assert crawler_manager.status == "disabled" and crawler_manager.ready
+
+    data = json.loads(asyncio.run(ping()).body)["data"]
+    assert (data["ready"], data["status"]) == (True, "disabled")
+
+
+def test_ping_waits_for_the_warm_up():
+    manager = CrawlerManager()
+    for status, ready in (("idle", False), ("warming_up", False), ("failed", False), ("ready", True)):
+        manager.status = status
+        assert manager.ready is ready